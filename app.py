@@ -1,39 +1,1295 @@
-from flask import Flask, request,jsonify
+from flask import Flask, request,jsonify, g, Response, stream_with_context, has_request_context
 import os
+import json
+import copy
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
 import mysql.connector
-from mysql.connector import Error
-from dotenv import load_dotenv
-import requests
-
-# Carrega as variáveis de ambiente do arquivo .cred (se disponível)
-load_dotenv('.cred')
-
-# Configurações para conexão com o banco de dados usando variáveis de ambiente
-config = {
-    'host': os.getenv('DB_HOST', 'localhost'),  # Obtém o host do banco de dados da variável de ambiente
-    'user': os.getenv('DB_USER'),  # Obtém o usuário do banco de dados da variável de ambiente
-    'password': os.getenv('DB_PASSWORD'),  # Obtém a senha do banco de dados da variável de ambiente
-    'database': os.getenv('DB_NAME', 'db_estudo'),  # Obtém o nome do banco de dados da variável de ambiente
-    'port': int(os.getenv('DB_PORT', 3306)),  # Obtém a porta do banco de dados da variável de ambiente
-    'ssl_ca': os.getenv('SSL_CA_PATH')  # Caminho para o certificado SSL
-}
+from mysql.connector import Error, IntegrityError, InterfaceError
+from mysql.connector.errors import PoolError
+from configuracao import config, config_pool, valida_config
+from pool import PoolDeConexoes
+from cache import CacheLRU, CacheCompartilhado, CacheEmCamadas, ClienteMemoria
+from repositorio import TABELAS, Repositorio
+from paginacao import (LIMITE_MAXIMO, LIMITE_PADRAO, codifica_cursor, decodifica_cursor, ler_paginacao,
+                       proxima_pagina, sql_pagina)
+from metricas import Metricas, BUCKETS_LINHAS, BUCKETS_BYTES, exporta_gauges
+from serializacao import PROVEDORES
+from versoes import Versoes
+from reservas import Reservas, reconcilia, expira
+from gravacao import AlocadorDeIds, FilaCheia, FilaDeGravacao
+from idempotencia import Idempotencia
+from replicas import ConjuntoDeReplicas, Replica, le_replicas
+from coalescencia import Coalescedor
+from senhas import SenhasOcupadas, ServicoDeSenhas
+from busca import CAMPOS_BUSCA, COLUNAS_BUSCA, IndiceInvertido, consulta_booleana, sql_busca, termos
+import resumos
+from compressao import codificadores_disponiveis, escolhe_codificador
+
+
+def valida_processos(processos):
+    """Confere se o estado compartilhado aguenta `processos` processos servindo requisições.
+
+    Versões das ETags, cache, reservas e idempotência ficam na memória de cada processo sem o Redis
+    (CACHE_COMPARTILHADO=memoria também é por processo): um worker responderia 304 ou serviria o cache
+    de um registro alterado por outro, e o estoque reservado em um não seria visto pelos outros.
+    """
+    if processos > 1 and os.getenv('CACHE_COMPARTILHADO') != 'redis':
+        raise RuntimeError(f"{processos} processos exigem CACHE_COMPARTILHADO=redis (versões, cache, reservas "
+                           "e idempotência compartilhados); use um único worker ou configure o Redis")
+
+
+# Réplicas de leitura, opcionais: DB_REPLICAS="host[:porta[:peso]],...". Os GETs são distribuídos entre elas
+# por peso e as escritas ficam no primário. Cada réplica tem um pool com a mesma configuração do primário
+config_replicas = le_replicas(os.getenv('DB_REPLICAS', ''), config)
+REPLICA_ATRASO_MAXIMO = float(os.getenv('DB_REPLICA_ATRASO_MAXIMO', 5))  # Segundos de atraso até sair do rodízio
+REPLICA_INTERVALO = float(os.getenv('DB_REPLICA_INTERVALO', 2))  # Segundos entre as verificações das réplicas
+# Idade mínima de uma alteração para que ela já esteja em todas as réplicas do rodízio (o atraso pode
+# crescer entre duas verificações, por isso o intervalo entra na conta)
+JANELA_REPLICAS = REPLICA_ATRASO_MAXIMO + REPLICA_INTERVALO
+# Depois de uma escrita o cliente lê do primário por este tempo (cookie), para ver o que acabou de gravar
+JANELA_LEITURA_PROPRIA = float(os.getenv('DB_LEITURA_PROPRIA', JANELA_REPLICAS))
+COOKIE_PRIMARIO = 'le_primario_ate'
+
+# Consultas que passarem deste tempo (em milissegundos) são registradas no log de consultas lentas
+LIMITE_CONSULTA_LENTA = float(os.getenv('CONSULTA_LENTA_MS', 500)) / 1000
+
+# Histogramas exportados em /metrics
+metricas = Metricas()
+metrica_conexao = metricas.histograma('db_conexao_segundos', 'Tempo de espera por uma conexão do pool')
+metrica_consulta = metricas.histograma('db_consulta_segundos', 'Tempo de execute e fetch de cada consulta SQL')
+metrica_linhas = metricas.histograma('db_linhas_retornadas', 'Linhas lidas por fetch de cada consulta SQL',
+                                     BUCKETS_LINHAS)
+metrica_requisicao = metricas.histograma('http_requisicao_segundos', 'Tempo total de cada requisição')
+metrica_serializacao = metricas.histograma('http_serializacao_segundos', 'Tempo de serialização da resposta JSON')
+metrica_bytes = metricas.histograma('http_resposta_bytes', 'Tamanho do corpo das respostas', BUCKETS_BYTES)
+metrica_compressao = metricas.histograma('http_compressao_segundos', 'Tempo de compressão do corpo das respostas')
+metrica_senha = metricas.histograma('senha_hash_segundos', 'Tempo de cada hash ou verificação de senha: total '
+                                    '(com a espera na fila) e só o cálculo')
+
+
+def rota_atual():
+    """Regra da rota da requisição atual, usada como label das métricas."""
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return 'fora_de_requisicao' if not has_request_context() else 'nao_encontrada'
+
+
+@lru_cache(maxsize=1024)
+def rotulo_sql(sql):
+    """Normaliza o SQL (já parametrizado) para usá-lo como label."""
+    return " ".join(sql.split())[:200]
+
+
+def registra_consulta(sql, fase, duracao, linhas, acumulado):
+    """Observador do pool: registra os tempos de execute/fetch de cada consulta."""
+    rota = rota_atual()
+    rotulo = rotulo_sql(sql) if isinstance(sql, str) else str(sql)
+    metrica_consulta.observar(duracao, rota=rota, sql=rotulo, fase=fase)
+    if linhas is not None:
+        metrica_linhas.observar(linhas, rota=rota, sql=rotulo)
+    if has_request_context() and 'tempos' in g:
+        g.tempos[fase] += duracao
+
+    # Registra a consulta no log apenas quando ela ultrapassa o limite pela primeira vez
+    if acumulado >= LIMITE_CONSULTA_LENTA > acumulado - duracao:
+        print(f"Consulta lenta ({acumulado * 1000:.1f} ms) em {rota}: {rotulo}")
+
+
+# O pool é criado na primeira requisição de cada processo (cada worker do gunicorn tem o seu)
+pool = None
+pool_lock = threading.Lock()
+replicas = None  # Criado junto com o pool quando DB_REPLICAS está definido
+
+
+def get_pool():
+    """Retorna o pool de conexões do processo, criando-o se necessário."""
+    global pool, replicas
+    if pool is None:
+        with pool_lock:
+            if pool is None:
+                if config_replicas:
+                    replicas = ConjuntoDeReplicas(
+                        [Replica(nome, PoolDeConexoes(config_replica, observador=registra_consulta, **config_pool), peso)
+                         for nome, config_replica, peso in config_replicas],
+                        atraso_maximo=REPLICA_ATRASO_MAXIMO, intervalo=REPLICA_INTERVALO)
+                    replicas.inicia()
+                pool = PoolDeConexoes(config, observador=registra_consulta, **config_pool)
+                # A reconciliação das reservas usa o pool, então começa junto com ele em cada processo
+                threading.Thread(target=reconciliador, daemon=True, name='reservas').start()
+                # A fila de gravação adiada reaplica o log que sobrou de uma queda antes de aceitar escritas
+                if fila_gravacao is not None:
+                    fila_gravacao.inicia()
+                if indices_busca:
+                    threading.Thread(target=mantem_indices, daemon=True, name='busca').start()
+    return pool
+
+
+def descarta_pool_herdado():
+    # O filho de um fork não pode usar as conexões nem as threads do pai: cria o próprio pool
+    global pool, pool_lock, replicas
+    pool = None
+    pool_lock = threading.Lock()
+    replicas = None
+    senhas.reinicia()
+    if versoes.cliente is None:
+        # Época própria: processos diferentes nunca emitem a mesma ETag
+        versoes.reinicia()
+
+
+os.register_at_fork(after_in_child=descarta_pool_herdado)
+
+
+def cria_app():
+    """Fábrica usada pelo gunicorn (gunicorn.conf.py). Com preload_app o import do módulo e a validação
+    da configuração acontecem uma única vez, no master; os workers herdam tudo pelo fork."""
+    valida_config()
+    return app
+
+
+def inicia_processo():
+    """Cria o pool do processo e abre as conexões antes da primeira requisição (post_fork do gunicorn)."""
+    try:
+        get_pool().aquece()
+    except Error as err:
+        # Banco fora do ar na subida: o worker sobe assim mesmo e conecta na primeira requisição
+        print(f"Erro ao abrir as conexões do pool: {err}")
+    for replica in replicas.replicas if replicas is not None else ():
+        try:
+            replica.pool.aquece()
+        except Error as err:
+            print(f"Erro ao abrir as conexões da réplica {replica.nome}: {err}")
+
+
+def pode_ler_da_replica():
+    """Indica se a leitura da requisição atual pode ir para uma réplica."""
+    if not config_replicas or request.method not in ('GET', 'HEAD'):
+        return False
+    agora = time.time()
+    # Leitura das próprias escritas: quem escreveu há pouco lê do primário até o cookie vencer
+    try:
+        if float(request.cookies.get(COOKIE_PRIMARIO, 0)) > agora:
+            return False
+    except ValueError:
+        pass
+    # Dados alterados há pouco (por qualquer cliente) podem ainda não ter chegado às réplicas. Lidos
+    # delas, iriam para o cache e receberiam a ETag da versão nova
+    return agora - g.get('alterado_em', 0) >= JANELA_REPLICAS
+
+
+def escolhe_replica():
+    """Réplica que atende a leitura da requisição atual, ou None para ler do primário."""
+    if not pode_ler_da_replica():
+        return None
+    get_pool()  # As réplicas são criadas junto com o pool do processo
+    return replicas.escolhe() if replicas is not None else None
+
+
+def obter_conexao(replica=None):
+    """Empresta uma conexão da réplica ou do primário. Se a réplica falhar, sai do rodízio e a leitura vai para o primário."""
+    if replica is not None:
+        try:
+            return replica.pool.obter()
+        except PoolError:
+            # Pool da réplica esgotado: a réplica está saudável, só ocupada
+            pass
+        except Error as err:
+            replicas.ejeta(replica, err)
+    return get_pool().obter()
 
 
 # Função para conectar ao banco de dados
 def connect_db():
-    """Estabelece a conexão com o banco de dados usando as configurações fornecidas."""
+    """Empresta uma conexão do pool (de uma réplica nos GETs). O conn.close() devolve a conexão ao pool."""
+    inicio = time.perf_counter()
     try:
-        # Tenta estabelecer a conexão com o banco de dados usando mysql-connector-python
-        conn = mysql.connector.connect(**config)
-        if conn.is_connected():
-            return conn
+        # Tenta obter uma conexão do pool de conexões
+        conn = obter_conexao(escolhe_replica())
     except Error as err:
         # Em caso de erro, imprime a mensagem de erro
         print(f"Erro: {err}")
         return None
+    finally:
+        # Mede o tempo de espera pela conexão
+        duracao = time.perf_counter() - inicio
+        metrica_conexao.observar(duracao, rota=rota_atual())
+        if 'tempos' in g:
+            g.tempos['conexao'] += duracao
+
+    # Registra a conexão na requisição atual para devolvê-la ao pool mesmo se o handler falhar
+    g.setdefault('conexoes', []).append(conn)
+    return conn
+
+
+def resposta_linhas(chave, pagina, linhas, proximo):
+    """Monta a resposta JSON de uma listagem a partir de linhas em tuplas, sem criar um dict por linha."""
+    tipos = [TABELAS[pagina['tabela']].tipos[coluna] for coluna in pagina['colunas']]
+    objetos = app.json.objetos(pagina['colunas'], tipos, linhas)
+    corpo = f'{{"{chave}":[{",".join(objetos)}],"proximo":{app.json.dumps(proximo)}}}'
+    return Response(corpo, mimetype='application/json')
+
+
+# Quantidade de linhas lidas do cursor por vez no modo de exportação
+LOTE_STREAMING = int(os.getenv('STREAMING_LOTE', 500))
+
+
+def formato_streaming():
+    """Retorna 'ndjson' ou 'json' se o cliente pediu a exportação em streaming, senão None."""
+    formato = request.args.get('stream')
+    if formato in ('ndjson', 'json'):
+        return formato
+    if request.accept_mimetypes.best == 'application/x-ndjson':
+        return 'ndjson'
+    return None
+
+
+def resposta_streaming(pagina, chave, formato):
+    """Transmite todas as linhas da tabela (a partir de after=) sem carregá-las na memória."""
+    # A exportação ignora o limit e percorre todas as linhas que passam nos filtros, na ordem pedida
+    sql, valores = sql_pagina(pagina, limite=False)
+    # Tipos das colunas, usados para codificar as linhas sem montar dicionários
+    tipos = [TABELAS[pagina['tabela']].tipos[coluna] for coluna in pagina['colunas']]
+
+    # A versão da tabela marca em g.alterado_em a última escrita: alterada há pouco, a exportação lê do
+    # primário, como a listagem. A resposta em streaming não leva ETag
+    versao_atual(pagina['tabela'])
+    # Conexão e consulta antes da resposta: uma falha aqui vira 500, e não um 200 com o corpo vazio.
+    # A réplica é escolhida no contexto da requisição (cookie e versão lida acima)
+    try:
+        conn = obter_conexao(escolhe_replica())
+    except Error as err:
+        print(f"Erro: {err}")
+        return {"erro": "Erro ao conectar ao banco de dados"}, 500
+    # Cursor sem buffer: as linhas (tuplas) são lidas do servidor conforme o lote é consumido
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, valores)
+    except Error as err:
+        print(f"Erro ao exportar {chave}: {err}")
+        conn.descartar()
+        return {"erro": f"Erro ao exportar {chave}"}, 500
+    estado = {'concluido': False, 'liberada': False}
+
+    def libera():
+        # Chamada no fim do gerador ou no fechamento da resposta (se o gerador nem chegou a começar)
+        if estado['liberada']:
+            return
+        estado['liberada'] = True
+        if estado['concluido']:
+            cursor.close()
+            conn.close()
+        else:
+            # O cliente desconectou ou houve erro: a conexão pode ter linhas não lidas
+            conn.descartar()
+
+    def gerar():
+        try:
+            if formato == 'json':
+                yield '{"' + chave + '": ['
+            primeira = True
+            while True:
+                linhas = cursor.fetchmany(LOTE_STREAMING)
+                if not linhas:
+                    break
+                objetos = app.json.objetos(pagina['colunas'], tipos, linhas)
+                if formato == 'ndjson':
+                    yield '\n'.join(objetos) + '\n'
+                else:
+                    partes = ','.join(objetos)
+                    yield partes if primeira else ',' + partes
+                    primeira = False
+            if formato == 'json':
+                yield ']}'
+            estado['concluido'] = True
+        except Error as err:
+            # O status já foi enviado: o corpo fica truncado
+            print(f"Erro ao exportar {chave}: {err}")
+        finally:
+            libera()
+
+    mimetype = 'application/x-ndjson' if formato == 'ndjson' else 'application/json'
+    # Comprime o fluxo parte a parte, sem esperar o fim da exportação
+    codificador = codificador_da_requisicao()
+    if codificador is None:
+        resp = Response(stream_with_context(gerar()), mimetype=mimetype)
+    else:
+        resp = Response(stream_with_context(comprime_fluxo(gerar(), codificador.fluxo())), mimetype=mimetype)
+        resp.headers['Content-Encoding'] = codificador.nome
+    resp.call_on_close(libera)
+    return resp
+
+
+def comprime_fluxo(partes, fluxo):
+    """Comprime cada parte gerada e envia os bytes já comprimidos ao cliente."""
+    try:
+        for parte in partes:
+            yield fluxo.parte(parte.encode())
+        yield fluxo.fim()
+    finally:
+        # Se o cliente desconectar, fecha o gerador interno para liberar a conexão
+        partes.close()
+
+
+# Campos obrigatórios na criação de registros de cada tabela
+CAMPOS_INSERCAO = {
+    'tbl_clientes': ('nome', 'email', 'cpf', 'senha'),
+    'tbl_fornecedores': ('nome', 'email', 'cnpj'),
+    'tbl_produtos': ('nome', 'descricao', 'preco', 'qtd_em_estoque', 'fornecedor_id', 'custo_no_fornecedor'),
+    'tbl_pedido': ('cliente_id', 'carrinho_id', 'data_hora', 'status'),
+}
+
+# Linhas enviadas ao banco por INSERT de várias linhas e limite de linhas por requisição
+LOTE_INSERCAO = int(os.getenv('INSERCAO_LOTE', 1000))
+LIMITE_LOTE = int(os.getenv('INSERCAO_LIMITE', 50000))
+
+
+def ler_lote():
+    """Lê o corpo da requisição como uma lista JSON ou NDJSON. Lança ValueError se for inválido."""
+    if request.mimetype == 'application/x-ndjson':
+        linhas = []
+        for numero, linha in enumerate(request.get_data(as_text=True).splitlines(), start=1):
+            if not linha.strip():
+                continue
+            try:
+                linhas.append(json.loads(linha))
+            except ValueError:
+                raise ValueError(f"JSON inválido na linha {numero}")
+    else:
+        linhas = request.get_json(silent=True)
+        if not isinstance(linhas, list):
+            raise ValueError("O corpo da requisição deve ser uma lista JSON ou NDJSON")
+
+    if not linhas:
+        raise ValueError("Nenhum registro enviado")
+    if len(linhas) > LIMITE_LOTE:
+        raise ValueError(f"O lote deve ter no máximo {LIMITE_LOTE} registros")
+    return linhas
+
+
+def valida_lote(tabela, linhas):
+    """Separa as linhas válidas das inválidas, retornando (valores, erros)."""
+    campos = CAMPOS_INSERCAO[tabela]
+    validas = []  # Lista de (índice, valores) prontos para o INSERT
+    erros = []
+    for indice, linha in enumerate(linhas):
+        if not isinstance(linha, dict):
+            erros.append({"indice": indice, "erro": "Registro deve ser um objeto JSON"})
+            continue
+        faltando = [campo for campo in campos if linha.get(campo) is None]
+        if faltando:
+            erros.append({"indice": indice, "erro": f"Campos obrigatórios ausentes: {', '.join(faltando)}"})
+            continue
+        validas.append((indice, tuple(linha[campo] for campo in campos)))
+    return validas, erros
+
+
+def verifica_referencias(cursor, tabela, validas, referencias):
+    """Confere as chaves estrangeiras do lote com um SELECT ... IN (...) por tabela referenciada.
+
+    referencias mapeia o campo para (tabela referenciada, mensagem de erro). Retorna (validas, erros).
+    """
+    campos = CAMPOS_INSERCAO[tabela]
+    erros = []
+    for campo, (tabela_ref, mensagem) in referencias.items():
+        posicao = campos.index(campo)
+        ids = list({valores[posicao] for _, valores in validas})
+        existentes = set()
+        # Divide a lista de ids para não gerar consultas grandes demais
+        for inicio in range(0, len(ids), LOTE_INSERCAO):
+            pedaco = ids[inicio:inicio + LOTE_INSERCAO]
+            cursor.execute(f"SELECT id FROM {tabela_ref} WHERE id IN ({', '.join(['%s'] * len(pedaco))})", pedaco)
+            existentes.update(linha[0] for linha in cursor.fetchall())
+
+        restantes = []
+        for indice, valores in validas:
+            if valores[posicao] in existentes:
+                restantes.append((indice, valores))
+            else:
+                erros.append({"indice": indice, "erro": mensagem})
+        validas = restantes
+    return validas, erros
+
+
+def insere_lote(tabela, chave, referencias=None):
+    """Valida e insere um lote de registros em uma única transação, com INSERTs de várias linhas."""
+    try:
+        linhas = ler_lote()
+    except ValueError as err:
+        return {"erro": str(err)}, 400
+
+    validas, erros = valida_lote(tabela, linhas)
+    if tabela == 'tbl_clientes' and len(validas) > SENHA_LOTE_MAXIMO:
+        return {"erro": f"O lote de clientes deve ter no máximo {SENHA_LOTE_MAXIMO} registros"}, 413
+    if tabela == 'tbl_clientes' and validas:
+        # As senhas viram hash antes de o lote ocupar uma conexão do banco
+        try:
+            validas, erros = cifra_senhas_do_lote(validas, erros)
+        except SenhasOcupadas:
+            return resposta_senhas_ocupadas()
+    if not validas:
+        return {"erro": "Nenhum registro válido", "erros": erros}, 400
+
+    conn = connect_db()
+    if conn is None:
+        return {"erro": "Erro ao conectar ao banco de dados"}, 500
+
+    campos = CAMPOS_INSERCAO[tabela]
+    # Com a gravação adiada, os ids da tabela saem de tbl_sequencias: o AUTO_INCREMENT poderia
+    # repetir ids de blocos já entregues e ainda não gravados
+    ids_explicitos = fila_gravacao is not None and tabela in TABELAS_ADIADAS.values()
+    if ids_explicitos:
+        campos = ('id',) + campos
+    sql = TABELAS[tabela].sql_insercao(campos)
+    cursor = conn.cursor()
+    resultados = []
+    try:
+        if ids_explicitos:
+            # Um intervalo contínuo para o lote inteiro, reservado antes de abrir a transação do lote
+            primeiro_do_lote = aloca_ids(tabela, len(validas))
+        conn.start_transaction()
+        if referencias:
+            # Descarta as linhas que apontam para registros inexistentes
+            validas, erros_ref = verifica_referencias(cursor, tabela, validas, referencias)
+            erros = sorted(erros + erros_ref, key=lambda erro: erro["indice"])
+            if not validas:
+                conn.rollback()
+                return {"erro": "Nenhum registro válido", "erros": erros}, 400
+        for inicio in range(0, len(validas), LOTE_INSERCAO):
+            pedaco = validas[inicio:inicio + LOTE_INSERCAO]
+            if ids_explicitos:
+                primeiro_id = primeiro_do_lote + inicio
+                cursor.executemany(sql, [(primeiro_id + posicao, *valores)
+                                         for posicao, (_, valores) in enumerate(pedaco)])
+            else:
+                # O conector transforma o executemany em um único INSERT ... VALUES (...), (...)
+                cursor.executemany(sql, [valores for _, valores in pedaco])
+                # Em um INSERT de várias linhas o MySQL gera ids consecutivos a partir do lastrowid
+                primeiro_id = cursor.lastrowid
+            for posicao, (indice, _) in enumerate(pedaco):
+                resultados.append({"indice": indice, "id": primeiro_id + posicao})
+            if tabela == 'tbl_pedido':
+                # Soma o pedaço inteiro ao resumo de receita com uma única consulta
+                resumos.ajusta(cursor, 'lote_pedidos', (primeiro_id, primeiro_id + len(pedaco) - 1), 1)
+        conn.commit()
+        # Um único aumento de versão para o lote inteiro
+        registra_alteracao(tabela)
+        if tabela in indices_busca:
+            for resultado, (_, valores) in zip(resultados, validas):
+                indexa(tabela, resultado['id'], dict(zip(CAMPOS_INSERCAO[tabela], valores)))
+    except Error as err:
+        conn.rollback()
+        print(f"Erro ao inserir lote em {tabela}: {err}")
+        return {"erro": f"Erro ao inserir {chave}, nenhum registro foi cadastrado"}, 500
+    finally:
+        cursor.close()
+        conn.close()
+
+    resp = {
+        "cadastrados": len(resultados),
+        chave: resultados,
+        "erros": erros
+    }
+    return resp, 201
+
+
+def ler_busca():
+    """Lê q, limit e after de uma busca. Lança ValueError se algum parâmetro for inválido."""
+    consulta = request.args.get('q', '')
+    palavras = termos(consulta, consulta=True)
+    if not palavras:
+        raise ValueError("Informe o texto da busca no parâmetro q")
+    try:
+        limite = int(request.args.get('limit', LIMITE_PADRAO))
+    except ValueError:
+        raise ValueError("O parâmetro limit deve ser um número inteiro")
+    if limite < 1:
+        raise ValueError("O parâmetro limit deve ser maior que zero")
+
+    # O cursor da busca guarda a relevância e o id do último resultado
+    apos = request.args.get('after')
+    if apos:
+        id, sort, valor = decodifica_cursor(apos)
+        try:
+            if sort != 'relevancia':
+                raise ValueError
+            apos = (float(valor), id)
+        except (TypeError, ValueError):
+            raise ValueError("Cursor inválido para esta busca")
+    else:
+        apos = None
+    return consulta, palavras, min(limite, LIMITE_MAXIMO), apos
+
+
+def busca_registros(tabela, chave):
+    """Busca por relevância: no índice em memória, se carregado, ou nos índices FULLTEXT do MySQL."""
+    try:
+        consulta, palavras, limite, apos = ler_busca()
+    except ValueError as err:
+        return {"erro": str(err)}, 400
+
+    conn = connect_db()
+    if conn is None:
+        return {"erro": "Erro ao conectar ao banco de dados"}, 500
+
+    colunas = COLUNAS_BUSCA[tabela]
+    indice = indices_busca.get(tabela)
+    proximo = None
+    cursor = conn.cursor()
+    try:
+        if indice is not None and indice.pronto:
+            # O ranking sai do índice; o banco só devolve as linhas da página, pela chave primária
+            encontrados = indice.busca(consulta, limite + 1, apos)
+            if len(encontrados) > limite:
+                del encontrados[limite:]
+                proximo = codifica_cursor(encontrados[-1][1], 'relevancia', encontrados[-1][0])
+            linhas = []
+            if encontrados:
+                cursor.execute(f"SELECT {', '.join(colunas)} FROM {tabela} "
+                               f"WHERE id IN ({', '.join(['%s'] * len(encontrados))})", [id for _, id in encontrados])
+                por_id = {linha[0]: linha for linha in cursor.fetchall()}
+                # Um registro removido por outro processo pode continuar no índice até a recarga
+                linhas = [por_id[id] + (relevancia,) for relevancia, id in encontrados if id in por_id]
+        else:
+            booleana = consulta_booleana(palavras)
+            valores = [booleana, booleana] + ([apos[0], apos[0], apos[1]] if apos else []) + [limite + 1]
+            cursor.execute(sql_busca(tabela, apos is not None), valores)
+            linhas = cursor.fetchall()
+            if len(linhas) > limite:
+                del linhas[limite:]
+                proximo = codifica_cursor(linhas[-1][0], 'relevancia', linhas[-1][-1])
+    except Error as err:
+        print(f"Erro na busca de {chave}: {err}")
+        return {"erro": f"Erro na busca de {chave}"}, 500
+    finally:
+        cursor.close()
+        conn.close()
+
+    resp = {
+        chave: [dict(zip(colunas + ('relevancia',), linha)) for linha in linhas],
+        "proximo": proximo
+    }
+    return resp, 200
+
+
+def sugestoes_busca(tabela):
+    """Autocompletar: termos do índice em memória que completam a última palavra de q."""
+    indice = indices_busca.get(tabela)
+    if indice is None or not indice.pronto:
+        return {"erro": "Sugestões exigem o índice de busca em memória (BUSCA_MEMORIA=1)"}, 501
+    try:
+        limite = min(int(request.args.get('limit', 10)), LIMITE_MAXIMO)
+    except ValueError:
+        return {"erro": "O parâmetro limit deve ser um número inteiro"}, 400
+    return {"sugestoes": indice.sugestoes(request.args.get('q', ''), limite)}, 200
 
 
 app = Flask(__name__)
+# Provedor JSON plugável: 'padrao' (json da biblioteca padrão) ou 'orjson'
+app.json = PROVEDORES[os.getenv('JSON_PROVIDER', 'padrao')](app)
+
+
+def cria_cliente_compartilhado():
+    """Cliente no formato do Redis compartilhado entre os processos, ou None se não configurado."""
+    backend = os.getenv('CACHE_COMPARTILHADO')  # 'redis' ou 'memoria'
+    if backend == 'redis':
+        import redis  # Dependência opcional, só necessária com o cache compartilhado
+        return redis.Redis.from_url(os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+    if backend == 'memoria':
+        return ClienteMemoria()
+    return None
+
+
+def cria_cache(cliente):
+    """Monta o cache de leitura por id: LRU local e, opcionalmente, um cache compartilhado."""
+    local = CacheLRU(int(os.getenv('CACHE_TAMANHO', 1024)), int(os.getenv('CACHE_TTL', 60)))
+    compartilhado = None
+    if cliente is not None:
+        compartilhado = CacheCompartilhado(cliente, ttl=int(os.getenv('CACHE_TTL_COMPARTILHADO', 300)),
+                                           serializar=app.json.dumps, desserializar=json.loads)
+    return CacheEmCamadas(local, compartilhado)
+
+
+cliente_compartilhado = cria_cliente_compartilhado()
+cache = cria_cache(cliente_compartilhado)
+# Versões das tabelas e registros usadas nas ETags. Com vários workers, os contadores precisam
+# ficar no cliente compartilhado, senão cada processo teria a sua própria versão
+versoes = Versoes(cliente_compartilhado)
+# Estoque dos produtos quentes, reservado em memória (ou no cliente compartilhado, com vários workers)
+reservas = Reservas(cliente_compartilhado)
+# Respostas dos POST com Idempotency-Key: LRU do processo e, com vários workers, o cliente compartilhado
+idempotencia = Idempotencia(cliente_compartilhado, tamanho=int(os.getenv('IDEMPOTENCIA_TAMANHO', 10000)),
+                            ttl=int(os.getenv('IDEMPOTENCIA_TTL', 86400)),
+                            espera=int(os.getenv('IDEMPOTENCIA_ESPERA', 30)))
+# Índices de busca em memória (BUSCA_MEMORIA=1), carregados do banco em cada processo e recarregados a
+# cada BUSCA_RECARGA segundos se outro processo alterou a tabela. Sem eles, a busca usa os índices
+# FULLTEXT do MySQL (migracoes/005_busca.sql)
+indices_busca = {tabela: IndiceInvertido(campos) for tabela, campos in CAMPOS_BUSCA.items()} \
+    if os.getenv('BUSCA_MEMORIA') == '1' else {}
+BUSCA_RECARGA = float(os.getenv('BUSCA_RECARGA', 60))
+# Coalescência (single-flight) das leituras por id e das listagens: requisições simultâneas iguais fazem
+# uma única consulta ao banco. COALESCENCIA=0 desliga; COALESCENCIA_CHAVES limita as chaves em /status
+coalescedor = Coalescedor(int(os.getenv('COALESCENCIA_CHAVES', 1000))) \
+    if os.getenv('COALESCENCIA', '1') == '1' else None
+
+
+def registra_hash_senha(operacao, total, calculo):
+    """Observador do serviço de senhas: latência de cada hash, também exposta no Server-Timing."""
+    metrica_senha.observar(total, operacao=operacao, fase='total')
+    metrica_senha.observar(calculo, operacao=operacao, fase='calculo')
+    if has_request_context() and 'tempos' in g:
+        g.tempos['senha'] += total
+
+
+# Hash das senhas dos clientes (scrypt) em um pool de processos, fora das threads das requisições.
+# Mudar os parâmetros de custo refaz o hash de cada cliente no próximo login
+senhas = ServicoDeSenhas(
+    processos=int(os.getenv('SENHA_PROCESSOS', 2)),  # 0 calcula na própria thread da requisição
+    fila=int(os.getenv('SENHA_FILA', 32)),  # Cálculos esperando um processo; além disso a requisição recebe 503
+    timeout=float(os.getenv('SENHA_TIMEOUT', 5)),  # Segundos até desistir de um cálculo
+    log_n=int(os.getenv('SENHA_SCRYPT_LOG_N', 14)),  # n = 2 ** log_n: memória (128 * r * n bytes) e CPU
+    r=int(os.getenv('SENHA_SCRYPT_R', 8)),
+    p=int(os.getenv('SENHA_SCRYPT_P', 1)),
+    prioridade=int(os.getenv('SENHA_PRIORIDADE', 10)),  # Nice extra dos processos de hash
+    observador=registra_hash_senha,
+    lote=int(os.getenv('SENHA_LOTE_PROCESSOS', 1)),  # Vagas usadas ao mesmo tempo por um POST /clientes/lote
+)
+# Clientes por POST /clientes/lote, bem abaixo de INSERCAO_LIMITE: cada linha custa um hash de senha
+SENHA_LOTE_MAXIMO = int(os.getenv('SENHA_LOTE_MAXIMO', 200))
+
+# Prazo da reserva de um item de carrinho, intervalo da reconciliação com o banco e itens vencidos
+# removidos por rodada
+RESERVA_TTL = int(os.getenv('RESERVA_TTL', 1800))
+RESERVA_INTERVALO = float(os.getenv('RESERVA_INTERVALO', 1))
+RESERVA_LOTE = int(os.getenv('RESERVA_LOTE', 500))
+
+
+def chave_cache(tabela, id, versao):
+    """Chave de um registro no cache de leitura, com a versão (ETag) lida antes da consulta, ou None.
+
+    Uma escrita muda a versão, então a leitura que começou antes dela guarda a linha antiga numa chave
+    que ninguém mais procura, e o LRU local de cada worker nunca serve um registro alterado em outro.
+    Sem versão (falha ao lê-la) o cache não é usado.
+    """
+    if versao is None:
+        return None
+    return f"{tabela}:{id}:{versao[0]}"
+
+
+def le_coalescido(chave, consulta):
+    """Executa consulta() uma única vez para as requisições simultâneas com a mesma chave.
+
+    Cada requisição recebe a sua cópia (rasa) do resultado, que pode ser alterada (ex.: proxima_pagina).
+    A chave inclui a versão lida pela requisição: quem viu uma escrita não recebe o resultado de uma
+    consulta que começou antes dela (e que iria para o cache com a ETag nova).
+    """
+    if coalescedor is None:
+        return consulta()
+    # Leituras que podem ir para uma réplica não são juntadas às que precisam do primário
+    resultado = coalescedor.executa((pode_ler_da_replica(),) + chave, consulta, rotulo=request.full_path.rstrip('?'))
+    return copy.copy(resultado)
+
+
+def le_registro(tabela, id, versao):
+    """Busca o registro pelo id no banco, ou None se não existir.
+
+    Lança Error se não houver conexão ou se a consulta falhar; com a coalescência, o mesmo erro chega a
+    todas as requisições que esperavam pela consulta.
+    """
+    def consulta():
+        conn = connect_db()  # Conecta ao banco de dados
+        if conn is None:
+            raise Error("Erro ao conectar ao banco de dados")
+        try:
+            # Busca o registro pelo ID com o statement preparado da conexão
+            return Repositorio(conn, tabela).busca(id)
+        finally:
+            # Devolve a conexão ao pool
+            conn.close()
+    return le_coalescido(('registro', tabela, id, versao), consulta)
+
+
+def le_pagina(pagina, versao):
+    """Busca as linhas (tuplas) de uma página da listagem, ou None se não houver conexão com o banco."""
+    def consulta():
+        conn = connect_db()
+        if conn is None:
+            return None
+        try:
+            # Busca a página pedida com uma linha a mais (para saber se existe próxima página), selecionando
+            # apenas as colunas solicitadas, com os filtros e a ordenação no próprio SQL
+            return Repositorio(conn, pagina['tabela']).pagina(
+                pagina['colunas'], pagina['apos'], pagina['limite'] + 1, pagina['filtros'], pagina['ordem'],
+                pagina['descendente'])
+        finally:
+            conn.close()
+    # O SQL com os valores identifica a página, qualquer que seja a ordem dos parâmetros na URL
+    sql, valores = sql_pagina(pagina)
+    return le_coalescido(('pagina', sql, tuple(valores), versao), consulta)
+
+
+def registra_alteracao(tabela, id=None):
+    """Chamada depois do commit: muda as versões das ETags, o que também invalida o registro no cache de leitura."""
+    try:
+        versoes.altera(tabela, id)
+    except Exception as err:
+        print(f"Erro ao registrar alteração em {tabela}: {err}")
+
+
+def aquece_reserva(conn, produto_id):
+    """Cria (ou recalcula) o contador do produto quente com a linha bloqueada. Retorna o estoque, ou None."""
+    cursor = conn.cursor()
+    try:
+        # O bloqueio espera as reservas pelo banco em andamento e segura as próximas até o produto estar em
+        # quentes(); elas então reservam pelo contador (baixa_estoque)
+        conn.start_transaction()
+        cursor.execute("SELECT qtd_em_estoque FROM tbl_produtos WHERE id = %s FOR UPDATE", (produto_id,))
+        produto = cursor.fetchone()
+        if produto is not None:
+            reservas.aquece(produto_id, produto[0])
+        conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return produto[0] if produto is not None else None
+
+
+def baixa_estoque(cursor, produto_id, quantidade):
+    """Reserva no banco o estoque de um produto comum, dentro da transação do cursor.
+
+    Retorna como Reservas.reserva: None se a baixa foi feita no banco, False se falta estoque (ou o
+    produto não existe) e True se o produto ficou quente antes do bloqueio e a reserva foi feita no contador.
+    """
+    cursor.execute("UPDATE tbl_produtos SET qtd_em_estoque = qtd_em_estoque - %s WHERE id = %s AND qtd_em_estoque >= %s",
+                   (quantidade, produto_id, quantidade))
+    if cursor.rowcount == 0:
+        return False
+    # Com a linha bloqueada por este UPDATE o produto não passa a ser quente antes do commit
+    if produto_id not in reservas.quentes():
+        return None
+    # O contador foi criado com o estoque de antes desta baixa: ela é desfeita e a reserva passa para ele
+    cursor.execute("UPDATE tbl_produtos SET qtd_em_estoque = qtd_em_estoque + %s WHERE id = %s",
+                   (quantidade, produto_id))
+    return reservas.reserva(produto_id, quantidade) is True
+
+
+def ciclo_reservas():
+    """Uma rodada do trabalho assíncrono das reservas: aplica no banco as reservas dos produtos quentes
+    e remove um lote de itens de carrinho com a reserva vencida."""
+    conn = get_pool().obter()
+    try:
+        produtos = reconcilia(conn, reservas)
+        itens = expira(conn, reservas, datetime.now(), RESERVA_LOTE)
+    finally:
+        conn.close()
+    for produto_id in produtos:
+        registra_alteracao('tbl_produtos', produto_id)
+    for id, produto_id, _, cliente_id in itens:
+        registra_alteracao('tbl_carrinho', id)
+        registra_alteracao('tbl_produtos', produto_id)
+        registra_alteracao('carrinho_cliente', cliente_id)
+
+
+def reconciliador():
+    """Laço da thread de reservas de cada processo."""
+    while True:
+        time.sleep(RESERVA_INTERVALO)
+        try:
+            ciclo_reservas()
+        except Exception as err:
+            # Uma rodada com erro não para a thread: os pendentes ficam para a próxima
+            print(f"Erro na reconciliação das reservas: {err}")
+
+
+def carrega_indice(tabela):
+    """Recarrega do banco o índice de busca em memória da tabela, lendo as linhas em lotes."""
+    versao = versoes.versao_tabela(tabela)[0]
+    colunas = ('id',) + CAMPOS_BUSCA[tabela]
+    conn = get_pool().obter()
+    # Cursor sem buffer: a tabela inteira não fica na memória ao mesmo tempo que o índice novo
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT {', '.join(colunas)} FROM {tabela}")
+        linhas = (dict(zip(colunas, linha)) for lote in iter(lambda: cursor.fetchmany(LOTE_STREAMING), [])
+                  for linha in lote)
+        indices_busca[tabela].carrega(linhas, versao)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def mantem_indices():
+    """Laço da thread dos índices de busca: carga inicial e recargas depois de escritas de outros processos."""
+    while True:
+        for tabela, indice in indices_busca.items():
+            # Sem cliente compartilhado há um único processo, e as escritas dele já chegam ao índice
+            desatualizado = cliente_compartilhado is not None and versoes.versao_tabela(tabela)[0] != indice.versao
+            if not indice.pronto or desatualizado:
+                try:
+                    carrega_indice(tabela)
+                except Exception as err:
+                    print(f"Erro ao carregar o índice de busca de {tabela}: {err}")
+        time.sleep(BUSCA_RECARGA)
+
+
+def indexa(tabela, id, registro=None):
+    """Leva ao índice de busca em memória uma escrita já confirmada (registro=None remove o registro)."""
+    indice = indices_busca.get(tabela)
+    if indice is None:
+        return
+    if registro is None:
+        indice.remove(id)
+    else:
+        indice.atualiza(id, registro)
+
+
+def reindexa(conn, tabela, id, entrada):
+    """Depois de um UPDATE: relê o registro e o reindexa, se algum campo pesquisado mudou."""
+    if tabela in indices_busca and any(campo in entrada for campo in CAMPOS_BUSCA[tabela]):
+        indexa(tabela, id, Repositorio(conn, tabela).busca(id))
+
+
+def aloca_ids(tabela, quantidade):
+    """Reserva em tbl_sequencias um intervalo de `quantidade` ids da tabela e retorna o primeiro."""
+    conn = get_pool().obter()
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        cursor.execute("SELECT proximo FROM tbl_sequencias WHERE tabela = %s FOR UPDATE", (tabela,))
+        proximo = cursor.fetchone()[0]
+        # Ids já gravados pelo AUTO_INCREMENT (com a gravação adiada desligada) ficam fora do intervalo
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {tabela}")
+        primeiro = max(proximo, cursor.fetchone()[0])
+        cursor.execute("UPDATE tbl_sequencias SET proximo = %s WHERE tabela = %s", (primeiro + quantidade, tabela))
+        conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return primeiro
+
+
+def grava_itens(conn, itens):
+    """Grava em uma transação itens da fila de gravação adiada. Retorna (gravados, rejeitados (item, motivo))."""
+    cursor = conn.cursor()
+    gravados, rejeitados = [], []
+    try:
+        conn.start_transaction()
+        # O log pode ser reaplicado depois de uma queda: os itens que já estão no banco são ignorados
+        existentes = set()
+        for tipo, tabela in TABELAS_ADIADAS.items():
+            ids = [item['id'] for item in itens if item['tipo'] == tipo]
+            if ids:
+                cursor.execute(f"SELECT id FROM {tabela} WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+                existentes.update((tipo, id) for id, in cursor.fetchall())
+
+        # Um INSERT por item, na ordem de chegada: um pedido pode usar um carrinho do mesmo lote
+        for item in itens:
+            if (item['tipo'], item['id']) in existentes:
+                continue
+            if item['tipo'] == 'carrinho':
+                if not item['reservado']:
+                    # Produto comum: o estoque só é baixado agora, e pode ter acabado depois do aceite
+                    reservado = baixa_estoque(cursor, item['produto_id'], item['quantidade'])
+                    if reservado is False:
+                        print(f"Item de carrinho {item['id']} rejeitado: quantidade não disponível")
+                        rejeitados.append((item, "Quantidade solicitada não disponível"))
+                        continue
+                    # O produto ficou quente: a reserva já está no contador, também se o lote for refeito
+                    item['reservado'] = bool(reservado)
+                cursor.execute("INSERT INTO tbl_carrinho (id, produto_id, quantidade, cliente_id, reservado_ate) "
+                               "VALUES (%s, %s, %s, %s, %s)",
+                               (item['id'], item['produto_id'], item['quantidade'], item['cliente_id'],
+                                datetime.fromisoformat(item['reservado_ate'])))
+                resumos.ajusta(cursor, 'carrinho', (item['id'],), 1)
+            else:
+                cursor.execute("INSERT INTO tbl_pedido (id, cliente_id, carrinho_id, data_hora, status) "
+                               "VALUES (%s, %s, %s, %s, %s)",
+                               (item['id'], item['cliente_id'], item['carrinho_id'], item['data_hora'], item['status']))
+                resumos.ajusta(cursor, 'pedido', (item['id'],), 1)
+            gravados.append(item)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return gravados, rejeitados
+
+
+def grava_fila(itens):
+    """Gravação de um lote da fila em um único commit. Um erro do banco sobe para a fila, que repete o lote
+    (erro_transitorio) ou grava os itens um a um e descarta os recusados."""
+    conn = get_pool().obter()
+    try:
+        gravados, rejeitados = grava_itens(conn, itens)
+    finally:
+        conn.close()
+
+    for item in gravados:
+        if item['tipo'] == 'carrinho':
+            registra_alteracao('tbl_carrinho', item['id'])
+            registra_alteracao('carrinho_cliente', item['cliente_id'])
+            if not item['reservado']:
+                registra_alteracao('tbl_produtos', item['produto_id'])
+        else:
+            registra_alteracao('tbl_pedido', item['id'])
+    return rejeitados
+
+
+# Erros do MySQL em que a mesma escrita pode dar certo mais tarde: espera por bloqueio esgotada,
+# deadlock e conexão recusada ou perdida
+ERROS_TRANSITORIOS = {1205, 1213, 2002, 2003, 2006, 2013, 2055}
+
+
+def erro_transitorio(err):
+    """Indica se um lote da fila deve ser repetido. Os demais erros (ex.: 1292, 1452) são de algum item."""
+    if isinstance(err, (PoolError, InterfaceError, OSError)):
+        return True
+    return isinstance(err, Error) and err.errno in ERROS_TRANSITORIOS
+
+
+def descarta_escrita(item):
+    """Item aceito que não será gravado (está no log de rejeitados): devolve o estoque reservado no contador."""
+    print(f"Escrita adiada rejeitada ({item['tipo']} {item['id']})")
+    if item.get('reservado'):
+        reservas.devolve(item['produto_id'], item['quantidade'])
+
+
+# Gravação adiada (write-behind) de carrinhos e pedidos, opcional (GRAVACAO_ADIADA=1). As escritas
+# aceitas vão para um log local e são gravadas no banco em lotes, com ids tirados de blocos
+# reservados em tbl_sequencias (migracoes/004_sequencias.sql)
+TABELAS_ADIADAS = {'carrinho': 'tbl_carrinho', 'pedido': 'tbl_pedido'}
+alocador = AlocadorDeIds(aloca_ids, int(os.getenv('GRAVACAO_BLOCO_IDS', 1000)))
+fila_gravacao = None
+if os.getenv('GRAVACAO_ADIADA') == '1':
+    fila_gravacao = FilaDeGravacao(
+        os.getenv('GRAVACAO_LOG', 'gravacao'), grava_fila,
+        capacidade=int(os.getenv('GRAVACAO_CAPACIDADE', 10000)),  # Acima disso as escritas recebem 503
+        lote=int(os.getenv('GRAVACAO_LOTE', 500)),  # Itens por commit
+        intervalo=float(os.getenv('GRAVACAO_INTERVALO', 0.05)),  # Segundos de espera para juntar um lote
+        sincronizar=os.getenv('GRAVACAO_FSYNC', '1') == '1',  # fsync do log antes de responder
+        transitorio=erro_transitorio, descartado=descarta_escrita,
+    )
+
+
+def resposta_senhas_ocupadas():
+    # Contrapressão: os processos de hash não estão dando conta, o cliente tenta de novo depois
+    return {"erro": "Servidor ocupado calculando senhas, tente novamente em instantes"}, 503, {"Retry-After": "1"}
+
+
+def senha_valida(senha):
+    return isinstance(senha, str) and senha != ''
+
+
+def cifra_senha(entrada):
+    """Troca a senha em texto da entrada pelo hash. Retorna None, ou a resposta de erro."""
+    if not senha_valida(entrada.get('senha')):
+        return {"erro": "A senha deve ser um texto não vazio"}, 400
+    try:
+        entrada['senha'] = senhas.gera(entrada['senha'])
+    except SenhasOcupadas:
+        return resposta_senhas_ocupadas()
+    return None
+
+
+def cifra_senhas_do_lote(validas, erros):
+    """Troca as senhas das linhas válidas de um lote de clientes pelos hashes. Retorna (validas, erros).
+
+    Lança SenhasOcupadas se não houver vaga para os cálculos a tempo.
+    """
+    posicao = CAMPOS_INSERCAO['tbl_clientes'].index('senha')
+    restantes = []
+    for indice, valores in validas:
+        if senha_valida(valores[posicao]):
+            restantes.append((indice, valores))
+        else:
+            erros.append({"indice": indice, "erro": "A senha deve ser um texto não vazio"})
+    hashes = senhas.gera_varias([valores[posicao] for _, valores in restantes])
+    validas = [(indice, valores[:posicao] + (hash_senha,) + valores[posicao + 1:])
+               for (indice, valores), hash_senha in zip(restantes, hashes)]
+    return validas, sorted(erros, key=lambda erro: erro["indice"])
+
+
+def converte_entrada(tabela, entrada, colunas):
+    """Converte os campos obrigatórios da entrada JSON para os tipos das colunas.
+
+    Lança ValueError se faltar algum campo ou se algum valor for inválido.
+    """
+    definicao = TABELAS[tabela]
+    faltando = [coluna for coluna in colunas if entrada.get(coluna) is None]
+    if faltando:
+        # Sem esta verificação o str() de uma coluna de texto gravaria 'None'
+        raise ValueError(f"Campos obrigatórios ausentes: {', '.join(faltando)}")
+    valores = {}
+    for coluna in colunas:
+        valor = entrada[coluna]
+        tipo = definicao.tipos[coluna]
+        # O converte() aceitaria true como 1, truncaria 2.5 e passaria listas e números pelo str()
+        if isinstance(valor, (bool, float, list, dict)) or (tipo in (str, datetime) and not isinstance(valor, str)):
+            raise ValueError(f"Valor inválido para {coluna}: {valor}")
+        valores[coluna] = definicao.converte(coluna, valor)
+    return valores
+
+
+def aceita_escrita(item):
+    """Coloca o item na fila de gravação adiada. Retorna None, ou a resposta 503 se a fila estiver cheia."""
+    try:
+        fila_gravacao.registra(item)
+    except FilaCheia:
+        # Contrapressão: o banco não está dando conta das escritas, o cliente tenta de novo depois
+        return {"erro": "Fila de gravação cheia, tente novamente em instantes"}, 503, {"Retry-After": "1"}
+    return None
+
+
+def clientes_com_produto(conn, produto_id):
+    """Clientes com o produto no carrinho, cuja visão detalhada do carrinho muda junto com o produto."""
+    # Consulta coberta pelo índice em tbl_carrinho (produto_id)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT DISTINCT cliente_id FROM tbl_carrinho WHERE produto_id = %s", (produto_id,))
+        return [cliente_id for (cliente_id,) in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def versao_atual(tabela, id=None):
+    """Retorna (ETag, alterado em) da listagem da tabela ou do registro, ou None se não for possível ler.
+
+    A versão é lida antes da consulta ao banco: se houver uma escrita no meio, a resposta sai com a
+    versão antiga e o próximo GET condicional busca os dados de novo.
+    """
+    try:
+        versao = versoes.etag_tabela(tabela) if id is None else versoes.etag_registro(tabela, id)
+    except Exception as err:
+        print(f"Erro ao ler a versão de {tabela}: {err}")
+        return None
+    # Usada na escolha entre réplica e primário (escolhe_replica)
+    g.alterado_em = max(g.get('alterado_em', 0), versao[1])
+    return versao
+
+
+def nao_modificado(versao):
+    """Retorna uma resposta 304 se o cliente já tem esta versão (If-None-Match ou If-Modified-Since), senão None."""
+    if versao is None:
+        return None
+    etag, alterado_em = versao
+    # O If-None-Match tem precedência; o If-Modified-Since só vale quando não há ETag na requisição
+    if request.if_none_match:
+        # A ETag de uma resposta comprimida leva o nome da codificação no final
+        candidatas = [etag] + [f"{etag}-{codificador.nome}" for codificador in CODIFICADORES]
+        etag = next((c for c in candidatas if request.if_none_match.contains_weak(c)), None)
+        modificado = etag is None
+    elif request.if_modified_since:
+        modificado = int(alterado_em) > request.if_modified_since.timestamp()
+    else:
+        return None
+    if modificado:
+        return None
+    g.versao = (etag, alterado_em)
+    # Nem o banco nem o serializador são usados: o after_request só acrescenta ETag e Last-Modified
+    return Response(status=304)
+
+
+# Compressão das respostas: codificações em ordem de preferência (as de bibliotecas não instaladas
+# são ignoradas) e tamanho mínimo do corpo, abaixo do qual comprimir não compensa
+CODIFICADORES = codificadores_disponiveis(os.getenv('COMPRESSAO_CODIFICACOES', 'zstd,br,gzip').split(','))
+COMPRESSAO_MINIMO = int(os.getenv('COMPRESSAO_MINIMO', 1024))
+TIPOS_COMPRIMIVEIS = ('application/json', 'application/x-ndjson', 'text/plain')
+# Corpos comprimidos das respostas com ETag: uma versão é comprimida uma única vez por codificação
+cache_comprimido = CacheLRU(int(os.getenv('COMPRESSAO_CACHE_TAMANHO', 256)), int(os.getenv('CACHE_TTL', 60)))
+
+
+def codificador_da_requisicao():
+    """Codificador negociado pelo Accept-Encoding da requisição atual, ou None."""
+    return escolhe_codificador(CODIFICADORES, request.accept_encodings)
+
+
+def comprime_resposta(response):
+    """Comprime o corpo da resposta com a codificação negociada. Retorna o nome da codificação ou None."""
+    if response.mimetype not in TIPOS_COMPRIMIVEIS and response.status_code != 304:
+        return None
+    # Caches intermediários precisam guardar uma cópia por Accept-Encoding
+    response.vary.add('Accept-Encoding')
+    # Respostas em streaming são comprimidas pelo próprio gerador
+    if response.is_streamed or response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return None
+    codificador = codificador_da_requisicao()
+    if codificador is None:
+        return None
+    corpo = response.get_data()
+    if len(corpo) < COMPRESSAO_MINIMO:
+        return None
+
+    inicio = time.perf_counter()
+    versao = g.get('versao')
+    chave = comprimido = None
+    if versao is not None:
+        # A ETag identifica o conteúdo, então o corpo comprimido pode ser reaproveitado
+        chave = f"{versao[0]}|{codificador.nome}|{request.full_path}"
+        comprimido = cache_comprimido.obter(chave)
+    if comprimido is None:
+        comprimido = codificador.comprime(corpo)
+        if chave is not None:
+            cache_comprimido.guardar(chave, comprimido)
+    g.tempos['compressao'] += time.perf_counter() - inicio
+
+    response.set_data(comprimido)
+    response.headers['Content-Encoding'] = codificador.nome
+    return codificador.nome
+
+
+@app.before_request
+def inicia_medicao():
+    # Tempos da requisição atual: conexao, execute, fetch, serializacao, compressao e senha (hash)
+    g.inicio = time.perf_counter()
+    g.tempos = {'conexao': 0.0, 'execute': 0.0, 'fetch': 0.0, 'serializacao': 0.0, 'compressao': 0.0,
+                'senha': 0.0}
+
+
+@app.before_request
+def verifica_idempotencia():
+    # POST com Idempotency-Key: uma repetição recebe a resposta guardada sem executar a rota
+    chave = request.headers.get('Idempotency-Key')
+    if request.method != 'POST' or not chave:
+        return None
+    if len(chave) > 255:
+        return {"erro": "Idempotency-Key deve ter no máximo 255 caracteres"}, 400
+    chave = f"{request.path}:{chave}"  # A mesma chave em rotas diferentes são operações diferentes
+    impressao = Idempotencia.impressao(request.get_data())
+    situacao, registro = idempotencia.inicia(chave, impressao)
+    if situacao == 'em_andamento':
+        return {"erro": "Uma requisição com esta Idempotency-Key ainda está em andamento"}, 409, {"Retry-After": "1"}
+    if situacao == 'salva':
+        if registro['impressao'] != impressao:
+            return {"erro": "Idempotency-Key já usada com outro corpo"}, 422
+        resposta = Response(registro['corpo'], status=registro['status'], mimetype=registro['mimetype'])
+        resposta.headers['Idempotent-Replayed'] = 'true'
+        return resposta
+    g.idempotencia = (chave, impressao)
+    return None
+
+
+@app.after_request
+def registra_requisicao(response):
+    codificacao = comprime_resposta(response)
+    total = time.perf_counter() - g.inicio
+    rota = rota_atual()
+    metrica_requisicao.observar(total, rota=rota, metodo=request.method, status=response.status_code)
+    metrica_serializacao.observar(g.tempos['serializacao'], rota=rota)
+    if codificacao:
+        metrica_compressao.observar(g.tempos['compressao'], rota=rota, codificacao=codificacao)
+    # Respostas em streaming não têm tamanho conhecido neste momento
+    if not response.is_streamed:
+        metrica_bytes.observar(response.calculate_content_length() or 0, rota=rota)
+
+    # Expõe os tempos da requisição para o navegador/cliente no cabeçalho Server-Timing
+    partes = [f"{nome};dur={duracao * 1000:.2f}" for nome, duracao in g.tempos.items()]
+    partes.append(f"total;dur={total * 1000:.2f}")
+    response.headers['Server-Timing'] = ", ".join(partes)
+
+    # Validadores do GET condicional, definidos pelas rotas de leitura
+    versao = g.get('versao')
+    if versao is not None and response.status_code in (200, 304):
+        # Cada codificação é uma representação diferente, com a sua própria ETag forte
+        response.set_etag(f"{versao[0]}-{codificacao}" if codificacao else versao[0])
+        response.last_modified = int(versao[1])
+    return response
+
+
+# Registrado depois de registra_requisicao, roda antes dele: guarda o corpo ainda sem compressão
+@app.after_request
+def guarda_idempotencia(response):
+    pendente = g.pop('idempotencia', None)
+    if pendente is not None:
+        chave, impressao = pendente
+        if response.status_code >= 500 or response.is_streamed:
+            # Erros do servidor (inclusive a fila de gravação cheia) não são guardados: a repetição executa de novo
+            idempotencia.conclui(chave, None)
+        else:
+            idempotencia.conclui(chave, {"impressao": impressao, "status": response.status_code,
+                                         "mimetype": response.mimetype, "corpo": response.get_data(as_text=True)})
+    return response
+
+
+@app.after_request
+def fixa_no_primario(response):
+    # Leitura das próprias escritas: por alguns segundos depois de uma escrita, os GETs do cliente vão
+    # para o primário, já que as réplicas podem ainda não ter recebido a alteração
+    if config_replicas and request.method in ('POST', 'PUT', 'DELETE') and response.status_code < 400:
+        response.set_cookie(COOKIE_PRIMARIO, f"{time.time() + JANELA_LEITURA_PROPRIA:.3f}",
+                            max_age=int(JANELA_LEITURA_PROPRIA) + 1, httponly=True, samesite='Lax')
+    return response
+
+
+@app.teardown_request
+def libera_idempotencia(exc):
+    # Exceção na rota: o after_request não rodou e a chave precisa ser liberada
+    pendente = g.pop('idempotencia', None)
+    if pendente is not None:
+        idempotencia.conclui(pendente[0], None)
+
+
+@app.teardown_appcontext
+def devolve_conexoes(exc):
+    # Devolve ao pool as conexões que o handler não fechou (close() é idempotente)
+    for conn in g.pop('conexoes', []):
+        conn.close()
+
+
+@app.route('/status/pool', methods=['GET'])
+def status_pool():
+    return {"pool": get_pool().estatisticas()}, 200
+
+@app.route('/status/cache', methods=['GET'])
+def status_cache():
+    return {"cache": cache.estatisticas(), "comprimido": cache_comprimido.estatisticas()}, 200
+
+@app.route('/status/reservas', methods=['GET'])
+def status_reservas():
+    return {"reservas": reservas.estado()}, 200
+
+@app.route('/status/idempotencia', methods=['GET'])
+def status_idempotencia():
+    return {"idempotencia": idempotencia.estatisticas()}, 200
+
+@app.route('/status/busca', methods=['GET'])
+def status_busca():
+    return {"busca": {tabela: indice.estado() for tabela, indice in indices_busca.items()}}, 200
+
+@app.route('/status/senhas', methods=['GET'])
+def status_senhas():
+    return {"senhas": senhas.estatisticas()}, 200
+
+@app.route('/status/coalescencia', methods=['GET'])
+def status_coalescencia():
+    # Chaves com mais leituras atendidas por uma consulta em andamento (consultas poupadas ao banco)
+    return {"coalescencia": coalescedor.estatisticas() if coalescedor is not None else None}, 200
+
+@app.route('/status/replicas', methods=['GET'])
+def status_replicas():
+    get_pool()
+    return {"replicas": replicas.estado() if replicas is not None else None}, 200
+
+@app.route('/status/gravacao', methods=['GET'])
+def status_gravacao():
+    return {"gravacao": fila_gravacao.estado() if fila_gravacao is not None else None}, 200
+
+@app.route('/metrics', methods=['GET'])
+def exporta_metricas():
+    # Métricas no formato de texto do Prometheus, incluindo o estado atual do pool
+    texto = metricas.exportar() + "\n" + exporta_gauges('db_pool', 'Estado do pool de conexões',
+                                                         get_pool().estatisticas()) + "\n"
+    if coalescedor is not None:
+        texto += exporta_gauges('db_coalescencia', 'Leituras executadas e compartilhadas pela coalescência',
+                                coalescedor.totais()) + "\n"
+    return Response(texto, mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/', methods=['GET'])
@@ -47,47 +1303,65 @@ def listar_clientes():
     # Define a rota /clientes que responde a requisições HTTP do tipo GET
     # A função listar_clientes será executada quando esta rota for acessada.
 
-    # Tenta conectar ao banco de dados
-    conn = connect_db()
+    # Lê os parâmetros de paginação e projeção antes de ocupar uma conexão
+    try:
+        pagina = ler_paginacao('tbl_clientes', request.args)
+    except ValueError as err:
+        return {"erro": str(err)}, 400
+
+    # Modo de exportação: transmite as linhas conforme saem do cursor
+    formato = formato_streaming()
+    if formato:
+        return resposta_streaming(pagina, "clientes", formato)
+
+    # GET condicional: se a tabela não mudou desde a versão do cliente, responde 304 sem ir ao banco
+    g.versao = versao_atual('tbl_clientes')
+    resp = nao_modificado(g.versao)
+    if resp is not None:
+        return resp
+
+    # Busca a página no banco (uma lista de tuplas); requisições simultâneas pela mesma página fazem uma
+    # única consulta
+    results = le_pagina(pagina, g.versao)
 
     # Verifica se a conexão ao banco de dados falhou
-    if conn is None:
+    if results is None:
         # Se a conexão falhar, cria um dicionário de resposta com uma mensagem de erro
         resp = {"erro": "Erro ao conectar ao banco de dados"}
         # Retorna a resposta de erro com código de status 500 (Internal Server Error)
         return resp, 500
 
-    # Cria um objeto cursor para executar consultas SQL no banco de dados
-    # O parâmetro dictionary=True faz com que os resultados sejam retornados como dicionários
-    cursor = conn.cursor(dictionary=True)
-
-    # Define a consulta SQL para selecionar todos os registros da tabela tbl_clientes
-    sql = "SELECT * from tbl_clientes"
-    # Executa a consulta SQL no banco de dados
-    cursor.execute(sql)
+    # Calcula o cursor da próxima página
+    proximo = proxima_pagina(results, pagina)
 
-    # Obtém todos os resultados da consulta e armazena na variável results
-    # Os resultados serão uma lista de dicionários, onde cada dicionário representa uma linha
-    results = cursor.fetchall()
-
-    # Fecha o cursor para liberar os recursos associados a ele
-    cursor.close()
-    # Fecha a conexão com o banco de dados para liberar os recursos
-    conn.close()
+    # Serializa as linhas direto das tuplas, usando a lista de colunas já conhecida
+    return resposta_linhas("clientes", pagina, results, proximo), 200
 
-    # Cria um dicionário de resposta onde a chave "clientes" contém os resultados da consulta
-    resp = {
-        "clientes": results
-    }
+@app.route('/clientes/busca', methods=['GET'])
+def busca_clientes():
+    # Busca por partes do nome, e-mail ou CPF, ordenada por relevância (?q=texto&limit=&after=)
+    return busca_registros('tbl_clientes', 'clientes')
 
-    # Retorna a resposta JSON com a lista de clientes e código de status 200 (OK)
-    return resp, 200
+@app.route('/clientes/busca/sugestoes', methods=['GET'])
+def sugere_clientes():
+    return sugestoes_busca('tbl_clientes')
 
 @app.route('/clientes', methods=['POST'])
 def cria_clientes():
     # Define a rota /clientes que responde a requisições HTTP do tipo POST
     # A função cria_clientes será executada quando esta rota for acessada.
 
+    # Obtém os dados da requisição em formato JSON
+    entrada_dados = request.json
+    
+    # Prepara os valores a serem inseridos, obtendo os campos obrigatórios do dicionário entrada_dados
+    values = {campo: entrada_dados[campo] for campo in CAMPOS_INSERCAO['tbl_clientes']}
+
+    # Guarda só o hash da senha, calculado em outro processo antes de ocupar uma conexão do banco
+    resp = cifra_senha(values)
+    if resp is not None:
+        return resp
+
     # Tenta conectar ao banco de dados
     conn = connect_db()
 
@@ -97,80 +1371,117 @@ def cria_clientes():
         resp = {"erro": "Erro ao conectar ao banco de dados"}
         # Retorna a resposta de erro com código de status 500 (Internal Server Error)
         return resp, 500
-    
-    # Obtém os dados da requisição em formato JSON
-    entrada_dados = request.json
-    
-    # Cria um objeto cursor para executar consultas SQL no banco de dados
-    # O parâmetro dictionary=True faz com que os resultados sejam retornados como dicionários
-    cursor = conn.cursor(dictionary=True)
 
-    # Define a consulta SQL para inserir um novo cliente na tabela tbl_clientes
-    sql = "INSERT INTO tbl_clientes (nome, email, cpf, senha) VALUES (%s, %s, %s, %s)"
-    # Prepara os valores a serem inseridos, obtendo-os do dicionário entrada_dados
-    values = (entrada_dados["nome"], entrada_dados["email"], entrada_dados["cpf"], entrada_dados["senha"])
-    
-    # Executa a consulta SQL de inserção no banco de dados
-    cursor.execute(sql, values)
+    # Executa o INSERT (com SQL e statement preparado reaproveitados) e obtém o ID do novo registro
+    id = Repositorio(conn, 'tbl_clientes').insere(values)
     # Confirma a transação para que as alterações sejam aplicadas ao banco de dados
     conn.commit()
-
-    # Obtém o ID do cliente recém-criado usando lastrowid
-    id = cursor.lastrowid
+    # A listagem da tabela mudou
+    registra_alteracao('tbl_clientes', id)
+    indexa('tbl_clientes', id, values)
 
     # Cria uma resposta informando o sucesso da operação e o ID do novo cliente
     resp = f"O cliente {entrada_dados['nome']} com id {id} foi cadastrado com sucesso!"
 
-    # Fecha o cursor para liberar os recursos associados a ele
-    cursor.close()
-    # Fecha a conexão com o banco de dados para liberar os recursos
+    # Devolve a conexão ao pool
     conn.close()
     
     # Retorna a resposta JSON com a mensagem de sucesso e código de status 201 (Created)
     return resp, 201
 
+@app.route('/clientes/lote', methods=['POST'])
+def cria_clientes_em_lote():
+    # Recebe uma lista JSON (ou NDJSON) de clientes e cadastra todos em uma única transação
+    return insere_lote('tbl_clientes', 'clientes')
+
+@app.route('/clientes/login', methods=['POST'])
+def login_cliente():
+    # Confere email e senha; o hash é refeito se foi gerado com outros parâmetros de custo
+    entrada = request.json or {}
+    email, senha = entrada.get('email'), entrada.get('senha')
+    if not isinstance(email, str) or not senha_valida(senha):
+        return {"erro": "Informe email e senha"}, 400
+
+    conn = connect_db()
+    if conn is None:
+        return {"erro": "Erro ao conectar ao banco de dados"}, 500
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id, nome, email, senha FROM tbl_clientes WHERE email = %s ORDER BY id LIMIT 1",
+                           (email,))
+            cliente = cursor.fetchone()
+        finally:
+            cursor.close()
+    except Error as err:
+        print(f"Erro ao buscar cliente para login: {err}")
+        return {"erro": "Erro ao buscar cliente"}, 500
+    finally:
+        # A conexão não fica presa durante o cálculo do hash
+        conn.close()
+
+    try:
+        if cliente is None:
+            # Calcula um hash mesmo assim, para o tempo de resposta não revelar quais emails existem
+            senhas.gera(senha)
+            return {"erro": "Email ou senha inválidos"}, 401
+        id, nome, email, armazenado = cliente
+        ok, refazer = senhas.verifica(senha, armazenado)
+        if not ok:
+            return {"erro": "Email ou senha inválidos"}, 401
+        novo = senhas.gera(senha) if refazer else None
+    except SenhasOcupadas:
+        return resposta_senhas_ocupadas()
+
+    if novo is not None:
+        # Só troca se a senha não mudou desde a leitura; uma falha aqui não impede o login
+        conn = connect_db()
+        if conn is not None:
+            try:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("UPDATE tbl_clientes SET senha = %s WHERE id = %s AND senha = %s",
+                                   (novo, id, armazenado))
+                finally:
+                    cursor.close()
+                conn.commit()
+                registra_alteracao('tbl_clientes', id)
+            except Error as err:
+                print(f"Erro ao refazer o hash da senha: {err}")
+            finally:
+                conn.close()
+
+    return {"cliente": {"id": id, "nome": nome, "email": email}}, 200
+
 @app.route('/clientes/<int:id>', methods=['PUT'])
 def atualiza_cliente(id):
     # Obtém os dados da nova entrada em formato JSON
     nova_entrada = request.json
+
+    # Se não houver campos para atualizar, retorna um erro
+    if not TABELAS['tbl_clientes'].campos_atualizacao(nova_entrada)[0]:
+        return {"erro": "Nenhum campo para atualizar"}, 400
+
+    # Uma senha nova é guardada como hash, calculado antes de ocupar uma conexão do banco
+    if 'senha' in nova_entrada:
+        nova_entrada = dict(nova_entrada)
+        resp = cifra_senha(nova_entrada)
+        if resp is not None:
+            return resp
+
     conn = connect_db()  # Conecta ao banco de dados
 
     if conn:
-        cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-        # Inicializa a consulta SQL
-        sql = "UPDATE tbl_clientes SET "
-        valores = []  # Lista para armazenar os novos valores
-        updates = []  # Lista para armazenar as colunas a serem atualizadas
-
-        # Verifica quais campos foram fornecidos e atualiza a consulta e valores
-        if "nome" in nova_entrada:
-            updates.append("nome = %s")
-            valores.append(nova_entrada["nome"])
-        if "email" in nova_entrada:
-            updates.append("email = %s")
-            valores.append(nova_entrada["email"])
-        if "cpf" in nova_entrada:
-            updates.append("cpf = %s")
-            valores.append(nova_entrada["cpf"])
-        if "senha" in nova_entrada:
-            updates.append("senha = %s")
-            valores.append(nova_entrada["senha"])
-
-        # Se não houver campos para atualizar, retorna um erro
-        if not updates:
-            return {"erro": "Nenhum campo para atualizar"}, 400
-
-        # Junta as partes da atualização e adiciona a condição WHERE
-        sql += ", ".join(updates) + " WHERE id = %s"
-        valores.append(id)  # Adiciona o ID à lista de valores
-
         try:
-            # Executa o comando SQL com os valores fornecidos
-            cursor.execute(sql, valores)
+            # Executa o UPDATE apenas com as colunas enviadas (SQL e statement preparado reaproveitados)
+            linhas = Repositorio(conn, 'tbl_clientes').atualiza(id, nova_entrada)
             # Confirma a transação no banco de dados
             conn.commit()
+            # Invalida o registro alterado no cache de leitura e muda a sua ETag
+            registra_alteracao('tbl_clientes', id)
+            reindexa(conn, 'tbl_clientes', id, nova_entrada)
             # Verifica se alguma linha foi afetada (atualizada)
-            if cursor.rowcount:
+            if linhas:
                 print("Cliente atualizado com sucesso!")
             else:
                 print("Cliente não encontrado!")
@@ -178,8 +1489,7 @@ def atualiza_cliente(id):
             # Em caso de erro na atualização, imprime a mensagem de erro
             print(f"Erro ao atualizar cliente: {err}")
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
 
     resp = f"O cliente de id {id} foi atualizado com sucesso!"
@@ -187,25 +1497,31 @@ def atualiza_cliente(id):
 
 @app.route('/clientes/<int:id>', methods=['GET'])
 def buscar_cliente_especifico(id):
-
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn:
-        cursor = conn.cursor(dictionary=True)  # Cria um cursor para executar comandos SQL
-        sql = "SELECT * FROM tbl_clientes WHERE id = %s"  # Comando SQL para buscar um Livro pelo ID
-
-        try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (id,))
-            # Recupera o resultado da consulta
-            cliente = cursor.fetchone()
-
-        except Error as err:
-            # Em caso de erro na busca, imprime a mensagem de erro
-            print(f"Erro ao buscar cliente: {err}")
-        finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
-            conn.close()
+    # GET condicional: se o registro não mudou desde a versão do cliente, responde 304 sem ir ao banco
+    versao = versao_atual('tbl_clientes', id)
+    resp = nao_modificado(versao)
+    if resp is not None:
+        return resp
+
+    # Consulta o cache de leitura antes de ir ao banco de dados
+    chave = chave_cache('tbl_clientes', id, versao)
+    cliente = cache.obter(chave) if chave else None
+    if cliente is not None:
+        g.versao = versao
+        return {"cliente": cliente}, 200
+
+    # Busca no banco; requisições simultâneas pelo mesmo registro fazem uma única consulta
+    try:
+        cliente = le_registro('tbl_clientes', id, versao)
+    except Error as err:
+        print(f"Erro ao buscar cliente: {err}")
+        return {"erro": "Erro ao buscar cliente"}, 500
+    # Guarda o registro encontrado no cache. Só registros encontrados recebem ETag: um id que
+    # ainda não existe pode ser criado por um lote, que muda apenas a versão da tabela
+    if cliente:
+        if chave:
+            cache.guardar(chave, cliente)
+        g.versao = versao
 
     resp = {
         "cliente":cliente
@@ -216,16 +1532,17 @@ def buscar_cliente_especifico(id):
 def deletar_cliente(id):
     conn = connect_db()  # Conecta ao banco de dados
     if conn:
-        cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-        sql = "DELETE FROM tbl_clientes WHERE id = %s"  # Comando SQL para deletar um Livro pelo ID
-
         try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (id,))
+            # Executa o DELETE com o ID fornecido
+            linhas = Repositorio(conn, 'tbl_clientes').remove(id)
             # Confirma a transação no banco de dados
             conn.commit()
+            if linhas:
+                indexa('tbl_clientes', id)
+            # Invalida o registro alterado no cache de leitura e muda a sua ETag
+            registra_alteracao('tbl_clientes', id)
             # Verifica se alguma linha foi afetada (deletada)
-            if cursor.rowcount:
+            if linhas:
                 print("Cliente deletado com sucesso!")
             else:
                 print("Cliente não encontrado!")
@@ -233,8 +1550,7 @@ def deletar_cliente(id):
             # Em caso de erro na deleção, imprime a mensagem de erro
             print(f"Erro ao deletar Cliente: {err}")
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
     resp = f"Cliente de id  {id} deletado com sucesso!"
     return resp,201
@@ -246,41 +1562,39 @@ def listar_fornecedores():
     # Define a rota /fornecedores que responde a requisições HTTP do tipo GET
     # A função listar_fornecedores será executada quando esta rota for acessada.
 
-    # Tenta conectar ao banco de dados
-    conn = connect_db()
+    # Lê os parâmetros de paginação e projeção antes de ocupar uma conexão
+    try:
+        pagina = ler_paginacao('tbl_fornecedores', request.args)
+    except ValueError as err:
+        return {"erro": str(err)}, 400
+
+    # Modo de exportação: transmite as linhas conforme saem do cursor
+    formato = formato_streaming()
+    if formato:
+        return resposta_streaming(pagina, "fornecedores", formato)
+
+    # GET condicional: se a tabela não mudou desde a versão do cliente, responde 304 sem ir ao banco
+    g.versao = versao_atual('tbl_fornecedores')
+    resp = nao_modificado(g.versao)
+    if resp is not None:
+        return resp
+
+    # Busca a página no banco (uma lista de tuplas); requisições simultâneas pela mesma página fazem uma
+    # única consulta
+    results = le_pagina(pagina, g.versao)
 
     # Verifica se a conexão ao banco de dados falhou
-    if conn is None:
+    if results is None:
         # Se a conexão falhar, cria um dicionário de resposta com uma mensagem de erro
         resp = {"erro": "Erro ao conectar ao banco de dados"}
         # Retorna a resposta de erro com código de status 500 (Internal Server Error)
         return resp, 500
 
-    # Cria um objeto cursor para executar consultas SQL no banco de dados
-    # O parâmetro dictionary=True faz com que os resultados sejam retornados como dicionários
-    cursor = conn.cursor(dictionary=True)
-
-    # Define a consulta SQL para selecionar todos os registros da tabela tbl_fornecedores
-    sql = "SELECT * from tbl_fornecedores"
-    # Executa a consulta SQL no banco de dados
-    cursor.execute(sql)
-
-    # Obtém todos os resultados da consulta e armazena na variável results
-    # Os resultados serão uma lista de dicionários, onde cada dicionário representa uma linha
-    results = cursor.fetchall()
+    # Calcula o cursor da próxima página
+    proximo = proxima_pagina(results, pagina)
 
-    # Fecha o cursor para liberar os recursos associados a ele
-    cursor.close()
-    # Fecha a conexão com o banco de dados para liberar os recursos
-    conn.close()
-
-    # Cria um dicionário de resposta onde a chave "fornecedores" contém os resultados da consulta
-    resp = {
-        "fornecedores": results
-    }
-
-    # Retorna a resposta JSON com a lista de fornecedores e código de status 200 (OK)
-    return resp, 200
+    # Serializa as linhas direto das tuplas, usando a lista de colunas já conhecida
+    return resposta_linhas("fornecedores", pagina, results, proximo), 200
 
 @app.route('/fornecedores', methods=['POST'])
 def cria_fornecedores():
@@ -300,108 +1614,92 @@ def cria_fornecedores():
     # Obtém os dados da requisição em formato JSON
     entrada_dados = request.json
     
-    # Cria um objeto cursor para executar consultas SQL no banco de dados
-    # O parâmetro dictionary=True faz com que os resultados sejam retornados como dicionários
-    cursor = conn.cursor(dictionary=True)
+    # Prepara os valores a serem inseridos, obtendo os campos obrigatórios do dicionário entrada_dados
+    values = {campo: entrada_dados[campo] for campo in CAMPOS_INSERCAO['tbl_fornecedores']}
 
-    # Define a consulta SQL para inserir um novo cliente na tabela tbl_clientes
-    sql = "INSERT INTO tbl_fornecedores (nome, email, cnpj) VALUES (%s, %s, %s)"
-    # Prepara os valores a serem inseridos, obtendo-os do dicionário entrada_dados
-    values = (entrada_dados["nome"], entrada_dados["email"], entrada_dados["cnpj"])
-    
-    # Executa a consulta SQL de inserção no banco de dados
-    cursor.execute(sql, values)
+    # Executa o INSERT (com SQL e statement preparado reaproveitados) e obtém o ID do novo registro
+    id = Repositorio(conn, 'tbl_fornecedores').insere(values)
     # Confirma a transação para que as alterações sejam aplicadas ao banco de dados
     conn.commit()
-
-    # Obtém o ID do cliente recém-criado usando lastrowid
-    id = cursor.lastrowid
+    # A listagem da tabela mudou
+    registra_alteracao('tbl_fornecedores', id)
 
     # Cria uma resposta informando o sucesso da operação e o ID do novo cliente
     resp = f"O fornecedor {entrada_dados['nome']} com id {id} foi cadastrado com sucesso!"
 
-    # Fecha o cursor para liberar os recursos associados a ele
-    cursor.close()
-    # Fecha a conexão com o banco de dados para liberar os recursos
+    # Devolve a conexão ao pool
     conn.close()
     
     # Retorna a resposta JSON com a mensagem de sucesso e código de status 201 (Created)
     return resp, 201
 
+@app.route('/fornecedores/lote', methods=['POST'])
+def cria_fornecedores_em_lote():
+    # Recebe uma lista JSON (ou NDJSON) de fornecedores e cadastra todos em uma única transação
+    return insere_lote('tbl_fornecedores', 'fornecedores')
+
 @app.route('/fornecedores/<int:id>', methods=['PUT'])
 def atualiza_fornecedor(id):
     # Obtém os dados da nova entrada em formato JSON
     nova_entrada = request.json
+
+    # Se não houver campos para atualizar, retorna um erro
+    if not TABELAS['tbl_fornecedores'].campos_atualizacao(nova_entrada)[0]:
+        return {"erro": "Nenhum campo para atualizar"}, 400
+
     conn = connect_db()  # Conecta ao banco de dados
 
     if conn:
-        cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-        # Inicializa a consulta SQL
-        sql = "UPDATE tbl_fornecedores SET "
-        valores = []  # Lista para armazenar os novos valores
-        updates = []  # Lista para armazenar as colunas a serem atualizadas
-
-        # Verifica quais campos foram fornecidos e atualiza a consulta e valores
-        if "nome" in nova_entrada:
-            updates.append("nome = %s")
-            valores.append(nova_entrada["nome"])
-        if "email" in nova_entrada:
-            updates.append("email = %s")
-            valores.append(nova_entrada["email"])
-        if "cnpj" in nova_entrada:
-            updates.append("cnpj = %s")
-            valores.append(nova_entrada["cnpj"])
-
-        # Se não houver campos para atualizar, retorna um erro
-        if not updates:
-            return {"erro": "Nenhum campo para atualizar"}, 400
-
-        # Junta as partes da atualização e adiciona a condição WHERE
-        sql += ", ".join(updates) + " WHERE id = %s"
-        valores.append(id)  # Adiciona o ID à lista de valores
-
         try:
-            # Executa o comando SQL com os valores fornecidos
-            cursor.execute(sql, valores)
+            # Executa o UPDATE apenas com as colunas enviadas (SQL e statement preparado reaproveitados)
+            linhas = Repositorio(conn, 'tbl_fornecedores').atualiza(id, nova_entrada)
             # Confirma a transação no banco de dados
             conn.commit()
+            # Invalida o registro alterado no cache de leitura e muda a sua ETag
+            registra_alteracao('tbl_fornecedores', id)
             # Verifica se alguma linha foi afetada (atualizada)
-            if cursor.rowcount:
+            if linhas:
                 print("fornecedor atualizado com sucesso!")
             else:
                 print("fornecedor não encontrado!")
         except Error as err:
             # Em caso de erro na atualização, imprime a mensagem de erro
             print(f"Erro ao atualizar fornecedor: {err}")
-        finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
-            conn.close()
-
-    resp = f"O fornecedor de id {id} foi atualizado com sucesso!"
-    return resp, 200  # Retorna 200 OK
-
-@app.route('/fornecedores/<int:id>', methods=['GET'])
-def buscar_fornecedor_especifico(id):
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn:
-        cursor = conn.cursor(dictionary=True)  # Cria um cursor para executar comandos SQL
-        sql = "SELECT * FROM tbl_fornecedores WHERE id = %s"  # Comando SQL para buscar um Livro pelo ID
-
-        try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (id,))
-            # Recupera o resultado da consulta
-            fornecedor = cursor.fetchone()
-
-        except Error as err:
-            # Em caso de erro na busca, imprime a mensagem de erro
-            print(f"Erro ao buscar fornecedor: {err}")
-        finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+        finally:
+            # Devolve a conexão ao pool
             conn.close()
 
+    resp = f"O fornecedor de id {id} foi atualizado com sucesso!"
+    return resp, 200  # Retorna 200 OK
+
+@app.route('/fornecedores/<int:id>', methods=['GET'])
+def buscar_fornecedor_especifico(id):
+    # GET condicional: se o registro não mudou desde a versão do cliente, responde 304 sem ir ao banco
+    versao = versao_atual('tbl_fornecedores', id)
+    resp = nao_modificado(versao)
+    if resp is not None:
+        return resp
+
+    # Consulta o cache de leitura antes de ir ao banco de dados
+    chave = chave_cache('tbl_fornecedores', id, versao)
+    fornecedor = cache.obter(chave) if chave else None
+    if fornecedor is not None:
+        g.versao = versao
+        return jsonify({"fornecedor": fornecedor}), 200
+
+    # Busca no banco; requisições simultâneas pelo mesmo registro fazem uma única consulta
+    try:
+        fornecedor = le_registro('tbl_fornecedores', id, versao)
+    except Error as err:
+        print(f"Erro ao buscar fornecedor: {err}")
+        return {"erro": "Erro ao buscar fornecedor"}, 500
+    # Guarda o registro encontrado no cache. Só registros encontrados recebem ETag: um id que
+    # ainda não existe pode ser criado por um lote, que muda apenas a versão da tabela
+    if fornecedor:
+        if chave:
+            cache.guardar(chave, fornecedor)
+        g.versao = versao
+
     if fornecedor:
         return jsonify({"fornecedor": fornecedor}), 200
     else:
@@ -411,16 +1709,15 @@ def buscar_fornecedor_especifico(id):
 def deletar_fornecedor(id):
     conn = connect_db()  # Conecta ao banco de dados
     if conn:
-        cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-        sql = "DELETE FROM tbl_fornecedores WHERE id = %s"  # Comando SQL para deletar um Livro pelo ID
-
         try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (id,))
+            # Executa o DELETE com o ID fornecido
+            linhas = Repositorio(conn, 'tbl_fornecedores').remove(id)
             # Confirma a transação no banco de dados
             conn.commit()
+            # Invalida o registro alterado no cache de leitura e muda a sua ETag
+            registra_alteracao('tbl_fornecedores', id)
             # Verifica se alguma linha foi afetada (deletada)
-            if cursor.rowcount:
+            if linhas:
                 print("Fornecedor deletado com sucesso!")
             else:
                 print("Fornecedor não encontrado!")
@@ -428,8 +1725,7 @@ def deletar_fornecedor(id):
             # Em caso de erro na deleção, imprime a mensagem de erro
             print(f"Erro ao deletar Fornecedor: {err}")
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
     resp = f"Fornecedor de id  {id} deletado com sucesso!"
     return resp,201
@@ -441,41 +1737,49 @@ def listar_produtos():
     # Define a rota /fornecedores que responde a requisições HTTP do tipo GET
     # A função listar_fornecedores será executada quando esta rota for acessada.
 
-    # Tenta conectar ao banco de dados
-    conn = connect_db()
+    # Lê os parâmetros de paginação e projeção antes de ocupar uma conexão
+    try:
+        pagina = ler_paginacao('tbl_produtos', request.args)
+    except ValueError as err:
+        return {"erro": str(err)}, 400
+
+    # Modo de exportação: transmite as linhas conforme saem do cursor
+    formato = formato_streaming()
+    if formato:
+        return resposta_streaming(pagina, "produtos", formato)
+
+    # GET condicional: se a tabela não mudou desde a versão do cliente, responde 304 sem ir ao banco
+    g.versao = versao_atual('tbl_produtos')
+    resp = nao_modificado(g.versao)
+    if resp is not None:
+        return resp
+
+    # Busca a página no banco (uma lista de tuplas); requisições simultâneas pela mesma página fazem uma
+    # única consulta
+    results = le_pagina(pagina, g.versao)
 
     # Verifica se a conexão ao banco de dados falhou
-    if conn is None:
+    if results is None:
         # Se a conexão falhar, cria um dicionário de resposta com uma mensagem de erro
         resp = {"erro": "Erro ao conectar ao banco de dados"}
         # Retorna a resposta de erro com código de status 500 (Internal Server Error)
         return resp, 500
 
-    # Cria um objeto cursor para executar consultas SQL no banco de dados
-    # O parâmetro dictionary=True faz com que os resultados sejam retornados como dicionários
-    cursor = conn.cursor(dictionary=True)
-
-    # Define a consulta SQL para selecionar todos os registros da tabela tbl_fornecedores
-    sql = "SELECT * from tbl_produtos"
-    # Executa a consulta SQL no banco de dados
-    cursor.execute(sql)
+    # Calcula o cursor da próxima página
+    proximo = proxima_pagina(results, pagina)
 
-    # Obtém todos os resultados da consulta e armazena na variável results
-    # Os resultados serão uma lista de dicionários, onde cada dicionário representa uma linha
-    results = cursor.fetchall()
-
-    # Fecha o cursor para liberar os recursos associados a ele
-    cursor.close()
-    # Fecha a conexão com o banco de dados para liberar os recursos
-    conn.close()
+    # Serializa as linhas direto das tuplas, usando a lista de colunas já conhecida
+    return resposta_linhas("produtos", pagina, results, proximo), 200
 
-    # Cria um dicionário de resposta onde a chave "fornecedores" contém os resultados da consulta
-    resp = {
-        "produtos": results
-    }
+@app.route('/produtos/busca', methods=['GET'])
+def busca_produtos():
+    # Busca por palavras do nome ou da descrição, ordenada por relevância (?q=texto&limit=&after=)
+    return busca_registros('tbl_produtos', 'produtos')
 
-    # Retorna a resposta JSON com a lista de fornecedores e código de status 200 (OK)
-    return resp, 200
+@app.route('/produtos/busca/sugestoes', methods=['GET'])
+def sugere_produtos():
+    # Autocompletar da caixa de busca (?q=prefixo)
+    return sugestoes_busca('tbl_produtos')
 
 @app.route('/produtos', methods=['POST'])
 def cria_produtos():
@@ -495,82 +1799,67 @@ def cria_produtos():
     # Obtém os dados da requisição em formato JSON
     entrada_dados = request.json
     
-    # Cria um objeto cursor para executar consultas SQL no banco de dados
-    # O parâmetro dictionary=True faz com que os resultados sejam retornados como dicionários
-    cursor = conn.cursor(dictionary=True)
+    # Prepara os valores a serem inseridos, obtendo os campos obrigatórios do dicionário entrada_dados
+    values = {campo: entrada_dados[campo] for campo in CAMPOS_INSERCAO['tbl_produtos']}
 
-    # Define a consulta SQL para inserir um novo cliente na tabela tbl_clientes
-    sql = "INSERT INTO tbl_produtos (nome, descricao, preco, qtd_em_estoque, fornecedor_id, custo_no_fornecedor) VALUES (%s, %s, %s,%s,%s,%s)"
-    # Prepara os valores a serem inseridos, obtendo-os do dicionário entrada_dados
-    values = (entrada_dados["nome"], entrada_dados["descricao"], entrada_dados["preco"], entrada_dados["qtd_em_estoque"], entrada_dados["fornecedor_id"], entrada_dados["custo_no_fornecedor"])
-    
-    # Executa a consulta SQL de inserção no banco de dados
-    cursor.execute(sql, values)
+    # Executa o INSERT (com SQL e statement preparado reaproveitados) e obtém o ID do novo registro
+    id = Repositorio(conn, 'tbl_produtos').insere(values)
     # Confirma a transação para que as alterações sejam aplicadas ao banco de dados
     conn.commit()
-
-    # Obtém o ID do cliente recém-criado usando lastrowid
-    id = cursor.lastrowid
+    # A listagem da tabela mudou
+    registra_alteracao('tbl_produtos', id)
+    indexa('tbl_produtos', id, values)
 
     # Cria uma resposta informando o sucesso da operação e o ID do novo cliente
     resp = f"O produto {entrada_dados['nome']} de id {id} foi cadastrado com sucesso!"
 
-    # Fecha o cursor para liberar os recursos associados a ele
-    cursor.close()
-    # Fecha a conexão com o banco de dados para liberar os recursos
+    # Devolve a conexão ao pool
     conn.close()
     
     # Retorna a resposta JSON com a mensagem de sucesso e código de status 201 (Created)
     return resp, 201
 
+@app.route('/produtos/lote', methods=['POST'])
+def cria_produtos_em_lote():
+    # Recebe uma lista JSON (ou NDJSON) de produtos e cadastra todos em uma única transação
+    return insere_lote('tbl_produtos', 'produtos')
+
 @app.route('/produtos/<int:id>', methods=['PUT'])
 def atualiza_produtos(id):
     # Obtém os dados da nova entrada em formato JSON
     nova_entrada = request.json
-    conn = connect_db()  # Conecta ao banco de dados
 
-    if conn:
-        cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-        # Inicializa a consulta SQL
-        sql = "UPDATE tbl_produtos SET "
-        valores = []  # Lista para armazenar os novos valores
-        updates = []  # Lista para armazenar as colunas a serem atualizadas
-
-        # Verifica quais campos foram fornecidos e atualiza a consulta e valores
-        if "nome" in nova_entrada:
-            updates.append("nome = %s")
-            valores.append(nova_entrada["nome"])
-        if "descricao" in nova_entrada:
-            updates.append("descricao = %s")
-            valores.append(nova_entrada["descricao"])
-        if "preco" in nova_entrada:
-            updates.append("preco = %s")
-            valores.append(nova_entrada["preco"])
-        if "qtd_em_estoque" in nova_entrada:
-            updates.append("qtd_em_estoque = %s")
-            valores.append(nova_entrada["qtd_em_estoque"])
-        if "fornecedor_id" in nova_entrada:
-            updates.append("fornecedor_id = %s")
-            valores.append(nova_entrada["fornecedor_id"])
-        if "custo_no_fornecedor" in nova_entrada:
-            updates.append("custo_no_fornecedor = %s")
-            valores.append(nova_entrada["custo_no_fornecedor"])
-    
-        # Se não houver campos para atualizar, retorna um erro
-        if not updates:
-            return {"erro": "Nenhum campo para atualizar"}, 400
+    # Se não houver campos para atualizar, retorna um erro
+    if not TABELAS['tbl_produtos'].campos_atualizacao(nova_entrada)[0]:
+        return {"erro": "Nenhum campo para atualizar"}, 400
 
-        # Junta as partes da atualização e adiciona a condição WHERE
-        sql += ", ".join(updates) + " WHERE id = %s"
-        valores.append(id)  # Adiciona o ID à lista de valores
+    conn = connect_db()  # Conecta ao banco de dados
 
+    if conn:
+        cursor = conn.cursor()  # Cursor usado nos ajustes dos resumos
         try:
-            # Executa o comando SQL com os valores fornecidos
-            cursor.execute(sql, valores)
+            # Nome, descrição e preço também aparecem na visão detalhada dos carrinhos
+            clientes = clientes_com_produto(conn, id)
+            # Preço e fornecedor entram nos resumos de receita e de carrinhos
+            afeta_resumos = 'preco' in nova_entrada or 'fornecedor_id' in nova_entrada
+            if afeta_resumos:
+                resumos.ajusta(cursor, 'produto', (id,), -1)
+            # Executa o UPDATE apenas com as colunas enviadas (SQL e statement preparado reaproveitados)
+            linhas = Repositorio(conn, 'tbl_produtos').atualiza(id, nova_entrada)
+            if afeta_resumos:
+                resumos.ajusta(cursor, 'produto', (id,), 1)
             # Confirma a transação no banco de dados
             conn.commit()
+            # O estoque de um produto quente em memória passa a partir do novo valor, lido com a linha bloqueada
+            if 'qtd_em_estoque' in nova_entrada and id in reservas.quentes():
+                aquece_reserva(conn, id)
+            # Invalida o registro alterado no cache de leitura e muda a sua ETag
+            registra_alteracao('tbl_produtos', id)
+            for cliente_id in clientes:
+                registra_alteracao('carrinho_cliente', cliente_id)
+            reindexa(conn, 'tbl_produtos', id, nova_entrada)
             # Verifica se alguma linha foi afetada (atualizada)
-            if cursor.rowcount:
+            if linhas:
                 print("Produto atualizado com sucesso!")
             else:
                 print("Produto não encontrado!")
@@ -578,7 +1867,7 @@ def atualiza_produtos(id):
             # Em caso de erro na atualização, imprime a mensagem de erro
             print(f"Erro ao atualizar produto: {err}")
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
+            # Fecha o cursor e devolve a conexão ao pool
             cursor.close()
             conn.close()
 
@@ -587,24 +1876,31 @@ def atualiza_produtos(id):
 
 @app.route('/produtos/<int:id>', methods=['GET'])
 def buscar_produtos_especifico(id):
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn:
-        cursor = conn.cursor(dictionary=True)  # Cria um cursor para executar comandos SQL
-        sql = "SELECT * FROM tbl_produtos WHERE id = %s"  # Comando SQL para buscar um Livro pelo ID
-
-        try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (id,))
-            # Recupera o resultado da consulta
-            produto = cursor.fetchone()
-
-        except Error as err:
-            # Em caso de erro na busca, imprime a mensagem de erro
-            print(f"Erro ao buscar produto: {err}")
-        finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
-            conn.close()
+    # GET condicional: se o registro não mudou desde a versão do cliente, responde 304 sem ir ao banco
+    versao = versao_atual('tbl_produtos', id)
+    resp = nao_modificado(versao)
+    if resp is not None:
+        return resp
+
+    # Consulta o cache de leitura antes de ir ao banco de dados
+    chave = chave_cache('tbl_produtos', id, versao)
+    produto = cache.obter(chave) if chave else None
+    if produto is not None:
+        g.versao = versao
+        return {"produto": produto}, 200
+
+    # Busca no banco; requisições simultâneas pelo mesmo registro fazem uma única consulta
+    try:
+        produto = le_registro('tbl_produtos', id, versao)
+    except Error as err:
+        print(f"Erro ao buscar produto: {err}")
+        return {"erro": "Erro ao buscar produto"}, 500
+    # Guarda o registro encontrado no cache. Só registros encontrados recebem ETag: um id que
+    # ainda não existe pode ser criado por um lote, que muda apenas a versão da tabela
+    if produto:
+        if chave:
+            cache.guardar(chave, produto)
+        g.versao = versao
 
     resp = {
         "produto":produto
@@ -615,16 +1911,24 @@ def buscar_produtos_especifico(id):
 def deletar_produto(id):
     conn = connect_db()  # Conecta ao banco de dados
     if conn:
-        cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-        sql = "DELETE FROM tbl_produtos WHERE id = %s"  # Comando SQL para deletar um Livro pelo ID
-
+        cursor = conn.cursor()  # Cursor usado nos ajustes dos resumos
         try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (id,))
+            # Consulta antes do DELETE: os itens de carrinho do produto podem ser removidos junto
+            clientes = clientes_com_produto(conn, id)
+            # Retira dos resumos os itens e pedidos do produto e executa o DELETE com o ID fornecido
+            resumos.ajusta(cursor, 'produto', (id,), -1)
+            linhas = Repositorio(conn, 'tbl_produtos').remove(id)
             # Confirma a transação no banco de dados
             conn.commit()
+            if linhas:
+                reservas.esfria(id)
+                indexa('tbl_produtos', id)
+            # Invalida o registro alterado no cache de leitura e muda a sua ETag
+            registra_alteracao('tbl_produtos', id)
+            for cliente_id in clientes:
+                registra_alteracao('carrinho_cliente', cliente_id)
             # Verifica se alguma linha foi afetada (deletada)
-            if cursor.rowcount:
+            if linhas:
                 print("Produto deletado com sucesso!")
             else:
                 print("Produto não encontrado!")
@@ -632,7 +1936,7 @@ def deletar_produto(id):
             # Em caso de erro na deleção, imprime a mensagem de erro
             print(f"Erro ao deletar Produto: {err}")
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
+            # Fecha o cursor e devolve a conexão ao pool
             cursor.close()
             conn.close()
     resp = f"Produto de id  {id} deletado com sucesso!"
@@ -640,58 +1944,137 @@ def deletar_produto(id):
 
 """CARRINHOS---------------------"""
 
+def adiciona_item_carrinho_adiado(produto_id, quantidade, cliente_id):
+    """POST /carrinhos com a gravação adiada: valida com leituras, reserva o estoque e coloca o item na fila."""
+    conn = connect_db()
+    if conn is None:
+        return {"erro": "Erro ao conectar ao banco de dados"}, 500
+    cursor = conn.cursor()
+    try:
+        # Cliente e estoque em uma única ida ao banco, sem escrita
+        cursor.execute("SELECT (SELECT id FROM tbl_clientes WHERE id = %s), "
+                       "(SELECT qtd_em_estoque FROM tbl_produtos WHERE id = %s)", (cliente_id, produto_id))
+        cliente, estoque = cursor.fetchone()
+    except Error as err:
+        print(f"Erro ao adicionar item ao carrinho: {err}")
+        return {"erro": "Erro ao adicionar item ao carrinho"}, 500
+    finally:
+        cursor.close()
+        conn.close()
+    if cliente is None:
+        return {"erro": "Cliente não encontrado"}, 404
+    if estoque is None:
+        return {"erro": "Produto não encontrado"}, 404
+
+    # Produto quente: a reserva no contador já é a definitiva. Nos demais o estoque é baixado na
+    # gravação do lote, que rejeita o item se o estoque tiver acabado nesse meio tempo
+    reservado = reservas.reserva(produto_id, quantidade)
+    if reservado is False or (reservado is None and estoque < quantidade):
+        return {"erro": "Quantidade solicitada não disponível"}, 400
+
+    try:
+        item = {"tipo": "carrinho", "id": alocador.proximo('tbl_carrinho'), "produto_id": produto_id,
+                "quantidade": quantidade, "cliente_id": cliente_id, "reservado": bool(reservado),
+                "reservado_ate": (datetime.now() + timedelta(seconds=RESERVA_TTL)).isoformat(sep=' ')}
+        erro = aceita_escrita(item)
+    except Error as err:
+        print(f"Erro ao reservar id do carrinho: {err}")
+        erro = {"erro": "Erro ao adicionar item ao carrinho"}, 500
+    if erro is not None:
+        if reservado:
+            reservas.devolve(produto_id, quantidade)
+        return erro
+    return f"O produto {produto_id} foi aceito no carrinho de id {item['id']}, que pertence ao cliente de id {cliente_id}", 202
+
 @app.route('/carrinhos', methods=['POST'])
 def adiciona_item_carrinho():
+    # Obtém os dados da requisição em formato JSON
+    entrada_dados = request.json
+    try:
+        # Ids convertidos antes do aceite: a gravação adiada não pode receber um valor que o banco recusa
+        ids = converte_entrada('tbl_carrinho', entrada_dados, ('produto_id', 'cliente_id'))
+    except ValueError as err:
+        return {"erro": str(err)}, 400
+    produto_id = ids["produto_id"]
+    quantidade_demandada = entrada_dados.get("quantidade")
+    cliente_id = ids["cliente_id"]
+
+    # Uma quantidade negativa devolveria estoque ao produto
+    if isinstance(quantidade_demandada, bool) or not isinstance(quantidade_demandada, int) or quantidade_demandada <= 0:
+        return {"erro": "A quantidade deve ser um número inteiro maior que zero"}, 400
+
+    if fila_gravacao is not None:
+        return adiciona_item_carrinho_adiado(produto_id, quantidade_demandada, cliente_id)
+
+    # Produto quente: a reserva é um decremento atômico no contador em memória, sem bloquear a linha
+    # do produto no banco. None indica um produto comum, reservado pelo UPDATE abaixo
+    reservado = reservas.reserva(produto_id, quantidade_demandada)
+    if reservado is False:
+        return {"erro": "Quantidade solicitada não disponível"}, 400
+
     # Tenta conectar ao banco de dados
     conn = connect_db()
 
     # Verifica se a conexão ao banco de dados falhou
     if conn is None:
+        if reservado:
+            reservas.devolve(produto_id, quantidade_demandada)
         return {"erro": "Erro ao conectar ao banco de dados"}, 500
 
-    # Obtém os dados da requisição em formato JSON
-    entrada_dados = request.json
-    produto_id = entrada_dados["produto_id"]
-    quantidade_demandada = entrada_dados["quantidade"]
-    cliente_id = entrada_dados["cliente_id"]
-
     # Cria um objeto cursor
-    cursor = conn.cursor(dictionary=True)
-
-        # Verifica se o cliente existe
-    cursor.execute("SELECT id FROM tbl_clientes WHERE id = %s", (cliente_id,))
-    cliente = cursor.fetchone()
-
-    if cliente is None:
-        cursor.close()
-        conn.close()
-        return {"erro": "Cliente não encontrado"}, 404
+    cursor = conn.cursor()
+    confirmado = False
 
-    # Verifica se o produto existe e se a quantidade está disponível
-    cursor.execute("SELECT qtd_em_estoque FROM tbl_produtos WHERE id = %s", (produto_id,))
-    produto = cursor.fetchone()
-
-    if produto is None:
-        cursor.close()
-        conn.close()
+    try:
+        # Insere o item apenas se o cliente existir: a verificação é feita pelo próprio INSERT ... SELECT.
+        # O item vence em RESERVA_TTL segundos se não virar pedido
+        sql = """
+        INSERT INTO tbl_carrinho (produto_id, quantidade, cliente_id, reservado_ate)
+        SELECT %s, %s, id, %s FROM tbl_clientes WHERE id = %s
+        """
+        reservado_ate = datetime.now() + timedelta(seconds=RESERVA_TTL)
+        cursor.execute(sql, (produto_id, quantidade_demandada, reservado_ate, cliente_id))
+        if cursor.rowcount == 0:
+            conn.rollback()
+            return {"erro": "Cliente não encontrado"}, 404
+        id = cursor.lastrowid
+
+        if reservado is None:
+            # Reserva o estoque de forma atômica: o UPDATE só altera a linha se houver quantidade suficiente.
+            # Ele é feito por último para que o bloqueio da linha do produto dure só até o commit.
+            reservado = baixa_estoque(cursor, produto_id, quantidade_demandada)
+            if reservado is False:
+                conn.rollback()
+                # Caminho raro: descobre se o produto não existe ou se falta estoque
+                cursor.execute("SELECT id FROM tbl_produtos WHERE id = %s", (produto_id,))
+                if cursor.fetchone() is None:
+                    return {"erro": "Produto não encontrado"}, 404
+                return {"erro": "Quantidade solicitada não disponível"}, 400
+
+        # Soma o novo item ao resumo de carrinhos por fornecedor
+        resumos.ajusta(cursor, 'carrinho', (id,), 1)
+        conn.commit()
+        confirmado = True
+    except IntegrityError:
+        # A chave estrangeira de produto_id recusou o INSERT
+        conn.rollback()
         return {"erro": "Produto não encontrado"}, 404
-
-    estoque_disponivel = produto['qtd_em_estoque']
-    if quantidade_demandada > estoque_disponivel:
+    except Error as err:
+        conn.rollback()
+        print(f"Erro ao adicionar item ao carrinho: {err}")
+        return {"erro": "Erro ao adicionar item ao carrinho"}, 500
+    finally:
         cursor.close()
         conn.close()
-        return {"erro": "Quantidade solicitada não disponível"}, 400
+        if reservado and not confirmado:
+            # A reserva em memória não virou item de carrinho: devolve o estoque
+            reservas.devolve(produto_id, quantidade_demandada)
 
-    # Se o produto existe e a quantidade está disponível, insere no carrinho
-    sql = "INSERT INTO tbl_carrinho (produto_id, quantidade, cliente_id) VALUES (%s, %s,%s)"
-    values = (produto_id, quantidade_demandada,cliente_id)
-
-    cursor.execute(sql, values)
-    conn.commit()
-
-    id = cursor.lastrowid
-    cursor.close()
-    conn.close()
+    # Há um novo item no carrinho do cliente. O estoque no banco de um produto quente só muda na reconciliação
+    if reservado is None:
+        registra_alteracao('tbl_produtos', produto_id)
+    registra_alteracao('tbl_carrinho', id)
+    registra_alteracao('carrinho_cliente', cliente_id)
 
     return f"O produto {produto_id} foi adicionado ao carrinho de id {id}, que pertence ao cliente de id {cliente_id}", 201
 
@@ -700,88 +2083,138 @@ def listar_carrinhos():
     # Define a rota /fornecedores que responde a requisições HTTP do tipo GET
     # A função listar_fornecedores será executada quando esta rota for acessada.
 
-    # Tenta conectar ao banco de dados
-    conn = connect_db()
+    # Lê os parâmetros de paginação e projeção antes de ocupar uma conexão
+    try:
+        pagina = ler_paginacao('tbl_carrinho', request.args)
+    except ValueError as err:
+        return {"erro": str(err)}, 400
+
+    # Modo de exportação: transmite as linhas conforme saem do cursor
+    formato = formato_streaming()
+    if formato:
+        return resposta_streaming(pagina, "carrinhos", formato)
+
+    # GET condicional: se a tabela não mudou desde a versão do cliente, responde 304 sem ir ao banco
+    g.versao = versao_atual('tbl_carrinho')
+    resp = nao_modificado(g.versao)
+    if resp is not None:
+        return resp
+
+    # Busca a página no banco (uma lista de tuplas); requisições simultâneas pela mesma página fazem uma
+    # única consulta
+    results = le_pagina(pagina, g.versao)
 
     # Verifica se a conexão ao banco de dados falhou
-    if conn is None:
+    if results is None:
         # Se a conexão falhar, cria um dicionário de resposta com uma mensagem de erro
         resp = {"erro": "Erro ao conectar ao banco de dados"}
         # Retorna a resposta de erro com código de status 500 (Internal Server Error)
         return resp, 500
 
-    # Cria um objeto cursor para executar consultas SQL no banco de dados
-    # O parâmetro dictionary=True faz com que os resultados sejam retornados como dicionários
-    cursor = conn.cursor(dictionary=True)
-
-    # Define a consulta SQL para selecionar todos os registros da tabela tbl_fornecedores
-    sql = "SELECT * from tbl_carrinho"
-    # Executa a consulta SQL no banco de dados
-    cursor.execute(sql)
-
-    # Obtém todos os resultados da consulta e armazena na variável results
-    # Os resultados serão uma lista de dicionários, onde cada dicionário representa uma linha
-    results = cursor.fetchall()
-
-    # Fecha o cursor para liberar os recursos associados a ele
-    cursor.close()
-    # Fecha a conexão com o banco de dados para liberar os recursos
-    conn.close()
-
-    # Cria um dicionário de resposta onde a chave "fornecedores" contém os resultados da consulta
-    resp = {
-        "carrinhos": results
-    }
+    # Calcula o cursor da próxima página
+    proximo = proxima_pagina(results, pagina)
 
-    # Retorna a resposta JSON com a lista de fornecedores e código de status 200 (OK)
-    return resp, 200
+    # Serializa as linhas direto das tuplas, usando a lista de colunas já conhecida
+    return resposta_linhas("carrinhos", pagina, results, proximo), 200
 
 @app.route('/carrinhos/<int:id>', methods=['PUT'])
 def atualiza_carrinhos(id):
     # Obtém os dados da nova entrada em formato JSON
     nova_entrada = request.json
+
+    if "quantidade" in nova_entrada:
+        quantidade = nova_entrada["quantidade"]
+        if isinstance(quantidade, bool) or not isinstance(quantidade, int) or quantidade <= 0:
+            return {"erro": "A quantidade deve ser um número inteiro maior que zero"}, 400
+
+    # Colunas enviadas na requisição, na ordem da tabela (o dono do carrinho não muda)
+    tabela = TABELAS['tbl_carrinho']
+    editaveis = {campo: nova_entrada[campo] for campo in ('produto_id', 'quantidade') if campo in nova_entrada}
+
+    # Se não houver campos para atualizar, retorna um erro
+    if not editaveis:
+        return {"erro": "Nenhum campo para atualizar"}, 400
+
+    # Alterar o item renova o prazo da reserva
+    editaveis['reservado_ate'] = datetime.now() + timedelta(seconds=RESERVA_TTL)
+    colunas, valores = tabela.campos_atualizacao(editaveis)
+
     conn = connect_db()  # Conecta ao banco de dados
 
     if conn:
         cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-        # Inicializa a consulta SQL
-        sql = "UPDATE tbl_carrinho SET "
-        valores = []  # Lista para armazenar os novos valores
-        updates = []  # Lista para armazenar as colunas a serem atualizadas
-
-        # Verifica quais campos foram fornecidos e atualiza a consulta e valores
-        if "produto_id" in nova_entrada:
-            updates.append("produto_id = %s")
-            valores.append(nova_entrada["produto_id"])
-        if "quantidade" in nova_entrada:
-            updates.append("quantidade = %s")
-            valores.append(nova_entrada["quantidade"])
-    
-        # Se não houver campos para atualizar, retorna um erro
-        if not updates:
-            return {"erro": "Nenhum campo para atualizar"}, 400
-
-        # Junta as partes da atualização e adiciona a condição WHERE
-        sql += ", ".join(updates) + " WHERE id = %s"
+        # Monta (com cache) o UPDATE apenas com as colunas enviadas
+        sql = tabela.sql_atualizacao(colunas)
         valores.append(id)  # Adiciona o ID à lista de valores
+        # Reserva feita no contador de um produto quente (desfeita se a transação não for confirmada) e
+        # quantidade a devolver ao contador depois do commit
+        reservado, a_devolver, confirmado = None, 0, False
 
         try:
-            # Executa o comando SQL com os valores fornecidos
+            # Bloqueia o item do carrinho para ajustar a reserva de estoque
+            cursor.execute("SELECT produto_id, quantidade, cliente_id FROM tbl_carrinho WHERE id = %s FOR UPDATE",
+                           (id,))
+            atual = cursor.fetchone()
+            if atual is None:
+                conn.rollback()
+                print("Carrinho não encontrado!")
+                return {"erro": "Carrinho não encontrado"}, 404
+            produto_antigo, quantidade_antiga, cliente_id = atual
+            produto_novo = nova_entrada.get("produto_id", produto_antigo)
+            quantidade_nova = nova_entrada.get("quantidade", quantidade_antiga)
+
+            # No mesmo produto só a diferença volta ao estoque ou é reservada
+            devolver, reservar = quantidade_antiga, quantidade_nova
+            if produto_novo == produto_antigo:
+                devolver = max(quantidade_antiga - quantidade_nova, 0)
+                reservar = max(quantidade_nova - quantidade_antiga, 0)
+
+            # Produtos quentes usam os contadores em memória em vez da linha do produto. A devolução ao
+            # contador espera o commit: antes dele o estoque devolvido poderia ser reservado por outra
+            # requisição e não haveria como desfazê-la
+            if devolver:
+                if produto_antigo in reservas.quentes():
+                    a_devolver = devolver
+                else:
+                    cursor.execute("UPDATE tbl_produtos SET qtd_em_estoque = qtd_em_estoque + %s WHERE id = %s",
+                                   (devolver, produto_antigo))
+            disponivel = True
+            if reservar:
+                reservado = reservas.reserva(produto_novo, reservar)
+                if reservado is None:
+                    reservado = baixa_estoque(cursor, produto_novo, reservar)
+                disponivel = reservado is not False
+            if not disponivel:
+                conn.rollback()
+                return {"erro": "Quantidade solicitada não disponível"}, 400
+
+            # Executa o comando SQL com os valores fornecidos, trocando a contribuição do item nos resumos
+            resumos.ajusta(cursor, 'carrinho', (id,), -1)
             cursor.execute(sql, valores)
+            resumos.ajusta(cursor, 'carrinho', (id,), 1)
             # Confirma a transação no banco de dados
             conn.commit()
-            # Verifica se alguma linha foi afetada (atualizada)
-            if cursor.rowcount:
-                print("Carrinho atualizado com sucesso!")
-            else:
-                print("Carrinho não encontrado!")
+            confirmado = True
+            if a_devolver:
+                reservas.devolve(produto_antigo, a_devolver)
+            # Invalida os registros alterados no cache de leitura e muda as suas ETags
+            registra_alteracao('tbl_carrinho', id)
+            registra_alteracao('tbl_produtos', produto_antigo)
+            if produto_novo != produto_antigo:
+                registra_alteracao('tbl_produtos', produto_novo)
+            registra_alteracao('carrinho_cliente', cliente_id)
+            print("Carrinho atualizado com sucesso!")
         except Error as err:
-            # Em caso de erro na atualização, imprime a mensagem de erro
+            # Em caso de erro na atualização, desfaz a transação e imprime a mensagem de erro
+            conn.rollback()
             print(f"Erro ao atualizar carrinho: {err}")
         finally:
             # Fecha o cursor e a conexão para liberar recursos
             cursor.close()
             conn.close()
+            if not confirmado and reservado:
+                # O rollback não alcança os contadores: desfaz a reserva nova
+                reservas.devolve(produto_novo, reservar)
 
     resp = f"O carrinho de id {id} foi atualizado com sucesso!"
     return resp, 200  # Retorna 200 OK
@@ -791,20 +2224,37 @@ def deletar_carrinho(id):
     conn = connect_db()  # Conecta ao banco de dados
     if conn:
         cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-        sql = "DELETE FROM tbl_carrinho WHERE id = %s"  # Comando SQL para deletar um Livro pelo ID
 
         try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (id,))
-            # Confirma a transação no banco de dados
-            conn.commit()
-            # Verifica se alguma linha foi afetada (deletada)
-            if cursor.rowcount:
+            # Bloqueia o item para devolver ao estoque a quantidade reservada
+            cursor.execute("SELECT produto_id, quantidade, cliente_id FROM tbl_carrinho WHERE id = %s FOR UPDATE",
+                           (id,))
+            item = cursor.fetchone()
+            if item:
+                produto_id, quantidade, cliente_id = item
+                # Retira o item dos resumos e executa o comando SQL com o ID fornecido
+                resumos.ajusta(cursor, 'carrinho', (id,), -1)
+                cursor.execute("DELETE FROM tbl_carrinho WHERE id = %s", (id,))
+                # O estoque de um produto quente volta pelo contador em memória, depois do commit
+                quente = produto_id in reservas.quentes()
+                if not quente:
+                    cursor.execute("UPDATE tbl_produtos SET qtd_em_estoque = qtd_em_estoque + %s WHERE id = %s",
+                                   (quantidade, produto_id))
+                # Confirma a transação no banco de dados
+                conn.commit()
+                if quente:
+                    reservas.devolve(produto_id, quantidade)
+                # Invalida os registros alterados no cache de leitura e muda as suas ETags
+                registra_alteracao('tbl_carrinho', id)
+                registra_alteracao('tbl_produtos', produto_id)
+                registra_alteracao('carrinho_cliente', cliente_id)
                 print("Carrinho deletado com sucesso!")
             else:
+                conn.rollback()
                 print("Carrinho não encontrado!")
         except Error as err:
-            # Em caso de erro na deleção, imprime a mensagem de erro
+            # Em caso de erro na deleção, desfaz a transação e imprime a mensagem de erro
+            conn.rollback()
             print(f"Erro ao deletar carrinho: {err}")
         finally:
             # Fecha o cursor e a conexão para liberar recursos
@@ -815,24 +2265,31 @@ def deletar_carrinho(id):
 
 @app.route('/carrinhos/<int:id>', methods=['GET'])
 def buscar_carrinhos_especifico(id):
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn:
-        cursor = conn.cursor(dictionary=True)  # Cria um cursor para executar comandos SQL
-        sql = "SELECT * FROM tbl_carrinho WHERE id = %s"  # Comando SQL para buscar um Livro pelo ID
-
-        try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (id,))
-            # Recupera o resultado da consulta
-            carrinho = cursor.fetchone()
-
-        except Error as err:
-            # Em caso de erro na busca, imprime a mensagem de erro
-            print(f"Erro ao buscar carrinho: {err}")
-        finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
-            conn.close()
+    # GET condicional: se o registro não mudou desde a versão do cliente, responde 304 sem ir ao banco
+    versao = versao_atual('tbl_carrinho', id)
+    resp = nao_modificado(versao)
+    if resp is not None:
+        return resp
+
+    # Consulta o cache de leitura antes de ir ao banco de dados
+    chave = chave_cache('tbl_carrinho', id, versao)
+    carrinho = cache.obter(chave) if chave else None
+    if carrinho is not None:
+        g.versao = versao
+        return {"carrinho": carrinho}, 200
+
+    # Busca no banco; requisições simultâneas pelo mesmo registro fazem uma única consulta
+    try:
+        carrinho = le_registro('tbl_carrinho', id, versao)
+    except Error as err:
+        print(f"Erro ao buscar carrinho: {err}")
+        return {"erro": "Erro ao buscar carrinho"}, 500
+    # Guarda o registro encontrado no cache. Só registros encontrados recebem ETag: um id que
+    # ainda não existe pode ser criado por um lote, que muda apenas a versão da tabela
+    if carrinho:
+        if chave:
+            cache.guardar(chave, carrinho)
+        g.versao = versao
 
     resp = {
         "carrinho":carrinho
@@ -841,15 +2298,22 @@ def buscar_carrinhos_especifico(id):
 
 @app.route('/carrinhos/cliente/<int:cliente_id>', methods=['GET'])
 def lista_carrinhos_do_cliente(cliente_id):
+    # GET condicional: a versão do carrinho do cliente muda a cada item alterado
+    g.versao = versao_atual('carrinho_cliente', cliente_id)
+    resp = nao_modificado(g.versao)
+    if resp is not None:
+        return resp
+
     conn = connect_db()  # Conecta ao banco de dados
     if conn:
         cursor = conn.cursor(dictionary=True)  # Cria um cursor para executar comandos SQL
+        # O filtro é feito direto em tbl_carrinho.cliente_id (indexado), sem JOIN com tbl_clientes
         sql = """
-        SELECT carrinho.id AS carrinho_id, carrinho.produto_id AS produto_id, carrinho.quantidade AS quantidade
-        FROM tbl_carrinho carrinho
-        JOIN tbl_clientes clientes ON carrinho.cliente_id = clientes.id
-        WHERE clientes.id = %s
-        """  
+        SELECT id AS carrinho_id, produto_id, quantidade
+        FROM tbl_carrinho
+        WHERE cliente_id = %s
+        ORDER BY id
+        """
 
         try:
             # Executa o comando SQL com o ID fornecido
@@ -871,6 +2335,58 @@ def lista_carrinhos_do_cliente(cliente_id):
 
     return {"erro": "Erro ao conectar ao banco de dados"}, 500
 
+# Itens do carrinho com os dados do produto e o total de cada linha. Usa o índice em
+# tbl_carrinho (cliente_id) e a chave primária de tbl_produtos
+SQL_CARRINHO_DETALHADO = """
+SELECT carrinho.id AS carrinho_id, carrinho.produto_id AS produto_id, carrinho.quantidade AS quantidade,
+       produtos.nome AS nome, produtos.descricao AS descricao, produtos.preco AS preco,
+       carrinho.quantidade * produtos.preco AS total
+FROM tbl_carrinho carrinho
+JOIN tbl_produtos produtos ON produtos.id = carrinho.produto_id
+WHERE carrinho.cliente_id = %s
+ORDER BY carrinho.id
+"""
+
+@app.route('/carrinhos/cliente/<int:cliente_id>/detalhes', methods=['GET'])
+def detalha_carrinho_do_cliente(cliente_id):
+    # Carrinho completo do cliente em uma única consulta, em vez de um GET /produtos/<id> por item
+
+    # GET condicional: a versão do carrinho do cliente muda a cada item ou produto alterado
+    versao = versao_atual('carrinho_cliente', cliente_id)
+    resp = nao_modificado(versao)
+    if resp is not None:
+        return resp
+
+    # O carrinho montado fica no cache de leitura até a próxima alteração
+    chave = chave_cache('carrinho_cliente', cliente_id, versao)
+    carrinho = cache.obter(chave) if chave else None
+    if carrinho is None:
+        conn = connect_db()  # Conecta ao banco de dados
+        if conn is None:
+            return {"erro": "Erro ao conectar ao banco de dados"}, 500
+
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(SQL_CARRINHO_DETALHADO, (cliente_id,))
+            itens = cursor.fetchall()
+        except Error as err:
+            print(f"Erro ao buscar carrinho detalhado: {err}")
+            return {"erro": "Erro ao buscar carrinhos"}, 500
+        finally:
+            cursor.close()
+            conn.close()
+
+        carrinho = {
+            "cliente_id": cliente_id,
+            "itens": itens,
+            "total": sum((item["total"] for item in itens), Decimal(0))
+        }
+        if chave:
+            cache.guardar(chave, carrinho)
+
+    g.versao = versao
+    return {"carrinho": carrinho}, 200
+
 """PEDIDOS---------------------"""
 
 @app.route('/pedidos', methods=['GET'])
@@ -878,47 +2394,67 @@ def listar_pedidos():
     # Define a rota /fornecedores que responde a requisições HTTP do tipo GET
     # A função listar_fornecedores será executada quando esta rota for acessada.
 
-    # Tenta conectar ao banco de dados
-    conn = connect_db()
+    # Lê os parâmetros de paginação e projeção antes de ocupar uma conexão
+    try:
+        pagina = ler_paginacao('tbl_pedido', request.args)
+    except ValueError as err:
+        return {"erro": str(err)}, 400
+
+    # Modo de exportação: transmite as linhas conforme saem do cursor
+    formato = formato_streaming()
+    if formato:
+        return resposta_streaming(pagina, "pedidos", formato)
+
+    # GET condicional: se a tabela não mudou desde a versão do cliente, responde 304 sem ir ao banco
+    g.versao = versao_atual('tbl_pedido')
+    resp = nao_modificado(g.versao)
+    if resp is not None:
+        return resp
+
+    # Busca a página no banco (uma lista de tuplas); requisições simultâneas pela mesma página fazem uma
+    # única consulta
+    results = le_pagina(pagina, g.versao)
 
     # Verifica se a conexão ao banco de dados falhou
-    if conn is None:
+    if results is None:
         # Se a conexão falhar, cria um dicionário de resposta com uma mensagem de erro
         resp = {"erro": "Erro ao conectar ao banco de dados"}
         # Retorna a resposta de erro com código de status 500 (Internal Server Error)
         return resp, 500
 
-    # Cria um objeto cursor para executar consultas SQL no banco de dados
-    # O parâmetro dictionary=True faz com que os resultados sejam retornados como dicionários
-    cursor = conn.cursor(dictionary=True)
-
-    # Define a consulta SQL para selecionar todos os registros da tabela tbl_fornecedores
-    sql = "SELECT * from tbl_pedido"
-    # Executa a consulta SQL no banco de dados
-    cursor.execute(sql)
-
-    # Obtém todos os resultados da consulta e armazena na variável results
-    # Os resultados serão uma lista de dicionários, onde cada dicionário representa uma linha
-    results = cursor.fetchall()
+    # Calcula o cursor da próxima página
+    proximo = proxima_pagina(results, pagina)
 
-    # Fecha o cursor para liberar os recursos associados a ele
-    cursor.close()
-    # Fecha a conexão com o banco de dados para liberar os recursos
-    conn.close()
+    # Serializa as linhas direto das tuplas, usando a lista de colunas já conhecida
+    return resposta_linhas("pedidos", pagina, results, proximo), 200
 
-    # Cria um dicionário de resposta onde a chave "fornecedores" contém os resultados da consulta
-    resp = {
-        "pedidos": results
+@app.route('/pedidos/lote', methods=['POST'])
+def cria_pedidos_em_lote():
+    # Recebe uma lista JSON (ou NDJSON) de pedidos. Clientes e carrinhos são conferidos com uma
+    # consulta IN (...) por tabela e todos os pedidos entram com INSERTs de várias linhas
+    referencias = {
+        'cliente_id': ('tbl_clientes', "Cliente não encontrado"),
+        'carrinho_id': ('tbl_carrinho', "Carrinho não encontrado"),
     }
-
-    # Retorna a resposta JSON com a lista de fornecedores e código de status 200 (OK)
-    return resp, 200
+    return insere_lote('tbl_pedido', 'pedidos', referencias)
 
 @app.route('/pedidos', methods=['POST'])
 def cria_pedidos():
     # Define a rota /clientes que responde a requisições HTTP do tipo POST
     # A função cria_clientes será executada quando esta rota for acessada.
 
+    # Obtém os dados da requisição em formato JSON e converte para os tipos das colunas antes de aceitar
+    # o pedido: com a gravação adiada, um valor que o banco recusa só apareceria depois do 202
+    try:
+        entrada_dados = converte_entrada('tbl_pedido', request.json, ('cliente_id', 'carrinho_id', 'data_hora', 'status'))
+    except ValueError as err:
+        return {"erro": str(err)}, 400
+
+    cliente_id = entrada_dados["cliente_id"]
+    carrinho_id=entrada_dados["carrinho_id"]
+    data_hora = entrada_dados["data_hora"]
+    status=entrada_dados["status"]
+
     # Tenta conectar ao banco de dados
     conn = connect_db()
 
@@ -928,14 +2464,6 @@ def cria_pedidos():
         resp = {"erro": "Erro ao conectar ao banco de dados"}
         # Retorna a resposta de erro com código de status 500 (Internal Server Error)
         return resp, 500
-    
-    # Obtém os dados da requisição em formato JSON
-    entrada_dados = request.json
-    
-    cliente_id = entrada_dados["cliente_id"]
-    carrinho_id=entrada_dados["carrinho_id"]
-    data_hora = entrada_dados["data_hora"]
-    status=entrada_dados["status"]
 
     cursor = conn.cursor(dictionary=True)
 
@@ -950,34 +2478,178 @@ def cria_pedidos():
     cursor.execute("SELECT id FROM tbl_carrinho WHERE id = %s",(carrinho_id,))
     carrinho = cursor.fetchone()
 
-    if carrinho is None:
+    # Com a gravação adiada, o carrinho pode ter sido aceito e ainda estar na fila
+    if carrinho is None and not (fila_gravacao is not None and fila_gravacao.contem('carrinho', carrinho_id)):
         cursor.close()
         conn.close()
         return {"erro": "Carrinho não encontrado"}, 404
+
+    if fila_gravacao is not None:
+        # Gravação adiada: o pedido vai para o log local e é gravado no banco no próximo lote
+        cursor.close()
+        conn.close()
+        try:
+            item = {"tipo": "pedido", "id": alocador.proximo('tbl_pedido'), "cliente_id": cliente_id,
+                    "carrinho_id": carrinho_id, "data_hora": data_hora.isoformat(sep=' '), "status": status}
+        except Error as err:
+            print(f"Erro ao reservar id do pedido: {err}")
+            return {"erro": "Erro ao cadastrar pedido"}, 500
+        erro = aceita_escrita(item)
+        if erro is not None:
+            return erro
+        return f"O pedido de id {item['id']} foi aceito e será cadastrado em instantes", 202
     
     sql = "INSERT INTO tbl_pedido (cliente_id,carrinho_id,data_hora,status) VALUES (%s,%s,%s,%s)"
     # Prepara os valores a serem inseridos, obtendo-os do dicionário entrada_dados
     values = (cliente_id,carrinho_id,data_hora,status)
     
-    # Executa a consulta SQL de inserção no banco de dados
-    cursor.execute(sql, values)
-    # Confirma a transação para que as alterações sejam aplicadas ao banco de dados
-    conn.commit()
-
-    # Obtém o ID do cliente recém-criado usando lastrowid
-    id = cursor.lastrowid
+    try:
+        # Executa a consulta SQL de inserção no banco de dados
+        cursor.execute(sql, values)
+        # Obtém o ID do pedido recém-criado usando lastrowid
+        id = cursor.lastrowid
+        # Soma o pedido ao resumo de receita na mesma transação
+        resumos.ajusta(cursor, 'pedido', (id,), 1)
+        # Confirma a transação para que as alterações sejam aplicadas ao banco de dados
+        conn.commit()
+    except Error as err:
+        conn.rollback()
+        print(f"Erro ao cadastrar pedido: {err}")
+        return {"erro": "Erro ao cadastrar pedido"}, 500
+    finally:
+        # Fecha o cursor para liberar os recursos associados a ele
+        cursor.close()
+        # Fecha a conexão com o banco de dados para liberar os recursos
+        conn.close()
 
-    # Cria uma resposta informando o sucesso da operação e o ID do novo cliente
+    # A listagem de pedidos mudou
+    registra_alteracao('tbl_pedido', id)
 
-    # Fecha o cursor para liberar os recursos associados a ele
-    cursor.close()
-    # Fecha a conexão com o banco de dados para liberar os recursos
-    conn.close()
-    
     resp = f"O pedido de id {id} foi cadastrado com sucesso!"
     # Retorna a resposta JSON com a mensagem de sucesso e código de status 201 (Created)
     return resp, 201
 
+"""RELATORIOS---------------------"""
+
+@app.route('/relatorios/receita', methods=['GET'])
+def relatorio_receita():
+    # Pedidos, itens e receita agrupados por fornecedor, dia e/ou status (agrupar=fornecedor,dia,status).
+    # Lê apenas as tabelas de resumo: o custo depende do número de grupos, não do histórico de pedidos
+    agrupar = [d.strip() for d in request.args.get('agrupar', 'fornecedor').split(',') if d.strip()]
+    for dimensao in agrupar:
+        if dimensao not in resumos.DIMENSOES:
+            return {"erro": f"Agrupamento inválido: {dimensao}"}, 400
+
+    # Filtros opcionais: inicio= e fim= (AAAA-MM-DD), status= e fornecedor_id=
+    condicoes = []
+    valores = []
+    try:
+        if 'inicio' in request.args:
+            condicoes.append("dia >= %s")
+            valores.append(date.fromisoformat(request.args['inicio']))
+        if 'fim' in request.args:
+            condicoes.append("dia <= %s")
+            valores.append(date.fromisoformat(request.args['fim']))
+        if 'fornecedor_id' in request.args:
+            condicoes.append("fornecedor_id = %s")
+            valores.append(int(request.args['fornecedor_id']))
+    except ValueError:
+        return {"erro": "Parâmetros inválidos: use datas AAAA-MM-DD e fornecedor_id inteiro"}, 400
+    if 'status' in request.args:
+        condicoes.append("status = %s")
+        valores.append(request.args['status'])
+
+    conn = connect_db()  # Conecta ao banco de dados
+    if conn is None:
+        return {"erro": "Erro ao conectar ao banco de dados"}, 500
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(resumos.sql_receita(tuple(agrupar), tuple(condicoes)), valores)
+        linhas = cursor.fetchall()
+    except Error as err:
+        print(f"Erro ao gerar relatório de receita: {err}")
+        return {"erro": "Erro ao gerar relatório"}, 500
+    finally:
+        cursor.close()
+        conn.close()
+
+    for linha in linhas:
+        # O dia vai no formato AAAA-MM-DD, o mesmo aceito em inicio= e fim=
+        if isinstance(linha.get('dia'), date):
+            linha['dia'] = linha['dia'].isoformat()
+    return {"receita": linhas}, 200
+
+@app.route('/relatorios/carrinhos', methods=['GET'])
+def relatorio_carrinhos():
+    # Itens e valor em carrinhos por fornecedor, lidos do resumo (uma linha por fornecedor)
+    conn = connect_db()  # Conecta ao banco de dados
+    if conn is None:
+        return {"erro": "Erro ao conectar ao banco de dados"}, 500
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT fornecedor_id, linhas, itens, valor FROM tbl_resumo_carrinhos "
+                       "WHERE linhas > 0 ORDER BY fornecedor_id")
+        linhas = cursor.fetchall()
+    except Error as err:
+        print(f"Erro ao gerar relatório de carrinhos: {err}")
+        return {"erro": "Erro ao gerar relatório"}, 500
+    finally:
+        cursor.close()
+        conn.close()
+    return {"carrinhos": linhas}, 200
+
+"""RESERVAS---------------------"""
+
+@app.route('/reservas/produtos/<int:produto_id>', methods=['POST'])
+def aquece_produto(produto_id):
+    # Passa a reservar o estoque do produto em memória (ex.: antes de uma promoção relâmpago)
+    conn = connect_db()
+    if conn is None:
+        return {"erro": "Erro ao conectar ao banco de dados"}, 500
+
+    try:
+        # O bloqueio da linha impede que uma reserva pelo banco mude o estoque enquanto o contador é criado
+        estoque = aquece_reserva(conn, produto_id)
+    except Error as err:
+        print(f"Erro ao reservar produto em memória: {err}")
+        return {"erro": "Erro ao reservar produto em memória"}, 500
+    finally:
+        conn.close()
+    if estoque is None:
+        return {"erro": "Produto não encontrado"}, 404
+    return {"reserva": reservas.estado()[str(produto_id)]}, 201
+
+@app.route('/reservas/produtos/<int:produto_id>', methods=['DELETE'])
+def esfria_produto(produto_id):
+    # Volta o produto para a reserva direta no banco, aplicando as reservas pendentes
+    reservas.esfria(produto_id)
+    conn = connect_db()
+    if conn is None:
+        return {"erro": "Erro ao conectar ao banco de dados"}, 500
+    try:
+        # Em caso de erro os pendentes continuam guardados e a requisição pode ser repetida
+        alterados = reconcilia(conn, reservas, [produto_id])
+    except Error as err:
+        print(f"Erro ao aplicar reservas pendentes: {err}")
+        return {"erro": "Erro ao aplicar reservas pendentes"}, 500
+    finally:
+        conn.close()
+    if alterados:
+        registra_alteracao('tbl_produtos', produto_id)
+    return f"O estoque do produto {produto_id} voltou a ser reservado no banco", 200
+
+@app.cli.command('reconstroi-resumos')
+def reconstroi_resumos():
+    """Recalcula as tabelas de resumo a partir de pedidos, carrinhos e produtos."""
+    # Uso: flask --app app reconstroi-resumos (carga inicial ou correção dos resumos)
+    conn = get_pool().obter()
+    try:
+        resumos.reconstroi(conn)
+    finally:
+        conn.close()
+    print("Resumos reconstruídos com sucesso!")
 
 
 if __name__ == '__main__':
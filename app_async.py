@@ -0,0 +1,183 @@
+import asyncio
+import copy
+import os
+import ssl
+
+import aiomysql
+from quart import Quart, request
+
+from coalescencia import CoalescedorAsync
+from configuracao import config, config_pool
+from paginacao import ler_paginacao, proxima_pagina, sql_pagina
+from repositorio import TABELAS
+
+# Modo assíncrono (ASGI) das rotas de leitura. Cada processo atende milhares de requisições
+# simultâneas enquanto espera o MySQL, em vez de uma por worker síncrono.
+# Execução: hypercorn app_async:app  (ou uvicorn app_async:app)
+
+app = Quart(__name__)
+
+# Pool assíncrono de conexões, criado quando o servidor começa a atender
+pool = None
+
+# Consultas iguais (mesmo SQL e valores) feitas ao mesmo tempo compartilham uma única ida ao banco
+coalescedor = CoalescedorAsync(int(os.getenv('COALESCENCIA_CHAVES', 1000))) \
+    if os.getenv('COALESCENCIA', '1') == '1' else None
+
+
+@app.before_serving
+async def cria_pool():
+    global pool
+    # Usa o mesmo certificado SSL configurado para o modo síncrono
+    contexto_ssl = ssl.create_default_context(cafile=config['ssl_ca']) if config['ssl_ca'] else None
+    pool = await aiomysql.create_pool(
+        host=config['host'],
+        port=config['port'],
+        user=config['user'],
+        password=config['password'],
+        db=config['database'],
+        ssl=contexto_ssl,
+        minsize=config_pool['tamanho'],
+        maxsize=config_pool['tamanho'] + config_pool['overflow'],
+        pool_recycle=config_pool['tempo_max_vida'],
+        autocommit=True,
+    )
+
+
+@app.after_serving
+async def fecha_pool():
+    pool.close()
+    await pool.wait_closed()
+
+
+async def consulta(sql, valores, apenas_um=False):
+    """Executa uma consulta de leitura, juntando as requisições simultâneas com a mesma consulta."""
+    if coalescedor is None:
+        return await executa_consulta(sql, valores, apenas_um)
+    resultado = await coalescedor.executa((sql, tuple(valores), apenas_um),
+                                          lambda: executa_consulta(sql, valores, apenas_um),
+                                          rotulo=request.full_path.rstrip('?'))
+    # Cada requisição recebe a sua cópia: proxima_pagina remove a linha extra da lista
+    return copy.copy(resultado)
+
+
+async def executa_consulta(sql, valores, apenas_um=False):
+    """Executa uma consulta de leitura com uma conexão emprestada do pool assíncrono."""
+    # Espera por uma conexão livre no máximo o mesmo tempo do pool síncrono
+    conn = await asyncio.wait_for(pool.acquire(), timeout=config_pool['timeout_checkout'])
+    try:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(sql, valores)
+            if apenas_um:
+                return await cursor.fetchone()
+            return list(await cursor.fetchall())
+    finally:
+        pool.release(conn)
+
+
+async def listar(tabela, chave):
+    """Lista uma página da tabela, com os mesmos parâmetros limit/after/fields do modo síncrono."""
+    try:
+        pagina = ler_paginacao(tabela, request.args)
+    except ValueError as err:
+        return {"erro": str(err)}, 400
+
+    sql, valores = sql_pagina(pagina)
+    try:
+        results = await consulta(sql, valores)
+    except (aiomysql.Error, asyncio.TimeoutError) as err:
+        print(f"Erro: {err}")
+        return {"erro": "Erro ao conectar ao banco de dados"}, 500
+
+    proximo = proxima_pagina(results, pagina)
+    return {chave: results, "proximo": proximo}, 200
+
+
+async def buscar(tabela, chave, id, nao_encontrado=None):
+    """Busca um registro pelo id. Com nao_encontrado, um id inexistente recebe 404 com essa mensagem.
+
+    As respostas seguem as rotas do app.py: só a de fornecedores responde 404; as demais, o registro nulo.
+    """
+    try:
+        registro = await consulta(TABELAS[tabela].sql_busca(), (id,), apenas_um=True)
+    except (aiomysql.Error, asyncio.TimeoutError) as err:
+        print(f"Erro ao buscar {chave}: {err}")
+        return {"erro": "Erro ao conectar ao banco de dados"}, 500
+    if registro is None and nao_encontrado is not None:
+        return {"erro": nao_encontrado}, 404
+    return {chave: registro}, 200
+
+
+@app.route('/', methods=['GET'])
+async def index():
+    return {"status": "API em execução"}, 200
+
+@app.route('/status/coalescencia', methods=['GET'])
+async def status_coalescencia():
+    return {"coalescencia": coalescedor.estatisticas() if coalescedor is not None else None}, 200
+
+"""CLIENTES---------------------"""
+
+@app.route('/clientes', methods=['GET'])
+async def listar_clientes():
+    return await listar('tbl_clientes', 'clientes')
+
+@app.route('/clientes/<int:id>', methods=['GET'])
+async def buscar_cliente_especifico(id):
+    return await buscar('tbl_clientes', 'cliente', id)
+
+"""FORNECEDORES---------------------"""
+
+@app.route('/fornecedores', methods=['GET'])
+async def listar_fornecedores():
+    return await listar('tbl_fornecedores', 'fornecedores')
+
+@app.route('/fornecedores/<int:id>', methods=['GET'])
+async def buscar_fornecedor_especifico(id):
+    return await buscar('tbl_fornecedores', 'fornecedor', id, "Fornecedor não encontrado")
+
+"""PRODUTOS---------------------"""
+
+@app.route('/produtos', methods=['GET'])
+async def listar_produtos():
+    return await listar('tbl_produtos', 'produtos')
+
+@app.route('/produtos/<int:id>', methods=['GET'])
+async def buscar_produtos_especifico(id):
+    return await buscar('tbl_produtos', 'produto', id)
+
+"""CARRINHOS---------------------"""
+
+@app.route('/carrinhos', methods=['GET'])
+async def listar_carrinhos():
+    return await listar('tbl_carrinho', 'carrinhos')
+
+@app.route('/carrinhos/<int:id>', methods=['GET'])
+async def buscar_carrinhos_especifico(id):
+    return await buscar('tbl_carrinho', 'carrinho', id)
+
+@app.route('/carrinhos/cliente/<int:cliente_id>', methods=['GET'])
+async def lista_carrinhos_do_cliente(cliente_id):
+    # O filtro é feito direto em tbl_carrinho.cliente_id (indexado), sem JOIN com tbl_clientes
+    sql = """
+    SELECT id AS carrinho_id, produto_id, quantidade
+    FROM tbl_carrinho
+    WHERE cliente_id = %s
+    ORDER BY id
+    """
+    try:
+        carrinhos = await consulta(sql, (cliente_id,))
+    except (aiomysql.Error, asyncio.TimeoutError) as err:
+        print(f"Erro ao buscar carrinhos: {err}")
+        return {"erro": "Erro ao buscar carrinhos"}, 500
+    return {"carrinhos": carrinhos}, 200
+
+"""PEDIDOS---------------------"""
+
+@app.route('/pedidos', methods=['GET'])
+async def listar_pedidos():
+    return await listar('tbl_pedido', 'pedidos')
+
+
+if __name__ == '__main__':
+    app.run(debug=True)
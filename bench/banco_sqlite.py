@@ -0,0 +1,283 @@
+"""Banco local para os benchmarks: SQLite atrás da mesma API do mysql.connector usada pela aplicação.
+
+instala(caminho) troca mysql.connector.connect, então o pool, o Repositorio e as rotas rodam sem
+alterações. Réplicas de leitura são cópias do arquivo (cria_replica) que não recebem as escritas
+do primário, com o atraso informado em SHOW REPLICA STATUS controlado por define_atraso. O SQL recebido é o mesmo enviado ao MySQL, com as poucas traduções de dialeto abaixo.
+instala_async(caminho) faz o mesmo com aiomysql.create_pool para o app_async.py: as consultas rodam
+em threads (asyncio.to_thread), como se o event loop esperasse a rede.
+"""
+import asyncio
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+
+import mysql.connector
+from mysql.connector import errors
+
+from repositorio import TABELAS
+
+# Tipos das colunas no SQLite, escolhidos para que os valores voltem com o mesmo tipo Python do MySQL
+TIPOS_SQLITE = {int: 'INTEGER', str: 'TEXT', Decimal: 'DECIMAL', datetime: 'DATETIME'}
+
+# Chaves estrangeiras do banco real, necessárias para os caminhos de erro (404) das rotas
+REFERENCIAS = {
+    ('tbl_produtos', 'fornecedor_id'): 'tbl_fornecedores',
+    ('tbl_carrinho', 'produto_id'): 'tbl_produtos',
+    ('tbl_carrinho', 'cliente_id'): 'tbl_clientes',
+    ('tbl_pedido', 'cliente_id'): 'tbl_clientes',
+    ('tbl_pedido', 'carrinho_id'): 'tbl_carrinho',
+}
+
+CENTAVOS = Decimal('0.01')
+
+RESUMOS = """
+CREATE TABLE IF NOT EXISTS tbl_resumo_pedidos (
+    fornecedor_id INTEGER NOT NULL, dia DATE NOT NULL, status TEXT NOT NULL, pedidos INTEGER NOT NULL DEFAULT 0,
+    itens INTEGER NOT NULL DEFAULT 0, receita DECIMAL NOT NULL DEFAULT 0, PRIMARY KEY (fornecedor_id, dia, status)
+);
+CREATE TABLE IF NOT EXISTS tbl_resumo_carrinhos (
+    fornecedor_id INTEGER PRIMARY KEY, linhas INTEGER NOT NULL DEFAULT 0, itens INTEGER NOT NULL DEFAULT 0,
+    valor DECIMAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tbl_sequencias (tabela TEXT PRIMARY KEY, proximo INTEGER NOT NULL);
+INSERT OR IGNORE INTO tbl_sequencias VALUES ('tbl_carrinho', 1), ('tbl_pedido', 1);
+"""
+
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(date, lambda valor: valor.isoformat())
+sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(sep=' '))
+sqlite3.register_converter('DATE', lambda valor: date.fromisoformat(valor.decode()))
+sqlite3.register_converter('DECIMAL', lambda valor: Decimal(valor.decode()))
+sqlite3.register_converter('DATETIME', lambda valor: datetime.fromisoformat(valor.decode()))
+
+
+def cria_esquema(caminho):
+    """Cria as tabelas da aplicação, as de resumo e os índices de migracoes/001 no arquivo SQLite."""
+    conn = sqlite3.connect(caminho)
+    for tabela in TABELAS.values():
+        colunas = []
+        for coluna, tipo in tabela.tipos.items():
+            if coluna == tabela.chave:
+                colunas.append(f"{coluna} INTEGER PRIMARY KEY AUTOINCREMENT")
+            else:
+                referencia = REFERENCIAS.get((tabela.nome, coluna))
+                sufixo = f" REFERENCES {referencia} (id)" if referencia else ""
+                colunas.append(f"{coluna} {TIPOS_SQLITE[tipo]}{sufixo}")
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {tabela.nome} ({', '.join(colunas)})")
+    conn.executescript(RESUMOS)
+    with open('migracoes/001_indices_listagens.sql', encoding='utf-8') as arquivo:
+        for comando in arquivo.read().split(';'):
+            comando = "\n".join(linha for linha in comando.splitlines() if not linha.startswith('--')).strip()
+            if comando:
+                conn.execute(comando.replace('CREATE INDEX', 'CREATE INDEX IF NOT EXISTS'))
+    conn.commit()
+    conn.close()
+
+
+def traduz(sql):
+    """Converte as construções do MySQL usadas pela aplicação para o SQLite."""
+    if sql == "SHOW REPLICA STATUS":
+        return "SELECT * FROM tbl_replica_status"
+    sql = sql.replace('%s', '?')
+    # O SQLite não tem bloqueio de linha: a primeira escrita da transação bloqueia o banco inteiro
+    sql = re.sub(r'\bFOR UPDATE( SKIP LOCKED)?', '', sql)
+    sql = sql.replace('INSERT IGNORE', 'INSERT OR IGNORE')
+    # INSERT ... SELECT ... AS delta ON DUPLICATE KEY UPDATE x = tabela.x + delta.x
+    encontrado = re.search(r'\) AS (\w+)\s+ON DUPLICATE KEY UPDATE', sql)
+    if encontrado:
+        apelido = encontrado.group(1)
+        sql = sql[:encontrado.start()] + f') AS {apelido} WHERE true ON CONFLICT DO UPDATE SET' + \
+            sql[encontrado.end():].replace(f'{apelido}.', 'excluded.')
+    return sql
+
+
+def _erro(err):
+    # As rotas tratam os erros do mysql.connector
+    if isinstance(err, sqlite3.IntegrityError):
+        return errors.IntegrityError(msg=str(err))
+    if isinstance(err, sqlite3.OperationalError) and 'locked' in str(err):
+        # Equivale à espera por bloqueio esgotada do MySQL, que a fila de gravação tenta de novo
+        return errors.DatabaseError(msg=str(err), errno=1205)
+    return errors.DatabaseError(msg=str(err))
+
+
+class Cursor:
+    def __init__(self, conexao, dictionary=False, **kwargs):
+        self._conexao = conexao
+        self._cursor = conexao._db.cursor()
+        self._dicionario = dictionary
+        self.column_names = ()
+        self.lastrowid = None
+        self.rowcount = -1
+
+    def execute(self, sql, valores=()):
+        try:
+            self._cursor.execute(traduz(sql), tuple(valores or ()))
+        except sqlite3.Error as err:
+            raise _erro(err)
+        self.lastrowid = self._cursor.lastrowid
+        self.rowcount = self._cursor.rowcount
+        descricao = self._cursor.description
+        self.column_names = tuple(coluna[0] for coluna in descricao) if descricao else ()
+
+    def executemany(self, sql, linhas):
+        # Como no INSERT de várias linhas do MySQL, lastrowid é o id da primeira linha
+        primeiro = None
+        for valores in linhas:
+            self.execute(sql, valores)
+            primeiro = primeiro or self.lastrowid
+        self.lastrowid = primeiro
+
+    def _linha(self, linha):
+        if linha is None:
+            return linha
+        if any(type(valor) is float for valor in linha):
+            # Expressões sobre DECIMAL (SUM, quantidade * preco) voltam como float no SQLite e como
+            # Decimal no MySQL; o esquema não tem colunas de ponto flutuante, então todo float é dinheiro
+            linha = tuple(Decimal(valor).quantize(CENTAVOS) if type(valor) is float else valor for valor in linha)
+        if not self._dicionario:
+            return linha
+        return dict(zip(self.column_names, linha))
+
+    def fetchone(self):
+        return self._linha(self._cursor.fetchone())
+
+    def fetchmany(self, tamanho=1):
+        return [self._linha(linha) for linha in self._cursor.fetchmany(tamanho)]
+
+    def fetchall(self):
+        return [self._linha(linha) for linha in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class Conexao:
+    def __init__(self, caminho):
+        # isolation_level='IMMEDIATE': cada transação já reserva a escrita, evitando SQLITE_BUSY no meio dela
+        self._db = sqlite3.connect(caminho, timeout=30, isolation_level='IMMEDIATE', check_same_thread=False,
+                                   detect_types=sqlite3.PARSE_DECLTYPES)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA foreign_keys=ON')
+
+    @property
+    def in_transaction(self):
+        return self._db.in_transaction
+
+    def cursor(self, **kwargs):
+        return Cursor(self, **kwargs)
+
+    def start_transaction(self, **kwargs):
+        self._db.execute('BEGIN IMMEDIATE')
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self._db.close()
+
+
+def cria_replica(origem, destino, atraso=0):
+    """Copia o banco para servir de réplica de leitura, parada no estado atual do primário."""
+    fonte, copia = sqlite3.connect(origem), sqlite3.connect(destino)
+    fonte.backup(copia)
+    fonte.close()
+    copia.execute("CREATE TABLE tbl_replica_status (Seconds_Behind_Source INTEGER)")
+    copia.execute("INSERT INTO tbl_replica_status VALUES (?)", (atraso,))
+    copia.commit()
+    copia.close()
+
+
+def define_atraso(caminho, atraso):
+    """Muda o atraso informado pela réplica (None simula a replicação parada)."""
+    conn = sqlite3.connect(caminho)
+    conn.execute("UPDATE tbl_replica_status SET Seconds_Behind_Source = ?", (atraso,))
+    conn.commit()
+    conn.close()
+
+
+def instala(caminho, replicas=None):
+    """Faz mysql.connector.connect abrir conexões no arquivo SQLite informado.
+
+    replicas mapeia o host de cada réplica (DB_REPLICAS) para o arquivo dela.
+    """
+    replicas = replicas or {}
+    mysql.connector.connect = lambda **config: Conexao(replicas.get(config.get('host'), caminho))
+
+
+class CursorAsync:
+    """Cursor no formato do aiomysql (async with, await execute/fetch*) sobre o Cursor SQLite."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *excecao):
+        self._cursor.close()
+
+    async def execute(self, sql, valores=()):
+        await asyncio.to_thread(self._cursor.execute, sql, valores)
+
+    async def fetchone(self):
+        return await asyncio.to_thread(self._cursor.fetchone)
+
+    async def fetchall(self):
+        return await asyncio.to_thread(self._cursor.fetchall)
+
+
+class ConexaoAsync:
+    def __init__(self, caminho):
+        self._conexao = Conexao(caminho)
+
+    def cursor(self, classe=None):
+        import aiomysql
+        dicionario = classe is not None and issubclass(classe, aiomysql.DictCursor)
+        return CursorAsync(self._conexao.cursor(dictionary=dicionario))
+
+
+class PoolAsync:
+    """Pool no formato do aiomysql: acquire() espera uma conexão livre, até `maximo` conexões abertas."""
+
+    def __init__(self, caminho, maximo):
+        self._caminho = caminho
+        self._livres = asyncio.Queue()
+        self._vagas = asyncio.Semaphore(maximo)
+        self._abertas = []
+
+    async def acquire(self):
+        await self._vagas.acquire()
+        if self._livres.empty():
+            conexao = ConexaoAsync(self._caminho)
+            self._abertas.append(conexao)
+            return conexao
+        return self._livres.get_nowait()
+
+    def release(self, conexao):
+        self._livres.put_nowait(conexao)
+        self._vagas.release()
+
+    def close(self):
+        for conexao in self._abertas:
+            conexao._conexao.close()
+
+    async def wait_closed(self):
+        pass
+
+
+def instala_async(caminho):
+    """Faz aiomysql.create_pool criar um pool de conexões no arquivo SQLite informado."""
+    import aiomysql  # Só o modo assíncrono depende do aiomysql
+
+    async def cria_pool(maxsize=10, **config):
+        return PoolAsync(caminho, maxsize)
+
+    aiomysql.create_pool = cria_pool
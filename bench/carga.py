@@ -0,0 +1,565 @@
+"""Teste de carga das rotas do app.py sobre o banco SQLite local (bench.banco_sqlite).
+
+Popula o banco, sobe o servidor (bench.servidor) em um subprocesso e executa um cenário por rota,
+um cenário misto e a verificação de concorrência do carrinho. Para cada cenário grava vazão,
+latências p50/p95/p99 e o pico de memória (RSS) do servidor em um arquivo JSON.
+
+Execução:
+    python -m bench.carga                                        # volumes padrão
+    python -m bench.carga --rapido --saida bench/resultados/base.json
+    python -m bench.carga --rapido --base bench/resultados/base.json --tolerancia 0.25
+
+Com --busca-memoria o servidor sobe com BUSCA_MEMORIA=1 e as rotas de busca entram nos cenários.
+Com --replicas N o servidor lê de N cópias do banco (bench.banco_sqlite.cria_replica) configuradas em
+DB_REPLICAS; as cópias não recebem as escritas feitas durante o teste.
+Com --gravacao-adiada o servidor sobe com GRAVACAO_ADIADA=1 e os POST de carrinhos e pedidos passam
+pela fila de gravação (gravacao.py).
+O hash das senhas dos cadastros usa um custo reduzido (--senha-log-n) para os cenários de lote não
+dominarem a execução; o custo real sob rajada de cadastros é medido por bench.senhas.
+Com --base o resultado é comparado a uma execução anterior e o processo sai com código 1 se algum
+cenário regredir além da tolerância ou se a verificação de concorrência falhar.
+Os números medem o código da aplicação; o custo de rede e de bloqueio do MySQL real não aparece.
+"""
+import argparse
+import base64
+import http.client
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime
+
+from bench.banco_sqlite import cria_replica
+from bench.semente import STATUS, VOLUMES, semeia
+
+# gera(rng, meta) devolve (caminho, corpo); cabecalhos pode ser uma função (caminho, meta) -> dict;
+# fator multiplica o número de requisições do cenário. O método MISTO sorteia outro cenário a cada requisição.
+Cenario = namedtuple('Cenario', 'metodo gera cabecalhos fator', defaults=(None, 1.0))
+
+LOTE = 100  # Registros por requisição nos cenários de lote
+
+# Peso de cada cenário no cenário misto: leituras predominam, como no uso real da loja
+MISTO = {
+    'GET /produtos': 20, 'GET /produtos/<id>': 25, 'GET /produtos?filtros': 10,
+    'GET /clientes/<id>': 10, 'GET /carrinhos/cliente/<id>': 10, 'GET /carrinhos/cliente/<id>/detalhes': 5,
+    'GET /pedidos?cliente_id': 5, 'POST /carrinhos': 6, 'PUT /carrinhos/<id>': 3, 'POST /pedidos': 3,
+    'PUT /produtos/<id>': 1, 'GET /relatorios/receita': 2,
+}
+
+sequencia = itertools.count(1)  # Sufixo único para e-mails, CPFs e CNPJs criados durante a carga
+
+
+def aleatorio(rng, meta, tabela):
+    return rng.randint(1, meta[tabela])
+
+
+def cursor(id):
+    # Mesmo formato de paginacao.codifica_cursor: simula a leitura de uma página qualquer da listagem
+    return base64.urlsafe_b64encode(json.dumps({"id": id}).encode()).decode().rstrip("=")
+
+
+def descartavel(meta, tabela):
+    """Iterador (seguro entre threads no CPython) sobre os ids sem dependentes da tabela."""
+    inicio, fim = meta['descartaveis'][tabela]
+    return iter(range(inicio, fim + 1))
+
+
+def cliente_novo(rng, meta):
+    n = next(sequencia)
+    return {"nome": f"Carga {n}", "email": f"carga{n}@exemplo.com", "cpf": f"9{n:010d}", "senha": "senha"}
+
+
+def fornecedor_novo(rng, meta):
+    n = next(sequencia)
+    return {"nome": f"Fornecedor carga {n}", "email": f"fornecedor.carga{n}@exemplo.com", "cnpj": f"9{n:013d}"}
+
+
+def produto_novo(rng, meta):
+    n = next(sequencia)
+    return {"nome": f"Produto carga {n}", "descricao": "Criado pelo teste de carga",
+            "preco": round(rng.uniform(1, 1000), 2), "qtd_em_estoque": 10 ** 6,
+            "fornecedor_id": aleatorio(rng, meta, 'fornecedores'), "custo_no_fornecedor": round(rng.uniform(1, 500), 2)}
+
+
+def pedido_novo(rng, meta):
+    # O cliente do pedido não precisa ser o dono do carrinho para a API
+    return {"cliente_id": aleatorio(rng, meta, 'clientes'), "carrinho_id": aleatorio(rng, meta, 'carrinhos'),
+            "data_hora": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 12:00:00",
+            "status": rng.choice(STATUS)}
+
+
+def cenarios(meta, busca=False):
+    """Um cenário por rota do app.py (e variações relevantes de parâmetros).
+
+    As rotas de busca só entram com busca=True: o SQLite não tem o MATCH ... AGAINST do MySQL,
+    então elas são medidas com o índice em memória (BUSCA_MEMORIA=1).
+    """
+    apagar = {tabela: descartavel(meta, tabela) for tabela in meta['descartaveis']}
+    todos = {
+        'GET /': Cenario('GET', lambda rng, meta: ('/', None)),
+        'GET /status/pool': Cenario('GET', lambda rng, meta: ('/status/pool', None)),
+        'GET /status/cache': Cenario('GET', lambda rng, meta: ('/status/cache', None)),
+        'GET /metrics': Cenario('GET', lambda rng, meta: ('/metrics', None), fator=0.2),
+
+        'GET /clientes': Cenario('GET', lambda rng, meta: (f'/clientes?limit=100&after={cursor(aleatorio(rng, meta, "clientes"))}', None)),
+        'GET /clientes?email': Cenario('GET', lambda rng, meta: (
+            f'/clientes?email=cliente{aleatorio(rng, meta, "clientes")}@exemplo.com', None)),
+        'GET /clientes/<id>': Cenario('GET', lambda rng, meta: (f'/clientes/{aleatorio(rng, meta, "clientes")}', None)),
+        'POST /clientes': Cenario('POST', lambda rng, meta: ('/clientes', cliente_novo(rng, meta))),
+        'POST /clientes/lote': Cenario('POST', lambda rng, meta: (
+            '/clientes/lote', [cliente_novo(rng, meta) for _ in range(LOTE)]), fator=0.2),
+        'PUT /clientes/<id>': Cenario('PUT', lambda rng, meta: (
+            f'/clientes/{aleatorio(rng, meta, "clientes")}', {"nome": f"Cliente {rng.random():.6f}"})),
+        'DELETE /clientes/<id>': Cenario('DELETE', lambda rng, meta: (f'/clientes/{next(apagar["clientes"])}', None)),
+
+        'GET /fornecedores': Cenario('GET', lambda rng, meta: ('/fornecedores?limit=100&sort=nome', None)),
+        'GET /fornecedores/<id>': Cenario('GET', lambda rng, meta: (
+            f'/fornecedores/{aleatorio(rng, meta, "fornecedores")}', None)),
+        'POST /fornecedores': Cenario('POST', lambda rng, meta: ('/fornecedores', fornecedor_novo(rng, meta))),
+        'POST /fornecedores/lote': Cenario('POST', lambda rng, meta: (
+            '/fornecedores/lote', [fornecedor_novo(rng, meta) for _ in range(LOTE)]), fator=0.2),
+        'PUT /fornecedores/<id>': Cenario('PUT', lambda rng, meta: (
+            f'/fornecedores/{aleatorio(rng, meta, "fornecedores")}', {"nome": f"Fornecedor {rng.random():.6f}"})),
+        'DELETE /fornecedores/<id>': Cenario('DELETE', lambda rng, meta: (
+            f'/fornecedores/{next(apagar["fornecedores"])}', None)),
+
+        'GET /produtos': Cenario('GET', lambda rng, meta: (f'/produtos?limit=100&after={cursor(aleatorio(rng, meta, "produtos"))}', None)),
+        # Página grande: exercita a serialização e a compressão negociada
+        'GET /produtos?limit=1000 gzip': Cenario('GET', lambda rng, meta: ('/produtos?limit=1000', None),
+                                                 {'Accept-Encoding': 'gzip'}, fator=0.2),
+        'GET /produtos?filtros': Cenario('GET', lambda rng, meta: (
+            f'/produtos?fornecedor_id={aleatorio(rng, meta, "fornecedores")}&preco_min=10&sort=-preco', None)),
+        'GET /produtos/<id>': Cenario('GET', lambda rng, meta: (f'/produtos/{aleatorio(rng, meta, "produtos")}', None)),
+        # GET condicional: o ETag é lido por prepara_condicional antes do cenário
+        'GET /produtos/<id> If-None-Match': Cenario('GET', lambda rng, meta: (rng.choice(list(meta['etags'])), None),
+                                                    lambda caminho, meta: {'If-None-Match': meta['etags'][caminho]}),
+        'POST /produtos': Cenario('POST', lambda rng, meta: ('/produtos', produto_novo(rng, meta))),
+        'POST /produtos/lote': Cenario('POST', lambda rng, meta: (
+            '/produtos/lote', [produto_novo(rng, meta) for _ in range(LOTE)]), fator=0.2),
+        'PUT /produtos/<id>': Cenario('PUT', lambda rng, meta: (
+            f'/produtos/{aleatorio(rng, meta, "produtos")}', {"preco": round(rng.uniform(1, 1000), 2)})),
+        'DELETE /produtos/<id>': Cenario('DELETE', lambda rng, meta: (f'/produtos/{next(apagar["produtos"])}', None)),
+
+        'GET /carrinhos': Cenario('GET', lambda rng, meta: (f'/carrinhos?limit=100&after={cursor(aleatorio(rng, meta, "carrinhos"))}', None)),
+        'GET /carrinhos/<id>': Cenario('GET', lambda rng, meta: (f'/carrinhos/{aleatorio(rng, meta, "carrinhos")}', None)),
+        'GET /carrinhos/cliente/<id>': Cenario('GET', lambda rng, meta: (
+            f'/carrinhos/cliente/{aleatorio(rng, meta, "clientes")}', None)),
+        'GET /carrinhos/cliente/<id>/detalhes': Cenario('GET', lambda rng, meta: (
+            f'/carrinhos/cliente/{aleatorio(rng, meta, "clientes")}/detalhes', None)),
+        'POST /carrinhos': Cenario('POST', lambda rng, meta: ('/carrinhos', {
+            "produto_id": aleatorio(rng, meta, 'produtos'), "quantidade": rng.randint(1, 3),
+            "cliente_id": aleatorio(rng, meta, 'clientes')})),
+        'PUT /carrinhos/<id>': Cenario('PUT', lambda rng, meta: (
+            f'/carrinhos/{aleatorio(rng, meta, "carrinhos")}', {"quantidade": rng.randint(1, 5)})),
+        'DELETE /carrinhos/<id>': Cenario('DELETE', lambda rng, meta: (f'/carrinhos/{next(apagar["carrinhos"])}', None)),
+
+        'GET /pedidos': Cenario('GET', lambda rng, meta: (f'/pedidos?limit=100&after={cursor(aleatorio(rng, meta, "pedidos"))}', None)),
+        'GET /pedidos?cliente_id': Cenario('GET', lambda rng, meta: (
+            f'/pedidos?cliente_id={aleatorio(rng, meta, "clientes")}&status={rng.choice(STATUS)}', None)),
+        'GET /pedidos?stream=ndjson': Cenario('GET', lambda rng, meta: ('/pedidos?stream=ndjson&fields=id,status', None),
+                                              fator=0.02),
+        'POST /pedidos': Cenario('POST', lambda rng, meta: ('/pedidos', pedido_novo(rng, meta))),
+        'POST /pedidos/lote': Cenario('POST', lambda rng, meta: (
+            '/pedidos/lote', [pedido_novo(rng, meta) for _ in range(LOTE)]), fator=0.2),
+
+        'GET /relatorios/receita': Cenario('GET', lambda rng, meta: (
+            f'/relatorios/receita?agrupar={rng.choice(("fornecedor", "status", "dia"))}', None)),
+        'GET /relatorios/receita?filtros': Cenario('GET', lambda rng, meta: (
+            f'/relatorios/receita?agrupar=dia&inicio=2024-{rng.randint(1, 6):02d}-01&fim=2024-12-31'
+            f'&fornecedor_id={aleatorio(rng, meta, "fornecedores")}', None)),
+        'GET /relatorios/carrinhos': Cenario('GET', lambda rng, meta: ('/relatorios/carrinhos', None)),
+    }
+    if busca:
+        todos.update({
+            'GET /produtos/busca': Cenario('GET', lambda rng, meta: (
+                f'/produtos/busca?q=produto+{aleatorio(rng, meta, "produtos")}&limit=20', None)),
+            'GET /produtos/busca/sugestoes': Cenario('GET', lambda rng, meta: (
+                '/produtos/busca/sugestoes?q=desc', None)),
+            'GET /clientes/busca': Cenario('GET', lambda rng, meta: (
+                f'/clientes/busca?q=cliente{aleatorio(rng, meta, "clientes")}&limit=20', None)),
+        })
+    nomes = list(MISTO)
+    pesos = [MISTO[nome] for nome in nomes]
+    todos['misto'] = Cenario('MISTO', lambda rng, meta: todos[rng.choices(nomes, pesos)[0]], fator=2.0)
+    return todos
+
+
+def monta(cenario, rng, meta):
+    """Gera (método, caminho, corpo, cabeçalhos) da próxima requisição do cenário."""
+    if cenario.metodo == 'MISTO':
+        cenario = cenario.gera(rng, meta)
+    caminho, corpo = cenario.gera(rng, meta)
+    cabecalhos = cenario.cabecalhos
+    if callable(cabecalhos):
+        cabecalhos = cabecalhos(caminho, meta)
+    return cenario.metodo, caminho, corpo, cabecalhos
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def sobe_servidor(banco, porta, ambiente=None, replicas=None, modulo='bench.servidor'):
+    """Inicia o servidor (bench.servidor, ou bench.servidor_async) e espera até a rota / responder.
+
+    replicas mapeia host -> arquivo da réplica.
+    """
+    comando = [sys.executable, '-m', modulo, '--banco', banco, '--porta', str(porta)]
+    for host, arquivo in (replicas or {}).items():
+        comando += ['--replica', f"{host}={arquivo}"]
+    processo = subprocess.Popen(comando, stdout=subprocess.DEVNULL, env={**os.environ, **(ambiente or {})})
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError("O servidor de benchmark terminou durante a inicialização")
+        try:
+            conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=1)
+            conexao.request('GET', '/')
+            conexao.getresponse().read()
+            conexao.close()
+            return processo
+        except OSError:
+            time.sleep(0.1)
+    processo.kill()
+    raise RuntimeError("O servidor de benchmark não respondeu em 30 segundos")
+
+
+def requisita(conexao, metodo, caminho, corpo, cabecalhos):
+    """Envia uma requisição pela conexão keep-alive e lê a resposta inteira. Retorna (status, bytes)."""
+    headers = dict(cabecalhos or {})
+    dados = None
+    if corpo is not None:
+        dados = json.dumps(corpo).encode()
+        headers['Content-Type'] = 'application/json'
+    conexao.request(metodo, caminho, body=dados, headers=headers)
+    resposta = conexao.getresponse()
+    return resposta.status, len(resposta.read())
+
+
+class MonitorRSS(threading.Thread):
+    """Amostra o VmRSS do servidor em /proc enquanto o cenário roda e guarda o pico (em kB)."""
+
+    def __init__(self, pid, intervalo=0.02):
+        super().__init__(daemon=True)
+        self.caminho = f'/proc/{pid}/status'
+        self.intervalo = intervalo
+        self.pico = None
+        self.parar = threading.Event()
+
+    def amostra(self):
+        try:
+            with open(self.caminho) as arquivo:
+                for linha in arquivo:
+                    if linha.startswith('VmRSS:'):
+                        return int(linha.split()[1])
+        except OSError:
+            # Sem /proc (macOS, Windows): o pico de memória fica ausente do resultado
+            return None
+
+    def run(self):
+        while True:
+            valor = self.amostra()
+            if valor is not None:
+                self.pico = max(self.pico or 0, valor)
+            if self.parar.wait(self.intervalo):
+                return
+
+
+def percentil(ordenadas, p):
+    # Percentil pelo posto mais próximo
+    if not ordenadas:
+        return None
+    return ordenadas[max(0, math.ceil(p / 100 * len(ordenadas)) - 1)]
+
+
+def executa(porta, pid, cenario, meta, requisicoes, concorrencia):
+    """Dispara `requisicoes` requisições do cenário a partir de `concorrencia` threads."""
+    fila = itertools.count()
+    latencias = []
+    status = Counter()
+    tamanhos = []
+    trava = threading.Lock()
+
+    def trabalhador(numero):
+        rng = random.Random(numero)
+        conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=120)
+        locais, codigos, bytes_lidos = [], Counter(), []
+        while next(fila) < requisicoes:
+            try:
+                metodo, caminho, corpo, cabecalhos = monta(cenario, rng, meta)
+            except StopIteration:
+                # Acabaram os ids descartáveis do cenário de DELETE
+                break
+            inicio = time.perf_counter()
+            try:
+                codigo, tamanho = requisita(conexao, metodo, caminho, corpo, cabecalhos)
+                bytes_lidos.append(tamanho)
+            except (OSError, http.client.HTTPException):
+                conexao.close()
+                conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=120)
+                codigo = 'falha'
+            locais.append(time.perf_counter() - inicio)
+            codigos[str(codigo)] += 1
+        conexao.close()
+        with trava:
+            latencias.extend(locais)
+            status.update(codigos)
+            tamanhos.extend(bytes_lidos)
+
+    monitor = MonitorRSS(pid)
+    monitor.start()
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=trabalhador, args=(numero,)) for numero in range(concorrencia)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+    monitor.parar.set()
+    monitor.join()
+
+    latencias.sort()
+    ms = lambda valor: round(valor * 1000, 3) if valor is not None else None
+    # Falhas de conexão e respostas 5xx contam como erro; 4xx fazem parte do comportamento da API
+    erros = sum(n for codigo, n in status.items() if codigo == 'falha' or codigo.startswith('5'))
+    return {
+        'requisicoes': len(latencias),
+        'erros': erros,
+        'status': dict(status),
+        'duracao_s': round(duracao, 3),
+        'vazao_rps': round(len(latencias) / duracao, 2) if duracao else None,
+        'p50_ms': ms(percentil(latencias, 50)),
+        'p95_ms': ms(percentil(latencias, 95)),
+        'p99_ms': ms(percentil(latencias, 99)),
+        'max_ms': ms(latencias[-1] if latencias else None),
+        'bytes_medios': round(sum(tamanhos) / len(tamanhos)) if tamanhos else 0,
+        'pico_rss_mb': round(monitor.pico / 1024, 1) if monitor.pico else None,
+    }
+
+
+def prepara_condicional(porta, meta, quantidade=50):
+    """Lê o ETag atual de alguns produtos para o cenário de GET condicional."""
+    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+    meta['etags'] = {}
+    for id in range(1, min(quantidade, meta['produtos']) + 1):
+        conexao.request('GET', f'/produtos/{id}')
+        resposta = conexao.getresponse()
+        resposta.read()
+        if resposta.getheader('ETag'):
+            meta['etags'][f'/produtos/{id}'] = resposta.getheader('ETag')
+    conexao.close()
+
+
+def chama(porta, metodo, caminho, corpo=None):
+    """Requisição avulsa fora da medição. Retorna (status, corpo JSON ou None)."""
+    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+    conexao.request(metodo, caminho, body=json.dumps(corpo).encode() if corpo is not None else None,
+                    headers={'Content-Type': 'application/json'} if corpo is not None else {})
+    resposta = conexao.getresponse()
+    dados = resposta.read()
+    conexao.close()
+    if resposta.getheader('Content-Type', '').startswith('application/json'):
+        return resposta.status, json.loads(dados)
+    return resposta.status, None
+
+
+def espera_indices(porta, limite=120):
+    """Espera a carga inicial dos índices de busca em memória."""
+    limite = time.monotonic() + limite
+    while time.monotonic() < limite:
+        if all(indice['pronto'] for indice in chama(porta, 'GET', '/status/busca')[1]['busca'].values()):
+            return
+        time.sleep(0.1)
+    raise RuntimeError("Os índices de busca não foram carregados a tempo")
+
+
+def espera_gravacao(porta, limite=30):
+    """Com a gravação adiada, espera a fila chegar ao banco antes de conferir o estoque."""
+    limite = time.monotonic() + limite
+    while time.monotonic() < limite:
+        gravacao = chama(porta, 'GET', '/status/gravacao')[1]['gravacao']
+        if gravacao is None or not gravacao['pendentes']:
+            return
+        time.sleep(0.1)
+
+
+def verifica_concorrencia(porta, meta, concorrencia, quente=False):
+    """Disputa o produto de estoque limitado com o dobro de pedidos e confere que não houve venda a mais.
+
+    Com quente=True o produto é reservado em memória (/reservas/produtos/<id>) e o estoque final é
+    lido depois que a reconciliação aplica as reservas no banco.
+    """
+    produto = meta['produto_disputado']
+    estoque = meta['estoque_disputado']
+    chama(porta, 'PUT', f'/produtos/{produto}', {"qtd_em_estoque": estoque})
+    if quente:
+        chama(porta, 'POST', f'/reservas/produtos/{produto}')
+    cenario = Cenario('POST', lambda rng, meta: ('/carrinhos', {
+        "produto_id": produto, "quantidade": 1, "cliente_id": aleatorio(rng, meta, 'clientes')}))
+    resultado = executa(porta, None, cenario, meta, estoque * 2, concorrencia)
+    # 202: aceito pela gravação adiada
+    reservas = resultado['status'].get('201', 0) + resultado['status'].get('202', 0)
+    espera_gravacao(porta)
+
+    if quente:
+        # Espera a thread de reconciliação zerar o pendente e devolve o produto à reserva pelo banco
+        limite = time.monotonic() + 30
+        while chama(porta, 'GET', '/status/reservas')[1]['reservas'][str(produto)]['pendente'] and \
+                time.monotonic() < limite:
+            time.sleep(0.1)
+        chama(porta, 'DELETE', f'/reservas/produtos/{produto}')
+    final = chama(porta, 'GET', f'/produtos/{produto}')[1]['produto']['qtd_em_estoque']
+    return {
+        'estoque_inicial': estoque,
+        'tentativas': resultado['requisicoes'],
+        'reservas': reservas,
+        'estoque_final': final,
+        'p95_ms': resultado['p95_ms'],
+        # Cada reserva aceita baixou exatamente uma unidade, e nenhuma passou do estoque
+        'ok': final >= 0 and reservas == estoque - final and resultado['erros'] == 0,
+    }
+
+
+def compara(atual, base, tolerancia, piso_ms):
+    """Lista os cenários que pioraram em relação à base além da tolerância (portão de regressão).
+
+    O piso em milissegundos evita acusar regressão em rotas de poucos décimos de milissegundo,
+    onde o ruído da medição é maior que a tolerância relativa.
+    """
+    regressoes = []
+    for nome, medida in atual['cenarios'].items():
+        anterior = base['cenarios'].get(nome)
+        if anterior is None:
+            continue
+        if medida['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia) and medida['p95_ms'] - anterior['p95_ms'] > piso_ms:
+            regressoes.append(f"{nome}: p95 {anterior['p95_ms']:.2f} -> {medida['p95_ms']:.2f} ms")
+        if medida['vazao_rps'] < anterior['vazao_rps'] * (1 - tolerancia) and medida['p95_ms'] > piso_ms:
+            regressoes.append(f"{nome}: vazão {anterior['vazao_rps']:.1f} -> {medida['vazao_rps']:.1f} req/s")
+        if medida['erros'] > anterior['erros']:
+            regressoes.append(f"{nome}: erros {anterior['erros']} -> {medida['erros']}")
+    return regressoes
+
+
+def imprime(resultado):
+    print(f"{'cenário':<40} {'req':>6} {'erros':>5} {'req/s':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'RSS MB':>7}")
+    for nome, medida in resultado['cenarios'].items():
+        print(f"{nome:<40} {medida['requisicoes']:>6} {medida['erros']:>5} {medida['vazao_rps']:>9.1f} "
+              f"{medida['p50_ms']:>8.2f} {medida['p95_ms']:>8.2f} {medida['p99_ms']:>8.2f} "
+              f"{medida['pico_rss_mb'] if medida['pico_rss_mb'] is not None else '-':>7}")
+    for nome, concorrencia in resultado['verificacoes'].items():
+        print(f"{nome}: {concorrencia['reservas']} reservas, estoque {concorrencia['estoque_inicial']} "
+              f"-> {concorrencia['estoque_final']}, p95 {concorrencia['p95_ms']} ms "
+              f"({'OK' if concorrencia['ok'] else 'FALHA'})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requisicoes', type=int, default=1000, help='Requisições por cenário')
+    parser.add_argument('--concorrencia', type=int, default=8, help='Clientes simultâneos')
+    parser.add_argument('--aquecimento', type=int, default=20, help='Requisições não medidas antes de cada leitura')
+    parser.add_argument('--rapido', action='store_true', help='Usa um décimo dos volumes padrão')
+    parser.add_argument('--cenario', action='append', help='Executa só os cenários indicados (repetível)')
+    parser.add_argument('--banco', help='Arquivo SQLite (padrão: arquivo temporário)')
+    parser.add_argument('--saida', default='bench/resultados/ultimo.json')
+    parser.add_argument('--base', help='Resultado anterior para o portão de regressão')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='Piora relativa aceita (0.25 = 25%%)')
+    parser.add_argument('--piso-ms', type=float, default=1.0, help='Diferença de p95 abaixo da qual não há regressão')
+    parser.add_argument('--gravacao-adiada', action='store_true', help='Sobe o servidor com GRAVACAO_ADIADA=1')
+    parser.add_argument('--busca-memoria', action='store_true', help='Sobe o servidor com BUSCA_MEMORIA=1')
+    parser.add_argument('--replicas', type=int, default=0, help='Réplicas de leitura (cópias do banco)')
+    parser.add_argument('--senha-log-n', type=int, default=10, help='SENHA_SCRYPT_LOG_N do servidor (custo do hash)')
+    args = parser.parse_args()
+
+    volumes = {tabela: max(1, n // 10) for tabela, n in VOLUMES.items()} if args.rapido else VOLUMES
+    diretorio = tempfile.mkdtemp(prefix='bench-')
+    banco = args.banco or os.path.join(diretorio, 'bench.db')
+    if os.path.exists(banco):
+        os.remove(banco)
+
+    print(f"Populando {banco}: {volumes}")
+    inicio = time.perf_counter()
+    meta = semeia(banco, volumes, descartaveis=args.requisicoes)
+    print(f"Banco populado em {time.perf_counter() - inicio:.1f} s")
+
+    porta = porta_livre()
+    ambiente = {'SENHA_SCRYPT_LOG_N': str(args.senha_log_n)}
+    if args.gravacao_adiada:
+        ambiente.update(GRAVACAO_ADIADA='1', GRAVACAO_LOG=os.path.join(diretorio, 'gravacao'))
+    if args.busca_memoria:
+        ambiente['BUSCA_MEMORIA'] = '1'
+    replicas = {}
+    for numero in range(args.replicas):
+        replicas[f"replica{numero}"] = f"{banco}.replica{numero}"
+        cria_replica(banco, replicas[f"replica{numero}"])
+    if replicas:
+        ambiente['DB_REPLICAS'] = ','.join(replicas)
+    processo = sobe_servidor(banco, porta, ambiente, replicas)
+    try:
+        if args.busca_memoria:
+            espera_indices(porta)
+        todos = cenarios(meta, busca=args.busca_memoria)
+        medidas = {}
+        for nome in args.cenario or list(todos):
+            cenario = todos[nome]
+            if nome == 'GET /produtos/<id> If-None-Match':
+                prepara_condicional(porta, meta)
+            total = max(1, int(args.requisicoes * cenario.fator))
+            if cenario.metodo == 'GET':
+                # Aquecimento fora da medição: caches, statements preparados e conexões do pool
+                executa(porta, processo.pid, cenario, meta, min(args.aquecimento, total), args.concorrencia)
+            medidas[nome] = executa(porta, processo.pid, cenario, meta, total, args.concorrencia)
+            print(f"{nome}: {medidas[nome]['vazao_rps']} req/s, p95 {medidas[nome]['p95_ms']} ms")
+
+        verificacoes = {}
+        if not args.gravacao_adiada:
+            # Com a gravação adiada o estoque de um produto comum só é conferido na gravação do lote:
+            # itens aceitos com 202 podem ser rejeitados depois, então a contagem não fecha por desenho
+            verificacoes['concorrencia_carrinho'] = verifica_concorrencia(porta, meta, max(args.concorrencia, 16))
+        # Mesma disputa com o produto reservado em memória
+        verificacoes['concorrencia_carrinho_quente'] = verifica_concorrencia(
+            porta, meta, max(args.concorrencia, 16), quente=True)
+    finally:
+        processo.terminate()
+        processo.wait()
+
+    resultado = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {'python': platform.python_version(), 'plataforma': platform.platform(),
+                     'cpus': os.cpu_count(), 'banco': 'sqlite', 'replicas': args.replicas,
+                     'senha_log_n': args.senha_log_n},
+        'parametros': {'volumes': volumes, 'requisicoes': args.requisicoes, 'concorrencia': args.concorrencia},
+        'cenarios': medidas,
+        'verificacoes': verificacoes,
+    }
+    os.makedirs(os.path.dirname(args.saida) or '.', exist_ok=True)
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    imprime(resultado)
+    print(f"Resultado gravado em {args.saida}")
+
+    falhou = not all(verificacao['ok'] for verificacao in verificacoes.values())
+    if args.base:
+        with open(args.base, encoding='utf-8') as arquivo:
+            base = json.load(arquivo)
+        if base.get('parametros') != resultado['parametros']:
+            print("Aviso: a base foi gerada com outros volumes ou outra carga; a comparação é aproximada")
+        regressoes = compara(resultado, base, args.tolerancia, args.piso_ms)
+        for regressao in regressoes:
+            print(f"REGRESSÃO {regressao}")
+        falhou = falhou or bool(regressoes)
+    sys.exit(1 if falhou else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Comparação lado a lado do modo síncrono (app.py) e do assíncrono (app_async.py) nas rotas de leitura.
+
+Sobe os dois servidores sobre o mesmo banco SQLite (bench.servidor com threads e bench.servidor_async
+no hypercorn) e executa, em cada um, os mesmos cenários de leitura e o mesmo cenário misto (os pesos
+de bench.carga.MISTO restritos às rotas que os dois modos atendem), em cada nível de concorrência.
+
+Execução:
+    python -m bench.comparacao --rapido
+    python -m bench.comparacao --concorrencia 8 --concorrencia 64 --saida bench/resultados/comparacao.json
+
+O hypercorn roda em um único processo, como um worker do servidor síncrono; no banco SQLite as
+consultas do modo assíncrono rodam em threads (bench.banco_sqlite.instala_async), então a espera pela
+rede do MySQL real, onde o modo assíncrono mais ganha, não aparece nos números.
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+from datetime import datetime
+
+from bench.carga import MISTO, Cenario, cenarios, executa, porta_livre, sobe_servidor
+from bench.semente import VOLUMES, semeia
+
+# Cenários de bench.carga cujas rotas existem nos dois modos
+COMUNS = (
+    'GET /clientes', 'GET /clientes/<id>', 'GET /fornecedores/<id>', 'GET /produtos', 'GET /produtos?filtros',
+    'GET /produtos/<id>', 'GET /carrinhos', 'GET /carrinhos/<id>', 'GET /carrinhos/cliente/<id>', 'GET /pedidos',
+    'GET /pedidos?cliente_id',
+)
+
+SERVIDORES = {'sincrono': 'bench.servidor', 'assincrono': 'bench.servidor_async'}
+
+
+def cenarios_comuns(meta):
+    todos = cenarios(meta)
+    comuns = {nome: todos[nome] for nome in COMUNS}
+    nomes = [nome for nome in MISTO if nome in comuns]
+    pesos = [MISTO[nome] for nome in nomes]
+    comuns['misto leituras'] = Cenario('MISTO', lambda rng, meta: comuns[rng.choices(nomes, pesos)[0]], fator=2.0)
+    return comuns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requisicoes', type=int, default=1000, help='Requisições por cenário')
+    parser.add_argument('--concorrencia', type=int, action='append', help='Clientes simultâneos (repetível; padrão 8 e 64)')
+    parser.add_argument('--aquecimento', type=int, default=20, help='Requisições não medidas antes de cada cenário')
+    parser.add_argument('--rapido', action='store_true', help='Usa um décimo dos volumes padrão')
+    parser.add_argument('--saida', default='bench/resultados/comparacao.json')
+    args = parser.parse_args()
+    niveis = args.concorrencia or [8, 64]
+
+    volumes = {tabela: max(1, n // 10) for tabela, n in VOLUMES.items()} if args.rapido else VOLUMES
+    banco = os.path.join(tempfile.mkdtemp(prefix='bench-comparacao-'), 'bench.db')
+    print(f"Populando {banco}: {volumes}")
+    meta = semeia(banco, volumes)
+
+    medidas = {}
+    for modo, modulo in SERVIDORES.items():
+        porta = porta_livre()
+        processo = sobe_servidor(banco, porta, modulo=modulo)
+        try:
+            for nome, cenario in cenarios_comuns(meta).items():
+                total = max(1, int(args.requisicoes * cenario.fator))
+                executa(porta, processo.pid, cenario, meta, args.aquecimento, min(niveis))
+                for concorrencia in niveis:
+                    medida = executa(porta, processo.pid, cenario, meta, total, concorrencia)
+                    medidas.setdefault(nome, {}).setdefault(str(concorrencia), {})[modo] = medida
+        finally:
+            processo.terminate()
+            processo.wait()
+
+    print(f"{'cenário':<32} {'conc':>5} {'síncrono req/s':>15} {'p95':>8} {'assíncrono req/s':>17} {'p95':>8} {'erros':>7}")
+    for nome, por_nivel in medidas.items():
+        for concorrencia, modos in por_nivel.items():
+            sincrono, assincrono = modos['sincrono'], modos['assincrono']
+            print(f"{nome:<32} {concorrencia:>5} {sincrono['vazao_rps']:>15.1f} {sincrono['p95_ms']:>8.2f} "
+                  f"{assincrono['vazao_rps']:>17.1f} {assincrono['p95_ms']:>8.2f} "
+                  f"{sincrono['erros']:>3}/{assincrono['erros']:<3}")
+
+    resultado = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {'python': platform.python_version(), 'plataforma': platform.platform(),
+                     'cpus': os.cpu_count(), 'banco': 'sqlite'},
+        'parametros': {'volumes': volumes, 'requisicoes': args.requisicoes, 'concorrencia': niveis},
+        'servidores': SERVIDORES,
+        'cenarios': medidas,
+    }
+    os.makedirs(os.path.dirname(args.saida) or '.', exist_ok=True)
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"Resultado gravado em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Custo de inicialização de um processo do app.py: tempo de import e tempo até a primeira resposta.
+
+Cada medida sobe um interpretador novo, como um worker frio do gunicorn sem --preload:
+    - import: tempo de `import app`;
+    - primeira resposta: do início do processo bench.servidor até o primeiro GET /clientes/<id>
+      respondido (import, criação do pool e conexão com o banco).
+
+Execução: python -m bench.inicializacao --repeticoes 10 --saida bench/resultados/inicializacao.json
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.carga import porta_livre
+from bench.semente import semeia
+
+CODIGO_IMPORT = "import time; inicio = time.perf_counter(); import app; print(time.perf_counter() - inicio)"
+
+
+def tempo_import():
+    saida = subprocess.run([sys.executable, '-c', CODIGO_IMPORT], capture_output=True, text=True, check=True)
+    return float(saida.stdout.strip().splitlines()[-1]) * 1000
+
+
+def tempo_primeira_resposta(banco):
+    porta = porta_livre()
+    inicio = time.perf_counter()
+    processo = subprocess.Popen([sys.executable, '-m', 'bench.servidor', '--banco', banco, '--porta', str(porta)],
+                                stdout=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=1)
+                conexao.request('GET', '/clientes/1')
+                resposta = conexao.getresponse()
+                resposta.read()
+                conexao.close()
+                if resposta.status == 200:
+                    return (time.perf_counter() - inicio) * 1000
+            except OSError:
+                pass
+            if processo.poll() is not None:
+                raise RuntimeError("O servidor de benchmark terminou durante a inicialização")
+            time.sleep(0.005)
+    finally:
+        processo.terminate()
+        processo.wait()
+
+
+def resume(tempos):
+    return {'mediana_ms': round(statistics.median(tempos), 1), 'min_ms': round(min(tempos), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=10)
+    parser.add_argument('--saida', default='bench/resultados/inicializacao.json')
+    args = parser.parse_args()
+
+    banco = os.path.join(tempfile.mkdtemp(prefix='bench-'), 'bench.db')
+    semeia(banco, {'fornecedores': 1, 'clientes': 1, 'produtos': 1, 'carrinhos': 1, 'pedidos': 1}, descartaveis=1)
+    resultado = {
+        'import': resume([tempo_import() for _ in range(args.repeticoes)]),
+        'primeira_resposta': resume([tempo_primeira_resposta(banco) for _ in range(args.repeticoes)]),
+    }
+    os.makedirs(os.path.dirname(args.saida) or '.', exist_ok=True)
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    for nome, medida in resultado.items():
+        print(f"{nome:<18} mediana {medida['mediana_ms']:>7.1f} ms, mínimo {medida['min_ms']:>7.1f} ms")
+    print(f"Resultado gravado em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Microbenchmarks de serialização JSON e de compressão sobre linhas de tbl_produtos.
+
+Mede, sem servidor nem banco, o custo de CPU das duas etapas finais de uma listagem:
+    - serialização: json da biblioteca padrão (dicts), formato gerado por serializacao.codificador_linha
+      e orjson (se instalado);
+    - compressão: razão e tempo de cada codificador disponível (gzip, br, zstd) no corpo da resposta.
+
+Execução: python -m bench.micro --linhas 10000 --saida bench/resultados/micro.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from flask import Flask
+
+from compressao import codificadores_disponiveis
+from repositorio import TABELAS
+from serializacao import PROVEDORES
+
+
+def linhas_produtos(quantidade, semente=42):
+    """Linhas (tuplas) no formato devolvido pelo banco para SELECT * FROM tbl_produtos."""
+    rng = random.Random(semente)
+    return [(i, f"Produto {i}", f"Descrição do produto {i}", Decimal(rng.randint(100, 100000)) / 100,
+             rng.randint(0, 1000), rng.randint(1, 200), Decimal(rng.randint(50, 50000)) / 100)
+            for i in range(1, quantidade + 1)]
+
+
+def mede(funcao, repeticoes):
+    """Mediana e mínimo do tempo de `funcao()` em milissegundos."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return {'mediana_ms': round(statistics.median(tempos), 3), 'min_ms': round(min(tempos), 3)}
+
+
+def serializacao(linhas, repeticoes):
+    tabela = TABELAS['tbl_produtos']
+    colunas = tabela.colunas
+    tipos = tuple(tabela.tipos[coluna] for coluna in colunas)
+    app = Flask('bench')
+    padrao = PROVEDORES['padrao'](app)
+    resultados = {
+        'stdlib_dicts': mede(lambda: padrao.dumps([dict(zip(colunas, linha)) for linha in linhas]), repeticoes),
+        'formato_gerado': mede(lambda: '[' + ','.join(padrao.objetos(colunas, tipos, linhas)) + ']', repeticoes),
+    }
+    try:
+        orjson = PROVEDORES['orjson'](app)
+    except ImportError:
+        # orjson é opcional; sem ele o cenário fica de fora do resultado
+        return resultados
+    resultados['orjson'] = mede(lambda: '[' + ','.join(orjson.objetos(colunas, tipos, linhas)) + ']', repeticoes)
+    return resultados
+
+
+def compressao(corpo, repeticoes):
+    resultados = {}
+    for codificador in codificadores_disponiveis(['gzip', 'br', 'zstd']):
+        comprimido = codificador.comprime(corpo)
+        medida = mede(lambda: codificador.comprime(corpo), repeticoes)
+        medida.update({
+            'bytes': len(comprimido),
+            'razao': round(len(corpo) / len(comprimido), 2),
+            # Vazão de compressão em MB/s do corpo original
+            'mb_s': round(len(corpo) / 1e6 / (medida['mediana_ms'] / 1000), 1),
+        })
+        resultados[codificador.nome] = medida
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, default=10000)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--saida', default='bench/resultados/micro.json')
+    args = parser.parse_args()
+
+    linhas = linhas_produtos(args.linhas)
+    corpo = json.dumps({"produtos": [dict(zip(TABELAS['tbl_produtos'].colunas, linha)) for linha in linhas]},
+                       default=str).encode()
+    resultado = {
+        'linhas': args.linhas,
+        'bytes_corpo': len(corpo),
+        'serializacao': serializacao(linhas, args.repeticoes),
+        'compressao': compressao(corpo, args.repeticoes),
+    }
+    os.makedirs(os.path.dirname(args.saida) or '.', exist_ok=True)
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+
+    for nome, medida in resultado['serializacao'].items():
+        print(f"serialização {nome:<16} {medida['mediana_ms']:>9.2f} ms")
+    for nome, medida in resultado['compressao'].items():
+        print(f"compressão {nome:<6} {len(corpo)} -> {medida['bytes']} bytes (x{medida['razao']}) "
+              f"{medida['mediana_ms']:>8.2f} ms, {medida['mb_s']} MB/s")
+    print(f"Resultado gravado em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Popula o banco SQLite dos benchmarks com volumes realistas."""
+import random
+import sqlite3
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import resumos
+from bench.banco_sqlite import Conexao, cria_esquema
+
+STATUS = ('novo', 'pago', 'enviado', 'entregue', 'cancelado')
+
+# Volumes padrão; o modo rápido usa um décimo
+VOLUMES = {'fornecedores': 200, 'clientes': 10000, 'produtos': 5000, 'carrinhos': 50000, 'pedidos': 100000}
+
+
+def semeia(caminho, volumes=VOLUMES, descartaveis=500, estoque_disputado=50, semente=42):
+    """Cria e popula o banco. Retorna os intervalos de ids usados pelos cenários de carga.
+
+    Além dos volumes pedidos, cada tabela recebe `descartaveis` linhas sem dependentes, que os
+    cenários de DELETE podem remover sem violar chaves estrangeiras.
+    """
+    rng = random.Random(semente)
+    cria_esquema(caminho)
+    db = sqlite3.connect(caminho)
+    extras = descartaveis
+
+    fornecedores = volumes['fornecedores']
+    db.executemany("INSERT INTO tbl_fornecedores (nome, email, cnpj) VALUES (?, ?, ?)",
+                   ((f"Fornecedor {i}", f"fornecedor{i}@exemplo.com", f"{i:014d}")
+                    for i in range(1, fornecedores + extras + 1)))
+
+    clientes = volumes['clientes']
+    db.executemany("INSERT INTO tbl_clientes (nome, email, cpf, senha) VALUES (?, ?, ?, ?)",
+                   ((f"Cliente {i}", f"cliente{i}@exemplo.com", f"{i:011d}", f"senha{i}")
+                    for i in range(1, clientes + extras + 1)))
+
+    # Os produtos têm estoque de sobra, exceto o disputado (último id), usado no teste de concorrência
+    produtos = volumes['produtos']
+    db.executemany(
+        "INSERT INTO tbl_produtos (nome, descricao, preco, qtd_em_estoque, fornecedor_id, custo_no_fornecedor) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        ((f"Produto {i}", f"Descrição do produto {i}", str(Decimal(rng.randint(100, 100000)) / 100), 10 ** 7,
+          rng.randint(1, fornecedores), str(Decimal(rng.randint(50, 50000)) / 100))
+         for i in range(1, produtos + extras + 1)))
+    db.execute("INSERT INTO tbl_produtos (nome, descricao, preco, qtd_em_estoque, fornecedor_id, custo_no_fornecedor) "
+               "VALUES ('Produto disputado', 'Estoque limitado', '10.00', ?, 1, '5.00')", (estoque_disputado,))
+    produto_disputado = produtos + extras + 1
+
+    carrinhos = volumes['carrinhos']
+    dono = {}
+    linhas = []
+    for i in range(1, carrinhos + extras + 1):
+        dono[i] = rng.randint(1, clientes)
+        linhas.append((rng.randint(1, produtos), rng.randint(1, 5), dono[i]))
+    db.executemany("INSERT INTO tbl_carrinho (produto_id, quantidade, cliente_id) VALUES (?, ?, ?)", linhas)
+
+    # Os pedidos só usam os carrinhos não descartáveis e se espalham pelo último ano
+    inicio = datetime(2024, 1, 1)
+    db.executemany("INSERT INTO tbl_pedido (cliente_id, carrinho_id, data_hora, status) VALUES (?, ?, ?, ?)",
+                   ((dono[carrinho], carrinho, (inicio + timedelta(minutes=rng.randint(0, 525600))).isoformat(sep=' '),
+                     rng.choice(STATUS))
+                    for carrinho in (rng.randint(1, carrinhos) for _ in range(volumes['pedidos']))))
+    db.commit()
+    db.close()
+
+    # Carga inicial dos resumos, pelo mesmo código da aplicação
+    conn = Conexao(caminho)
+    try:
+        resumos.reconstroi(conn)
+    finally:
+        conn.close()
+
+    return {
+        'volumes': dict(volumes),
+        'fornecedores': fornecedores, 'clientes': clientes, 'produtos': produtos, 'carrinhos': carrinhos,
+        'pedidos': volumes['pedidos'],
+        # Intervalos [inicio, fim] das linhas sem dependentes
+        'descartaveis': {
+            'fornecedores': (fornecedores + 1, fornecedores + extras),
+            'clientes': (clientes + 1, clientes + extras),
+            'produtos': (produtos + 1, produtos + extras),
+            'carrinhos': (carrinhos + 1, carrinhos + extras),
+        },
+        'produto_disputado': produto_disputado,
+        'estoque_disputado': estoque_disputado,
+    }
@@ -0,0 +1,120 @@
+"""Vazão das leituras durante uma rajada de cadastros de clientes (hash de senha com scrypt).
+
+Para cada configuração do serviço de senhas (senhas.py) sobe o servidor, mede GET /produtos/<id>
+sozinho e depois junto com uma rajada de POST /clientes, e compara as duas vazões:
+    - pool: os hashes rodam no pool de processos (SENHA_PROCESSOS), com fila limitada e 503 além dela;
+    - inline: SENHA_PROCESSOS=0 e fila sem limite prático, o hash roda na thread da requisição.
+
+Execução:
+    python -m bench.senhas
+    python -m bench.senhas --leituras 2000 --cadastros 200 --log-n 15 --saida bench/resultados/senhas.json
+
+A razão perto de 1 indica que as leituras não sentem a rajada. Os cadastros recusados com 503
+(Retry-After) são a contrapressão esperada quando a fila enche.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+from datetime import datetime
+
+from bench.carga import cenarios, executa, porta_livre, sobe_servidor
+from bench.semente import semeia
+
+VOLUMES = {'fornecedores': 20, 'clientes': 200, 'produtos': 500, 'carrinhos': 200, 'pedidos': 100}
+
+
+def estado_senhas(porta):
+    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=10)
+    try:
+        conexao.request('GET', '/status/senhas')
+        return json.loads(conexao.getresponse().read())['senhas']
+    finally:
+        conexao.close()
+
+
+def mede(banco, meta, ambiente, args):
+    """Leituras sozinhas e durante a rajada de cadastros em um servidor com o ambiente dado."""
+    porta = porta_livre()
+    processo = sobe_servidor(banco, porta, ambiente)
+    try:
+        todos = cenarios(meta)
+        leitura, cadastro = todos['GET /produtos/<id>'], todos['POST /clientes']
+        # Aquecimento: caches, statements preparados e os processos do pool de senhas
+        executa(porta, processo.pid, leitura, meta, args.aquecimento, args.concorrencia)
+        executa(porta, processo.pid, cadastro, meta, 4, 2)
+
+        sozinhas = executa(porta, processo.pid, leitura, meta, args.leituras, args.concorrencia)
+        rajada = {}
+        thread = threading.Thread(target=lambda: rajada.update(
+            executa(porta, processo.pid, cadastro, meta, args.cadastros, args.concorrencia_cadastros)))
+        thread.start()
+        durante = executa(porta, processo.pid, leitura, meta, args.leituras, args.concorrencia)
+        thread.join()
+        estado = estado_senhas(porta)
+    finally:
+        processo.terminate()
+        processo.wait()
+    return {
+        'leituras_sozinhas': sozinhas,
+        'leituras_durante_rajada': durante,
+        'cadastros': rajada,
+        'razao_vazao_leituras': round(durante['vazao_rps'] / sozinhas['vazao_rps'], 3),
+        'senhas': estado,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--leituras', type=int, default=1000, help='Leituras medidas em cada fase')
+    parser.add_argument('--cadastros', type=int, default=100, help='Cadastros na rajada')
+    parser.add_argument('--concorrencia', type=int, default=8, help='Clientes simultâneos das leituras')
+    parser.add_argument('--concorrencia-cadastros', type=int, default=16, help='Clientes simultâneos da rajada')
+    parser.add_argument('--aquecimento', type=int, default=50)
+    parser.add_argument('--processos', type=int, default=2, help='SENHA_PROCESSOS da configuração com pool')
+    parser.add_argument('--fila', type=int, default=8, help='SENHA_FILA da configuração com pool')
+    parser.add_argument('--log-n', type=int, default=14, help='SENHA_SCRYPT_LOG_N (custo do hash)')
+    parser.add_argument('--saida', default='bench/resultados/senhas.json')
+    args = parser.parse_args()
+
+    banco = os.path.join(tempfile.mkdtemp(prefix='bench-senhas-'), 'bench.db')
+    print(f"Populando {banco}: {VOLUMES}")
+    meta = semeia(banco, VOLUMES)
+
+    configuracoes = {
+        'pool': {'SENHA_PROCESSOS': str(args.processos), 'SENHA_FILA': str(args.fila)},
+        'inline': {'SENHA_PROCESSOS': '0', 'SENHA_FILA': '100000'},
+    }
+    medidas = {}
+    for nome, ambiente in configuracoes.items():
+        ambiente = {**ambiente, 'SENHA_SCRYPT_LOG_N': str(args.log_n), 'SENHA_TIMEOUT': '30'}
+        medidas[nome] = mede(banco, meta, ambiente, args)
+        medida = medidas[nome]
+        hash_senha = medida['senhas']['operacoes'].get('hash', {})
+        print(f"{nome}: leituras {medida['leituras_sozinhas']['vazao_rps']} -> "
+              f"{medida['leituras_durante_rajada']['vazao_rps']} req/s (razão {medida['razao_vazao_leituras']}), "
+              f"p95 {medida['leituras_sozinhas']['p95_ms']} -> {medida['leituras_durante_rajada']['p95_ms']} ms; "
+              f"cadastros {medida['cadastros']['status']}, hash médio {hash_senha.get('media_ms', 0):.1f} ms")
+
+    resultado = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {'python': platform.python_version(), 'plataforma': platform.platform(),
+                     'cpus': os.cpu_count(), 'banco': 'sqlite'},
+        'parametros': {'leituras': args.leituras, 'cadastros': args.cadastros, 'concorrencia': args.concorrencia,
+                       'concorrencia_cadastros': args.concorrencia_cadastros, 'log_n': args.log_n},
+        'configuracoes': {nome: ambiente for nome, ambiente in configuracoes.items()},
+        'medidas': medidas,
+    }
+    os.makedirs(os.path.dirname(args.saida) or '.', exist_ok=True)
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"Resultado gravado em {args.saida}")
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
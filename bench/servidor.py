@@ -0,0 +1,40 @@
+"""Sobe o app.py em um servidor WSGI com threads sobre o banco SQLite. Usado por bench.carga.
+
+Execução: python -m bench.servidor --banco /tmp/bench.db --porta 8765
+"""
+import argparse
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from bench.banco_sqlite import instala
+
+
+class HandlerSilencioso(WSGIRequestHandler):
+    # HTTP/1.1 mantém a conexão do cliente aberta entre as requisições (keep-alive)
+    protocol_version = 'HTTP/1.1'
+
+    def log(self, tipo, mensagem, *args):
+        # O log de cada requisição distorceria as medições
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--banco', required=True, help='Arquivo SQLite já populado por bench.semente')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--replica', action='append', default=[], metavar='HOST=ARQUIVO',
+                        help='Arquivo da réplica de leitura do host informado em DB_REPLICAS (repetível)')
+    args = parser.parse_args()
+
+    # O banco precisa ser trocado antes de o app criar o pool
+    instala(args.banco, dict(replica.split('=', 1) for replica in args.replica))
+    import app
+
+    # Como no post_fork do gunicorn: o pool já sobe com as conexões abertas
+    app.inicia_processo()
+    servidor = make_server('127.0.0.1', args.porta, app.app, threaded=True, request_handler=HandlerSilencioso)
+    servidor.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""Sobe o app_async.py no hypercorn sobre o banco SQLite. Usado por bench.comparacao.
+
+Execução: python -m bench.servidor_async --banco /tmp/bench.db --porta 8766
+"""
+import argparse
+import asyncio
+
+from bench.banco_sqlite import instala_async
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--banco', required=True, help='Arquivo SQLite já populado por bench.semente')
+    parser.add_argument('--porta', type=int, default=8766)
+    args = parser.parse_args()
+
+    # O banco precisa ser trocado antes de o app criar o pool (before_serving)
+    instala_async(args.banco)
+    import app_async
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f'127.0.0.1:{args.porta}']
+    # O log de cada requisição distorceria as medições
+    config.accesslog = None
+    asyncio.run(serve(app_async.app, config))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+
+# Colunas pesquisadas de cada tabela e colunas devolvidas pela busca (a senha do cliente fica de fora)
+CAMPOS_BUSCA = {
+    'tbl_clientes': ('nome', 'email', 'cpf'),
+    'tbl_produtos': ('nome', 'descricao'),
+}
+COLUNAS_BUSCA = {
+    'tbl_clientes': ('id', 'nome', 'email', 'cpf'),
+    'tbl_produtos': ('id', 'nome', 'descricao', 'preco', 'qtd_em_estoque', 'fornecedor_id', 'custo_no_fornecedor'),
+}
+
+# Termos completados a partir do prefixo da última palavra (ex.: "not" -> notebook, notinha...)
+MAX_EXPANSOES = 100
+
+PALAVRA = re.compile(r'[a-z0-9]+')
+
+
+def termos(texto, consulta=False):
+    """Palavras do texto em minúsculas e sem acentos.
+
+    Um número com pontuação (CPF) também é indexado inteiro, então "123.456.789-00" é encontrado
+    por "1234567"; na consulta, um número com pontuação vira só o número inteiro.
+    """
+    texto = unicodedata.normalize('NFKD', str(texto).lower())
+    texto = ''.join(letra for letra in texto if not unicodedata.combining(letra))
+    palavras = PALAVRA.findall(texto)
+    if len(palavras) > 1 and all(palavra.isdigit() for palavra in palavras):
+        return [''.join(palavras)] if consulta else palavras + [''.join(palavras)]
+    return palavras
+
+
+def consulta_booleana(palavras):
+    """Consulta do MATCH ... AGAINST em modo booleano: todas as palavras, a última como prefixo."""
+    return ' '.join(f'+{palavra}' for palavra in palavras[:-1]) + f' +{palavras[-1]}*'
+
+
+@lru_cache(maxsize=None)
+def sql_busca(tabela, com_apos):
+    """Busca ordenada por relevância nos índices FULLTEXT (migracoes/005_busca.sql), paginada por
+    (relevância, id). A relevância é arredondada para que o valor do cursor volte exato ao banco."""
+    campos = ', '.join(CAMPOS_BUSCA[tabela])
+    sql = (f"SELECT {', '.join(COLUNAS_BUSCA[tabela])}, "
+           f"ROUND(MATCH({campos}) AGAINST (%s IN BOOLEAN MODE), 6) AS relevancia "
+           f"FROM {tabela} WHERE MATCH({campos}) AGAINST (%s IN BOOLEAN MODE)")
+    if com_apos:
+        sql += " HAVING relevancia < %s OR (relevancia = %s AND id > %s)"
+    return sql + " ORDER BY relevancia DESC, id LIMIT %s"
+
+
+class Trie:
+    """Árvore de prefixos dos termos do índice, usada para completar a última palavra da busca."""
+
+    def __init__(self):
+        self.raiz = {}
+
+    def adiciona(self, termo):
+        no = self.raiz
+        for letra in termo:
+            no = no.setdefault(letra, {})
+        no[''] = True  # Fim de um termo
+
+    def com_prefixo(self, prefixo, limite=MAX_EXPANSOES):
+        """Até `limite` termos que começam com o prefixo, em ordem alfabética."""
+        no = self.raiz
+        for letra in prefixo:
+            no = no.get(letra)
+            if no is None:
+                return []
+        encontrados = []
+        pilha = [(prefixo, no)]
+        while pilha and len(encontrados) < limite:
+            termo, no = pilha.pop()
+            if '' in no:
+                encontrados.append(termo)
+            # Empilhados em ordem inversa para sair em ordem alfabética
+            pilha.extend((termo + letra, filho) for letra, filho in sorted(no.items(), reverse=True) if letra)
+        return encontrados
+
+
+class IndiceInvertido:
+    """Índice invertido em memória do processo, com ranking TF-IDF e completação por prefixo.
+
+    A carga inicial vem do banco (carrega); depois disso os handlers de escrita mantêm o índice em
+    dia com atualiza() e remove(). Escritas feitas durante uma carga são reaplicadas no índice novo.
+    Com vários processos cada um tem o seu índice, que só vê as escritas do próprio processo até a
+    próxima recarga.
+    """
+
+    def __init__(self, campos):
+        self.campos = campos
+        self._postings = {}  # termo -> {id: frequência do termo no registro}
+        self._documentos = {}  # id -> Counter dos termos do registro
+        self._trie = Trie()
+        self._lock = threading.Lock()
+        self._durante_carga = None  # Escritas recebidas enquanto uma carga está em andamento
+        self.pronto = False
+        self.versao = None  # Versão da tabela (versoes.py) lida no início da última carga
+        self.cargas = 0
+
+    def _termos(self, registro):
+        return Counter(termo for campo in self.campos if registro.get(campo) is not None
+                       for termo in termos(registro[campo]))
+
+    def _insere(self, postings, documentos, trie, id, contagem):
+        documentos[id] = contagem
+        for termo, frequencia in contagem.items():
+            ids = postings.get(termo)
+            if ids is None:
+                ids = postings[termo] = {}
+                trie.adiciona(termo)
+            ids[id] = frequencia
+
+    def _retira(self, id):
+        contagem = self._documentos.pop(id, None)
+        for termo in contagem or ():
+            ids = self._postings[termo]
+            ids.pop(id, None)
+            # O termo continua na trie; a busca ignora termos sem registros
+            if not ids:
+                del self._postings[termo]
+
+    def carrega(self, linhas, versao=None):
+        """Recria o índice a partir de dicts com o id e os campos pesquisados."""
+        with self._lock:
+            self._durante_carga = []
+        postings, documentos, trie = {}, {}, Trie()
+        for linha in linhas:
+            self._insere(postings, documentos, trie, linha['id'], self._termos(linha))
+        with self._lock:
+            self._postings, self._documentos, self._trie = postings, documentos, trie
+            pendentes, self._durante_carga = self._durante_carga, None
+            for id, contagem in pendentes:
+                self._retira(id)
+                if contagem is not None:
+                    self._insere(self._postings, self._documentos, self._trie, id, contagem)
+            self.versao = versao
+            self.pronto = True
+            self.cargas += 1
+
+    def atualiza(self, id, registro):
+        """Indexa (ou reindexa) o registro com os valores de todos os campos pesquisados."""
+        contagem = self._termos(registro)
+        with self._lock:
+            if self._durante_carga is not None:
+                self._durante_carga.append((id, contagem))
+            self._retira(id)
+            self._insere(self._postings, self._documentos, self._trie, id, contagem)
+
+    def remove(self, id):
+        with self._lock:
+            if self._durante_carga is not None:
+                self._durante_carga.append((id, None))
+            self._retira(id)
+
+    def busca(self, consulta, limite, apos=None):
+        """Retorna até `limite` pares (relevância, id) com todas as palavras da consulta, a última
+        como prefixo, do mais relevante para o menos. apos=(relevância, id) continua uma página."""
+        palavras = termos(consulta, consulta=True)
+        if not palavras:
+            return []
+        with self._lock:
+            total = len(self._documentos) or 1
+            # Cada grupo é (termos aceitos, tamanho do prefixo): as palavras exatas e a última completada
+            grupos = [([palavra], None) for palavra in palavras[:-1]]
+            grupos.append((self._trie.com_prefixo(palavras[-1]), len(palavras[-1])))
+            # Intersecção a partir da palavra mais rara, que limita os candidatos
+            grupos.sort(key=lambda grupo: sum(len(self._postings.get(termo, ())) for termo in grupo[0]))
+            pontos = None
+            for grupo, prefixo in grupos:
+                parcial = {}
+                for termo in grupo:
+                    ids = self._postings.get(termo)
+                    if not ids:
+                        continue
+                    peso = math.log(1 + total / len(ids))
+                    if prefixo is not None:
+                        # Um termo completado vale menos que a palavra exata: "12" antes de "120"
+                        peso *= prefixo / len(termo)
+                    # Percorre o lado menor: os registros do termo ou os candidatos que restam
+                    if pontos is None or len(ids) <= len(pontos):
+                        pares = ids.items() if pontos is None else ((id, f) for id, f in ids.items() if id in pontos)
+                    else:
+                        pares = ((id, ids[id]) for id in pontos if id in ids)
+                    for id, frequencia in pares:
+                        valor = peso * frequencia / (frequencia + 1)
+                        if valor > parcial.get(id, 0):
+                            parcial[id] = valor
+                pontos = parcial if pontos is None else {id: pontos[id] + valor for id, valor in parcial.items()}
+                if not pontos:
+                    return []
+
+        # Ordem (relevância decrescente, id crescente), a mesma da busca no banco
+        candidatos = ((-round(valor, 6), id) for id, valor in pontos.items())
+        if apos is not None:
+            inicio = (-apos[0], apos[1])
+            candidatos = (candidato for candidato in candidatos if candidato > inicio)
+        return [(-relevancia, id) for relevancia, id in heapq.nsmallest(limite, candidatos)]
+
+    def sugestoes(self, prefixo, limite=10):
+        """Termos que completam o prefixo, dos que aparecem em mais registros para os que aparecem em menos."""
+        palavras = termos(prefixo, consulta=True)
+        if not palavras:
+            return []
+        with self._lock:
+            frequentes = ((len(self._postings[termo]), termo) for termo in self._trie.com_prefixo(palavras[-1])
+                          if termo in self._postings)
+            return [termo for _, termo in heapq.nlargest(limite, frequentes)]
+
+    def estado(self):
+        with self._lock:
+            return {"pronto": self.pronto, "documentos": len(self._documentos), "termos": len(self._postings),
+                    "versao": self.versao, "cargas": self.cargas}
@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """Cache em memória do processo, com limite de itens (LRU) e tempo de vida (TTL)."""
+
+    def __init__(self, tamanho_maximo=1024, ttl=60):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self._itens = OrderedDict()  # chave -> (valor, expira_em)
+        self._lock = threading.Lock()
+
+        # Contadores usados para dimensionar o cache
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expiracoes = 0
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.misses += 1
+                return None
+            valor, expira_em = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                self.expiracoes += 1
+                self.misses += 1
+                return None
+            # Marca a chave como usada recentemente
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (valor, time.monotonic() + self.ttl)
+            self._itens.move_to_end(chave)
+            # Remove as chaves usadas há mais tempo quando o limite é ultrapassado
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+                self.evictions += 1
+
+    def remover(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "itens": len(self._itens),
+                "tamanho_maximo": self.tamanho_maximo,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expiracoes": self.expiracoes,
+            }
+
+
+class ClienteMemoria:
+    """Substituto em memória de um servidor Redis (get/set/mget/incr/delete), usado em testes e desenvolvimento."""
+
+    def __init__(self):
+        self._dados = {}
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                return None
+            valor, expira_em = item
+            if expira_em is not None and expira_em < time.monotonic():
+                del self._dados[chave]
+                return None
+            return valor
+
+    def set(self, chave, valor, ex=None, nx=False):
+        with self._lock:
+            if nx and chave in self._dados:
+                expira_em = self._dados[chave][1]
+                # Uma chave expirada não impede o SET NX
+                if expira_em is None or expira_em >= time.monotonic():
+                    return None
+            self._dados[chave] = (valor, time.monotonic() + ex if ex else None)
+            return True
+
+    def mget(self, chaves):
+        return [self.get(chave) for chave in chaves]
+
+    def incr(self, chave, quantidade=1):
+        with self._lock:
+            valor = int(self._dados.get(chave, (0, None))[0]) + quantidade
+            self._dados[chave] = (valor, None)
+            return valor
+
+    def delete(self, *chaves):
+        with self._lock:
+            for chave in chaves:
+                self._dados.pop(chave, None)
+
+
+class CacheCompartilhado:
+    """Cache compartilhado entre processos sobre um cliente no formato do Redis."""
+
+    def __init__(self, cliente, ttl=300, prefixo='estudo:', serializar=json.dumps, desserializar=json.loads):
+        self.cliente = cliente
+        self.ttl = ttl
+        self.prefixo = prefixo
+        self.serializar = serializar
+        self.desserializar = desserializar
+
+        self.hits = 0
+        self.misses = 0
+        self.erros = 0
+
+    def obter(self, chave):
+        try:
+            valor = self.cliente.get(self.prefixo + chave)
+        except Exception as err:
+            # Uma falha no cache compartilhado não pode derrubar a requisição
+            print(f"Erro no cache compartilhado: {err}")
+            self.erros += 1
+            return None
+        if valor is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.desserializar(valor)
+
+    def guardar(self, chave, valor):
+        try:
+            self.cliente.set(self.prefixo + chave, self.serializar(valor), ex=self.ttl)
+        except Exception as err:
+            print(f"Erro no cache compartilhado: {err}")
+            self.erros += 1
+
+    def remover(self, chave):
+        try:
+            self.cliente.delete(self.prefixo + chave)
+        except Exception as err:
+            print(f"Erro no cache compartilhado: {err}")
+            self.erros += 1
+
+    def estatisticas(self):
+        return {"ttl": self.ttl, "hits": self.hits, "misses": self.misses, "erros": self.erros}
+
+
+class CacheEmCamadas:
+    """Cache de leitura: consulta primeiro o LRU local e depois o cache compartilhado (se houver)."""
+
+    def __init__(self, local, compartilhado=None):
+        self.local = local
+        self.compartilhado = compartilhado
+
+    def obter(self, chave):
+        valor = self.local.obter(chave)
+        if valor is None and self.compartilhado is not None:
+            valor = self.compartilhado.obter(chave)
+            if valor is not None:
+                # Aquece o cache local com o valor vindo do cache compartilhado
+                self.local.guardar(chave, valor)
+        return valor
+
+    def guardar(self, chave, valor):
+        self.local.guardar(chave, valor)
+        if self.compartilhado is not None:
+            self.compartilhado.guardar(chave, valor)
+
+    def remover(self, chave):
+        self.local.remover(chave)
+        if self.compartilhado is not None:
+            self.compartilhado.remover(chave)
+
+    def estatisticas(self):
+        resp = {"local": self.local.estatisticas()}
+        if self.compartilhado is not None:
+            resp["compartilhado"] = self.compartilhado.estatisticas()
+        return resp
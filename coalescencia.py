@@ -0,0 +1,117 @@
+import asyncio
+import threading
+from collections import OrderedDict
+
+
+class _Voo:
+    """Uma execução em andamento, aguardada pelas chamadas que chegaram depois dela."""
+
+    def __init__(self):
+        self.concluido = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+class _Estatisticas:
+    """Contadores de execuções e de chamadas atendidas por uma execução em andamento, por chave.
+
+    Só as `max_chaves` chaves usadas mais recentemente são mantidas; os totais contam todas.
+    """
+
+    def __init__(self, max_chaves=1000):
+        self.max_chaves = max_chaves
+        self._por_chave = OrderedDict()  # rótulo -> [execuções, compartilhadas]
+        self._lock_estatisticas = threading.Lock()
+        self.execucoes = 0
+        self.compartilhadas = 0  # Chamadas que não foram ao banco
+
+    def _conta(self, rotulo, compartilhada):
+        with self._lock_estatisticas:
+            if compartilhada:
+                self.compartilhadas += 1
+            else:
+                self.execucoes += 1
+            contadores = self._por_chave.get(rotulo)
+            if contadores is None:
+                contadores = self._por_chave[rotulo] = [0, 0]
+                if len(self._por_chave) > self.max_chaves:
+                    self._por_chave.popitem(last=False)
+            else:
+                self._por_chave.move_to_end(rotulo)
+            contadores[1 if compartilhada else 0] += 1
+
+    def totais(self):
+        with self._lock_estatisticas:
+            chamadas = self.execucoes + self.compartilhadas
+            return {"execucoes": self.execucoes, "compartilhadas": self.compartilhadas,
+                    "taxa_compartilhada": self.compartilhadas / chamadas if chamadas else 0.0,
+                    "em_andamento": len(self._voos)}
+
+    def estatisticas(self, limite=20):
+        """Totais e as `limite` chaves com mais chamadas compartilhadas."""
+        with self._lock_estatisticas:
+            chaves = sorted(self._por_chave.items(), key=lambda item: item[1][1], reverse=True)[:limite]
+        return {**self.totais(),
+                "chaves": [{"chave": rotulo, "execucoes": execucoes, "compartilhadas": compartilhadas}
+                           for rotulo, (execucoes, compartilhadas) in chaves]}
+
+
+class Coalescedor(_Estatisticas):
+    """Coalescência de leituras (single-flight) entre as threads do processo.
+
+    A primeira chamada com uma chave executa a função; as chamadas com a mesma chave que chegam
+    enquanto ela está em andamento esperam e recebem o mesmo resultado (ou a mesma exceção). Nada é
+    guardado depois que a execução termina: isso fica a cargo do cache. O resultado é o mesmo objeto
+    para todas as chamadas, então quem for alterá-lo deve trabalhar sobre uma cópia.
+    """
+
+    def __init__(self, max_chaves=1000):
+        super().__init__(max_chaves)
+        self._voos = {}  # chave -> _Voo em andamento
+        self._lock = threading.Lock()
+
+    def executa(self, chave, funcao, rotulo=None):
+        with self._lock:
+            voo = self._voos.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._voos[chave] = _Voo()
+        self._conta(rotulo or str(chave), compartilhada=not lider)
+
+        if not lider:
+            voo.concluido.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.resultado
+
+        try:
+            voo.resultado = funcao()
+            return voo.resultado
+        except BaseException as err:
+            voo.erro = err
+            raise
+        finally:
+            # Chamadas que chegarem a partir daqui executam de novo (ou encontram o resultado no cache)
+            with self._lock:
+                del self._voos[chave]
+            voo.concluido.set()
+
+
+class CoalescedorAsync(_Estatisticas):
+    """Coalescência de leituras entre as tarefas de um event loop (app_async.py).
+
+    funcao() deve retornar uma corrotina. Ela roda em uma tarefa própria, então o cancelamento de
+    uma das requisições que a aguardam não cancela a consulta das outras.
+    """
+
+    def __init__(self, max_chaves=1000):
+        super().__init__(max_chaves)
+        self._voos = {}  # chave -> Task em andamento
+
+    async def executa(self, chave, funcao, rotulo=None):
+        voo = self._voos.get(chave)
+        self._conta(rotulo or str(chave), compartilhada=voo is not None)
+        if voo is None:
+            voo = self._voos[chave] = asyncio.ensure_future(funcao())
+            voo.add_done_callback(lambda _: self._voos.pop(chave, None))
+        return await asyncio.shield(voo)
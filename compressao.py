@@ -0,0 +1,102 @@
+import gzip
+import threading
+import zlib
+
+try:
+    import brotli  # Dependência opcional, habilita Content-Encoding: br
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard  # Dependência opcional, habilita Content-Encoding: zstd
+except ImportError:
+    zstandard = None
+
+
+class Gzip:
+    nome = 'gzip'
+
+    def __init__(self, nivel=6):
+        self.nivel = nivel
+
+    def comprime(self, dados):
+        # mtime=0 deixa a saída igual para o mesmo corpo
+        return gzip.compress(dados, self.nivel, mtime=0)
+
+    def fluxo(self):
+        # wbits=31: formato gzip (cabeçalho e CRC) em vez de zlib puro
+        compressor = zlib.compressobj(self.nivel, zlib.DEFLATED, 31)
+        return FluxoCompressao(compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+                               compressor.flush)
+
+
+class Brotli:
+    nome = 'br'
+
+    def __init__(self, nivel=5):
+        # Níveis altos (até 11) comprimem mais, mas custam caro demais para respostas dinâmicas
+        self.nivel = nivel
+
+    def comprime(self, dados):
+        return brotli.compress(dados, quality=self.nivel)
+
+    def fluxo(self):
+        compressor = brotli.Compressor(quality=self.nivel)
+        return FluxoCompressao(compressor.process, compressor.flush, compressor.finish)
+
+
+class Zstd:
+    nome = 'zstd'
+
+    def __init__(self, nivel=3):
+        self.nivel = nivel
+        # Um ZstdCompressor não pode ser usado por duas threads ao mesmo tempo: cada thread tem o seu
+        self._local = threading.local()
+
+    def comprime(self, dados):
+        compressor = getattr(self._local, 'compressor', None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.nivel)
+        return compressor.compress(dados)
+
+    def fluxo(self):
+        compressor = zstandard.ZstdCompressor(level=self.nivel).compressobj()
+        return FluxoCompressao(compressor.compress,
+                               lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK), compressor.flush)
+
+
+class FluxoCompressao:
+    """Compressão incremental de uma resposta em streaming."""
+
+    def __init__(self, comprime, esvazia, finaliza):
+        self._comprime = comprime
+        self._esvazia = esvazia
+        self._finaliza = finaliza
+
+    def parte(self, dados):
+        # Esvazia o compressor a cada parte para o cliente receber as linhas sem esperar o fim
+        return self._comprime(dados) + self._esvazia()
+
+    def fim(self):
+        return self._finaliza()
+
+
+def codificadores_disponiveis(nomes):
+    """Retorna os codificadores pedidos (em ordem de preferência) cuja biblioteca está instalada."""
+    classes = {'gzip': Gzip}
+    if brotli is not None:
+        classes['br'] = Brotli
+    if zstandard is not None:
+        classes['zstd'] = Zstd
+    return [classes[nome]() for nome in nomes if nome in classes]
+
+
+def escolhe_codificador(codificadores, aceitos):
+    """Escolhe o codificador com maior qualidade no Accept-Encoding; empates seguem a ordem do servidor."""
+    melhor = None
+    melhor_qualidade = 0
+    for codificador in codificadores:
+        qualidade = aceitos.quality(codificador.nome)
+        if qualidade > melhor_qualidade:
+            melhor, melhor_qualidade = codificador, qualidade
+    return melhor
@@ -0,0 +1,39 @@
+"""Configuração do banco e do pool de conexões, lida do ambiente (e do arquivo .cred).
+
+Usada pelo app.py e pelo app_async.py; não importa nada dos servidores, para o modo assíncrono não
+carregar o estado do modo síncrono (pool de hash de senhas, versões, ganchos de fork).
+"""
+import os
+
+from dotenv import load_dotenv
+
+# Carrega as variáveis de ambiente do arquivo .cred (se disponível)
+load_dotenv('.cred')
+
+# Configurações para conexão com o banco de dados usando variáveis de ambiente
+config = {
+    'host': os.getenv('DB_HOST', 'localhost'),  # Obtém o host do banco de dados da variável de ambiente
+    'user': os.getenv('DB_USER'),  # Obtém o usuário do banco de dados da variável de ambiente
+    'password': os.getenv('DB_PASSWORD'),  # Obtém a senha do banco de dados da variável de ambiente
+    'database': os.getenv('DB_NAME', 'db_estudo'),  # Obtém o nome do banco de dados da variável de ambiente
+    'port': int(os.getenv('DB_PORT', 3306)),  # Obtém a porta do banco de dados da variável de ambiente
+    'ssl_ca': os.getenv('SSL_CA_PATH')  # Caminho para o certificado SSL
+}
+
+# Configurações do pool de conexões
+config_pool = {
+    'tamanho': int(os.getenv('DB_POOL_SIZE', 5)),  # Conexões mantidas abertas no pool
+    'overflow': int(os.getenv('DB_POOL_OVERFLOW', 10)),  # Conexões extras permitidas em picos
+    'tempo_max_vida': int(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),  # Segundos até reciclar uma conexão
+    'timeout_checkout': float(os.getenv('DB_POOL_TIMEOUT', 10)),  # Segundos de espera por uma conexão livre
+    'verificar_no_checkout': os.getenv('DB_POOL_PRE_PING', '1') == '1',  # Faz ping na conexão antes de emprestar
+    'max_preparados': int(os.getenv('DB_MAX_PREPARED', 64))  # Statements preparados mantidos por conexão
+}
+
+
+def valida_config():
+    """Confere a configuração do banco antes de o servidor aceitar requisições."""
+    if not config['user']:
+        raise RuntimeError("Configuração incompleta: defina DB_USER no ambiente ou no arquivo .cred")
+    if config['ssl_ca'] and not os.path.exists(config['ssl_ca']):
+        raise RuntimeError(f"Certificado SSL não encontrado: {config['ssl_ca']}")
@@ -0,0 +1,232 @@
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Tamanho a partir do qual o log é reescrito mesmo com itens pendentes
+TAMANHO_MAXIMO_LOG = 64 * 1024 * 1024
+
+
+class FilaCheia(Exception):
+    """A fila de gravação atingiu a capacidade: o cliente deve tentar de novo mais tarde."""
+
+
+class AlocadorDeIds:
+    """Entrega ids de blocos reservados no banco, um bloco por tabela em cada processo."""
+
+    def __init__(self, aloca, tamanho=1000):
+        self.aloca = aloca  # aloca(tabela, quantidade) -> primeiro id de um intervalo reservado
+        self.tamanho = tamanho
+        self._blocos = {}  # tabela -> (próximo id, fim do bloco)
+        self._lock = threading.Lock()
+
+    def proximo(self, tabela):
+        with self._lock:
+            proximo, fim = self._blocos.get(tabela, (0, 0))
+            if proximo >= fim:
+                # Uma ida ao banco a cada `tamanho` ids
+                proximo = self.aloca(tabela, self.tamanho)
+                fim = proximo + self.tamanho
+            self._blocos[tabela] = (proximo + 1, fim)
+            return proximo
+
+
+class FilaDeGravacao:
+    """Fila de gravação adiada (write-behind).
+
+    Cada escrita aceita é gravada em um log local (com fsync) e confirmada ao cliente sem esperar
+    o banco. Uma thread grava as escritas no banco em lotes, com um commit por lote. Depois de uma
+    queda, o log é reaplicado ao iniciar.
+
+    grava(itens) recebe os itens (dicts) na ordem de chegada, deve gravá-los em uma transação e
+    ignorar os que já estiverem no banco (um lote gravado pode voltar do log). Retorna a lista de
+    (item, motivo) dos itens rejeitados. Se lançar uma exceção em que transitorio(erro) é verdadeiro
+    (banco fora do ar, espera por bloqueio), o mesmo lote é tentado de novo; qualquer outro erro é de
+    algum item, e o lote é gravado item a item.
+    Os itens rejeitados vão para `<prefixo>-<n>.rejeitados.log` (item, motivo e data) e para
+    descartado(item), e a fila segue: um item inválido nunca trava as escritas seguintes.
+    Cada processo usa um arquivo `<prefixo>-<n>.log` travado com flock. Um processo novo assume
+    o arquivo de um processo que caiu e reaplica o que ficou nele.
+    """
+
+    def __init__(self, prefixo, grava, capacidade=10000, lote=500, intervalo=0.05, sincronizar=True,
+                 transitorio=None, descartado=None):
+        self.prefixo = prefixo
+        self.grava = grava
+        self.transitorio = transitorio or (lambda erro: isinstance(erro, OSError))
+        self.descartado = descartado
+        self.capacidade = capacidade
+        self.lote = lote
+        self.intervalo = intervalo  # Espera para juntar escritas no mesmo lote
+        self.sincronizar = sincronizar  # fsync antes de confirmar; sem ele uma queda do sistema perde escritas
+        self.caminho = None
+        self.caminho_rejeitados = None
+
+        self._pendentes = deque()
+        self._ids = set()  # (tipo, id) dos itens ainda não gravados no banco
+        self._lock = threading.Lock()  # Arquivo e fila
+        self._lock_fsync = threading.Lock()
+        self._tem_itens = threading.Event()
+        self._arquivo = None
+        self._escritos = 0  # Itens escritos no arquivo desde o início
+        self._sincronizados = 0  # Itens garantidos em disco
+
+        self.gravados = 0
+        self.rejeitados = 0
+        self.erros = 0
+        self.recuperados = 0
+
+    def inicia(self):
+        """Assume um arquivo de log livre, reaplica o que sobrou nele e começa a thread de gravação."""
+        numero = 0
+        while True:
+            caminho = f"{self.prefixo}-{numero}.log"
+            arquivo = open(caminho, 'a+', encoding='utf-8')
+            try:
+                fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                # Arquivo de outro processo vivo
+                arquivo.close()
+                numero += 1
+        arquivo.seek(0)
+        for linha in arquivo:
+            # Uma linha incompleta no fim é uma escrita que não chegou a ser confirmada
+            if linha.endswith("\n"):
+                item = json.loads(linha)
+                self._pendentes.append(item)
+                self._ids.add((item['tipo'], item['id']))
+        self.recuperados = len(self._pendentes)
+        self.caminho = caminho
+        self.caminho_rejeitados = f"{self.prefixo}-{numero}.rejeitados.log"
+        self._arquivo = arquivo
+        if self._pendentes:
+            self._tem_itens.set()
+        threading.Thread(target=self._executa, daemon=True, name='gravacao').start()
+
+    def registra(self, item):
+        """Grava o item no log e o coloca na fila. Retorna quando o item está em disco.
+
+        Lança FilaCheia se a fila estiver na capacidade máxima (o banco não está dando conta).
+        """
+        linha = json.dumps(item, default=str) + "\n"
+        with self._lock:
+            if len(self._pendentes) >= self.capacidade:
+                raise FilaCheia()
+            self._arquivo.write(linha)
+            self._escritos += 1
+            posicao = self._escritos
+            self._pendentes.append(item)
+            self._ids.add((item['tipo'], item['id']))
+        self._sincroniza(posicao)
+        self._tem_itens.set()
+
+    def contem(self, tipo, id):
+        """Indica se o item ainda está na fila (aceito, mas ainda não gravado no banco)."""
+        with self._lock:
+            return (tipo, id) in self._ids
+
+    def _sincroniza(self, posicao):
+        # Commit em grupo do log: quem pega o lock faz um único fsync para tudo o que já foi escrito
+        with self._lock_fsync:
+            if self._sincronizados >= posicao:
+                return
+            with self._lock:
+                self._arquivo.flush()
+                alvo = self._escritos
+            if self.sincronizar:
+                os.fsync(self._arquivo.fileno())
+            self._sincronizados = alvo
+
+    def _executa(self):
+        while True:
+            self._tem_itens.wait()
+            time.sleep(self.intervalo)
+            with self._lock:
+                itens = [self._pendentes[i] for i in range(min(self.lote, len(self._pendentes)))]
+                if len(itens) == len(self._pendentes):
+                    self._tem_itens.clear()
+            if not itens:
+                continue
+            try:
+                rejeitados = self.grava(itens)
+            except Exception as err:
+                self.erros += 1
+                print(f"Erro ao gravar lote da fila: {err}")
+                if self.transitorio(err):
+                    # Banco fora do ar ou erro transitório: o mesmo lote é tentado de novo
+                    self._tem_itens.set()
+                    time.sleep(1)
+                    continue
+                # Algum item do lote é recusado pelo banco: repetir o lote travaria a fila
+                rejeitados = self._grava_um_a_um(itens, err)
+            self._confirma(itens, rejeitados)
+
+    def _grava_um_a_um(self, itens, erro):
+        """Grava separadamente os itens de um lote que falhou. Retorna os rejeitados, como grava()."""
+        if len(itens) == 1:
+            return [(itens[0], str(erro))]
+        rejeitados = []
+        for item in itens:
+            while True:
+                try:
+                    rejeitados += self.grava([item])
+                except Exception as err:
+                    self.erros += 1
+                    print(f"Erro ao gravar item da fila ({item['tipo']} {item['id']}): {err}")
+                    if self.transitorio(err):
+                        time.sleep(1)
+                        continue
+                    rejeitados.append((item, str(err)))
+                break
+        return rejeitados
+
+    def _descarta(self, rejeitados):
+        # Os rejeitados vão para o log próprio, em disco, antes de sair do log da fila
+        with open(self.caminho_rejeitados, 'a', encoding='utf-8') as arquivo:
+            agora = datetime.now().isoformat(sep=' ', timespec='seconds')
+            arquivo.writelines(json.dumps({"item": item, "motivo": motivo, "em": agora}, default=str) + "\n"
+                               for item, motivo in rejeitados)
+            arquivo.flush()
+            if self.sincronizar:
+                os.fsync(arquivo.fileno())
+        if self.descartado is not None:
+            for item, _ in rejeitados:
+                self.descartado(item)
+
+    def _confirma(self, itens, rejeitados):
+        if rejeitados:
+            self._descarta(rejeitados)
+        with self._lock_fsync, self._lock:
+            for item in itens:
+                self._pendentes.popleft()
+                self._ids.discard((item['tipo'], item['id']))
+            self.gravados += len(itens) - len(rejeitados)
+            self.rejeitados += len(rejeitados)
+            if not self._pendentes:
+                # Tudo gravado no banco: o log pode ser esvaziado
+                self._arquivo.flush()
+                self._arquivo.truncate(0)
+            elif os.fstat(self._arquivo.fileno()).st_size > TAMANHO_MAXIMO_LOG:
+                # Sob carga contínua a fila nunca esvazia: troca o log por um só com os pendentes.
+                # O arquivo novo é travado antes do rename, então nenhum outro processo o assume. Ele fica em
+                # modo append, como o aberto em inicia(): depois de um truncate(0) as escritas voltam ao início
+                arquivo = open(self.caminho + '.tmp', 'a+', encoding='utf-8')
+                fcntl.flock(arquivo, fcntl.LOCK_EX)
+                arquivo.truncate(0)
+                arquivo.writelines(json.dumps(item, default=str) + "\n" for item in self._pendentes)
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+                os.replace(self.caminho + '.tmp', self.caminho)
+                self._arquivo.close()
+                self._arquivo = arquivo
+
+    def estado(self):
+        with self._lock:
+            pendentes = len(self._pendentes)
+        return {"log": self.caminho, "log_rejeitados": self.caminho_rejeitados, "pendentes": pendentes, "capacidade": self.capacidade,
+                "gravados": self.gravados, "rejeitados": self.rejeitados, "erros": self.erros,
+                "recuperados": self.recuperados}
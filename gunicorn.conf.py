@@ -0,0 +1,30 @@
+"""Configuração do gunicorn.
+
+Execução: gunicorn -c gunicorn.conf.py 'app:cria_app()'
+
+Com preload_app o app.py é importado (Flask, conector MySQL, compressores) e a configuração é lida
+e validada uma única vez, no master. Os workers nascem do fork com tudo já importado, dividindo essa
+memória por copy-on-write, e só criam o próprio pool de conexões antes de aceitar requisições.
+
+Por padrão roda um único worker: versões das ETags, cache, reservas e idempotência ficam na memória do
+processo. Mais workers (GUNICORN_WORKERS) exigem CACHE_COMPARTILHADO=redis, conferido em on_starting.
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+preload_app = True
+
+
+def on_starting(server):
+    # Com mais de um worker o estado compartilhado (versões, cache, reservas) precisa do Redis
+    import app
+    app.valida_processos(server.cfg.workers)
+
+
+def post_fork(server, worker):
+    # Recursos de cada worker: o pool (com as conexões já abertas) e as threads de fundo
+    import app
+    app.inicia_processo()
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import threading
+import time
+
+from cache import CacheLRU
+
+
+class Idempotencia:
+    """Registro das respostas dos POST com cabeçalho Idempotency-Key.
+
+    A primeira requisição com uma chave executa a rota; a resposta fica guardada por `ttl` segundos
+    no LRU do processo e, se houver, no cliente compartilhado (formato do Redis). Uma repetição da
+    chave recebe a resposta guardada sem executar a rota. Duplicatas simultâneas esperam a execução
+    em andamento: no mesmo processo por um Event, entre processos por uma marca gravada com SET NX.
+    """
+
+    def __init__(self, cliente=None, tamanho=10000, ttl=86400, espera=30, prefixo='estudo:idempotencia:'):
+        self.local = CacheLRU(tamanho, ttl)
+        self.cliente = cliente
+        self.ttl = ttl
+        self.espera = espera  # Tempo máximo de uma execução; depois disso a marca expira
+        self.prefixo = prefixo
+        self._em_andamento = {}  # chave -> Event das execuções deste processo
+        self._lock = threading.Lock()
+
+        self.repeticoes = 0
+        self.esperas = 0
+        self.erros = 0
+
+    @staticmethod
+    def impressao(corpo):
+        """Hash do corpo da requisição: a mesma chave com outro corpo é um erro do cliente."""
+        return hashlib.sha256(corpo).hexdigest()
+
+    def inicia(self, chave, impressao):
+        """Retorna ('executar', None), ('salva', registro) ou ('em_andamento', None).
+
+        Com 'executar' a chave fica reservada para quem chamou, que deve chamar conclui() depois.
+        """
+        limite = time.monotonic() + self.espera
+        while True:
+            with self._lock:
+                registro = self.local.obter(chave)
+                if registro is not None:
+                    self.repeticoes += 1
+                    return 'salva', registro
+                evento = self._em_andamento.get(chave)
+                if evento is None:
+                    self._em_andamento[chave] = threading.Event()
+                    break
+            # Outra thread deste processo está executando a mesma chave
+            self.esperas += 1
+            if not evento.wait(max(0, limite - time.monotonic())):
+                return 'em_andamento', None
+
+        if self.cliente is None:
+            return 'executar', None
+        marca = json.dumps({"em_andamento": True, "impressao": impressao})
+        try:
+            while True:
+                if self.cliente.set(self.prefixo + chave, marca, ex=self.espera, nx=True):
+                    return 'executar', None
+                valor = self.cliente.get(self.prefixo + chave)
+                if valor is not None:
+                    registro = json.loads(valor)
+                    if not registro.get("em_andamento"):
+                        self.local.guardar(chave, registro)
+                        self.conclui(chave, None, compartilhar=False)
+                        self.repeticoes += 1
+                        return 'salva', registro
+                # Outro processo está executando a chave: espera a resposta ou a marca expirar
+                if time.monotonic() > limite:
+                    self.conclui(chave, None, compartilhar=False)
+                    return 'em_andamento', None
+                time.sleep(0.05)
+        except Exception as err:
+            # Sem o cliente compartilhado a chave só é protegida dentro do processo
+            print(f"Erro no registro de idempotência compartilhado: {err}")
+            self.erros += 1
+            return 'executar', None
+
+    def conclui(self, chave, registro, compartilhar=True):
+        """Guarda a resposta da chave (ou a libera para uma nova execução, com registro=None)."""
+        if registro is not None:
+            self.local.guardar(chave, registro)
+        if self.cliente is not None and compartilhar:
+            try:
+                if registro is not None:
+                    self.cliente.set(self.prefixo + chave, json.dumps(registro), ex=self.ttl)
+                else:
+                    self.cliente.delete(self.prefixo + chave)
+            except Exception as err:
+                print(f"Erro no registro de idempotência compartilhado: {err}")
+                self.erros += 1
+        with self._lock:
+            evento = self._em_andamento.pop(chave, None)
+        if evento is not None:
+            # Acorda as duplicatas que esperavam esta execução
+            evento.set()
+
+    def estatisticas(self):
+        with self._lock:
+            em_andamento = len(self._em_andamento)
+        return {"local": self.local.estatisticas(), "em_andamento": em_andamento,
+                "repeticoes": self.repeticoes, "esperas": self.esperas, "erros": self.erros}
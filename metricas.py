@@ -0,0 +1,80 @@
+import bisect
+import threading
+
+# Limites dos buckets dos histogramas de tempo (segundos), de linhas e de bytes
+BUCKETS_TEMPO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_LINHAS = (0, 1, 10, 100, 1000, 10000, 100000)
+BUCKETS_BYTES = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+class Histograma:
+    """Histograma no formato do Prometheus, com uma série por combinação de labels."""
+
+    def __init__(self, nome, descricao, buckets=BUCKETS_TEMPO):
+        self.nome = nome
+        self.descricao = descricao
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [contagens por bucket, soma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **labels):
+        chave = tuple(sorted(labels.items()))
+        # Índice do primeiro bucket que comporta o valor (len(buckets) = apenas +Inf)
+        posicao = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * len(self.buckets), 0.0, 0]
+            if posicao < len(self.buckets):
+                serie[0][posicao] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            series = [(chave, list(contagens), soma, total) for chave, (contagens, soma, total) in self._series.items()]
+        for chave, contagens, soma, total in series:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, contagens):
+                acumulado += contagem
+                linhas.append(f"{self.nome}_bucket{formata_labels(chave, le=limite)} {acumulado}")
+            linhas.append(f"{self.nome}_bucket{formata_labels(chave, le='+Inf')} {total}")
+            linhas.append(f"{self.nome}_sum{formata_labels(chave)} {soma}")
+            linhas.append(f"{self.nome}_count{formata_labels(chave)} {total}")
+        return "\n".join(linhas)
+
+
+def formata_labels(chave, **extras):
+    """Formata as labels como {a="1",b="2"}, escapando aspas, barras e quebras de linha."""
+    pares = list(chave) + list(extras.items())
+    if not pares:
+        return ""
+    partes = []
+    for nome, valor in pares:
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{nome}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def exporta_gauges(nome, descricao, valores):
+    """Exporta um dicionário {label: valor} como um gauge com a label 'tipo'."""
+    linhas = [f"# HELP {nome} {descricao}", f"# TYPE {nome} gauge"]
+    for tipo, valor in valores.items():
+        linhas.append(f"{nome}{formata_labels((('tipo', tipo),))} {valor}")
+    return "\n".join(linhas)
+
+
+class Metricas:
+    """Registro dos histogramas da aplicação."""
+
+    def __init__(self):
+        self.histogramas = {}
+
+    def histograma(self, nome, descricao, buckets=BUCKETS_TEMPO):
+        if nome not in self.histogramas:
+            self.histogramas[nome] = Histograma(nome, descricao, buckets)
+        return self.histogramas[nome]
+
+    def exportar(self):
+        return "\n".join(histograma.exportar() for histograma in self.histogramas.values())
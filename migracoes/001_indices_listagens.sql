@@ -0,0 +1,31 @@
+-- Índices usados pelos filtros (coluna=, coluna_min=, coluna_max=) e pela ordenação (sort=)
+-- das listagens. Cada índice secundário do InnoDB já termina na chave primária, então um índice
+-- em (coluna) atende ORDER BY coluna, id e a paginação keyset WHERE (coluna, id) > (%s, %s).
+-- Execução: mysql db_estudo < migracoes/001_indices_listagens.sql
+-- O MySQL não tem CREATE INDEX IF NOT EXISTS: se a chave estrangeira já criou um índice na
+-- coluna (tbl_carrinho.cliente_id, por exemplo), remova a linha correspondente antes de executar.
+
+-- Clientes: busca por email/cpf e ordenação por nome
+CREATE INDEX idx_clientes_email ON tbl_clientes (email);
+CREATE INDEX idx_clientes_cpf ON tbl_clientes (cpf);
+CREATE INDEX idx_clientes_nome ON tbl_clientes (nome);
+
+-- Fornecedores: busca por email/cnpj e ordenação por nome
+CREATE INDEX idx_fornecedores_email ON tbl_fornecedores (email);
+CREATE INDEX idx_fornecedores_cnpj ON tbl_fornecedores (cnpj);
+CREATE INDEX idx_fornecedores_nome ON tbl_fornecedores (nome);
+
+-- Produtos: produtos de um fornecedor (já ordenados por preço), faixas de preço e estoque baixo
+CREATE INDEX idx_produtos_fornecedor_preco ON tbl_produtos (fornecedor_id, preco);
+CREATE INDEX idx_produtos_preco ON tbl_produtos (preco);
+CREATE INDEX idx_produtos_estoque ON tbl_produtos (qtd_em_estoque);
+CREATE INDEX idx_produtos_nome ON tbl_produtos (nome);
+
+-- Carrinhos: itens de um cliente e carrinhos que contêm um produto
+CREATE INDEX idx_carrinho_cliente ON tbl_carrinho (cliente_id);
+CREATE INDEX idx_carrinho_produto ON tbl_carrinho (produto_id);
+
+-- Pedidos: pedidos de um cliente (por status), pedidos por status e por período
+CREATE INDEX idx_pedido_cliente_status ON tbl_pedido (cliente_id, status);
+CREATE INDEX idx_pedido_status ON tbl_pedido (status);
+CREATE INDEX idx_pedido_data_hora ON tbl_pedido (data_hora);
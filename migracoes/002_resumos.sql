@@ -0,0 +1,25 @@
+-- Tabelas de resumo dos relatórios (/relatorios/receita e /relatorios/carrinhos), mantidas de
+-- forma incremental pela aplicação (resumos.py). Depois de criar as tabelas, faça a carga
+-- inicial com: flask --app app reconstroi-resumos
+-- Execução: mysql db_estudo < migracoes/002_resumos.sql
+
+-- Pedidos, itens e receita por fornecedor, dia e status
+CREATE TABLE tbl_resumo_pedidos (
+    fornecedor_id INT NOT NULL,
+    dia DATE NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    pedidos INT NOT NULL DEFAULT 0,
+    itens BIGINT NOT NULL DEFAULT 0,
+    receita DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (fornecedor_id, dia, status),
+    INDEX idx_resumo_pedidos_dia (dia),
+    INDEX idx_resumo_pedidos_status (status)
+);
+
+-- Itens e valor em carrinhos por fornecedor
+CREATE TABLE tbl_resumo_carrinhos (
+    fornecedor_id INT NOT NULL PRIMARY KEY,
+    linhas INT NOT NULL DEFAULT 0,
+    itens BIGINT NOT NULL DEFAULT 0,
+    valor DECIMAL(18, 2) NOT NULL DEFAULT 0
+);
@@ -0,0 +1,9 @@
+-- Prazo da reserva de estoque de cada item de carrinho (reservas.py). Itens vencidos que não viraram
+-- pedido são removidos em lote pela aplicação, devolvendo o estoque. Itens antigos ficam com NULL
+-- e não vencem.
+-- Execução: mysql db_estudo < migracoes/003_reservas.sql
+
+ALTER TABLE tbl_carrinho ADD COLUMN reservado_ate DATETIME NULL;
+
+-- Busca dos itens vencidos, em ordem de vencimento
+CREATE INDEX idx_carrinho_reservado_ate ON tbl_carrinho (reservado_ate);
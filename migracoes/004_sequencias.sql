@@ -0,0 +1,15 @@
+-- Sequências de ids da gravação adiada (GRAVACAO_ADIADA=1, ver gravacao.py). Cada processo reserva
+-- aqui um bloco de ids e os entrega aos itens aceitos antes de eles chegarem ao banco, então os ids
+-- de tbl_carrinho e tbl_pedido deixam de vir do AUTO_INCREMENT enquanto o modo estiver ligado.
+-- Execução: mysql db_estudo < migracoes/004_sequencias.sql
+
+CREATE TABLE IF NOT EXISTS tbl_sequencias (
+    tabela VARCHAR(64) NOT NULL PRIMARY KEY,
+    proximo BIGINT NOT NULL
+);
+
+-- A aplicação também pula os ids já usados (MAX(id) + 1) a cada bloco reservado
+INSERT IGNORE INTO tbl_sequencias (tabela, proximo)
+SELECT 'tbl_carrinho', COALESCE(MAX(id), 0) + 1 FROM tbl_carrinho;
+INSERT IGNORE INTO tbl_sequencias (tabela, proximo)
+SELECT 'tbl_pedido', COALESCE(MAX(id), 0) + 1 FROM tbl_pedido;
@@ -0,0 +1,10 @@
+-- Índices FULLTEXT das rotas de busca (/clientes/busca e /produtos/busca, ver busca.py). As colunas
+-- de cada índice são as mesmas do MATCH (...) da consulta, condição para o MySQL usá-lo.
+-- Palavras com menos de innodb_ft_min_token_size letras (3, por padrão) não são indexadas.
+-- Execução: mysql db_estudo < migracoes/005_busca.sql
+
+-- Clientes: partes do nome, do e-mail e do CPF
+CREATE FULLTEXT INDEX idx_clientes_busca ON tbl_clientes (nome, email, cpf);
+
+-- Produtos: palavras do nome e da descrição
+CREATE FULLTEXT INDEX idx_produtos_busca ON tbl_produtos (nome, descricao);
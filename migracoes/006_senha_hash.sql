@@ -0,0 +1,6 @@
+-- Coluna de senha com espaço para o hash (senhas.py): scrypt$<log2 de n>$<r>$<p>$<sal>$<hash>, em
+-- base64, tem cerca de 80 caracteres. Uma coluna menor recusaria os cadastros (ou cortaria o hash, sem
+-- o modo estrito do MySQL). Senhas antigas em texto continuam válidas e viram hash no próximo login.
+-- Execução: mysql db_estudo < migracoes/006_senha_hash.sql
+
+ALTER TABLE tbl_clientes MODIFY senha VARCHAR(255) NOT NULL;
@@ -0,0 +1,123 @@
+"""Paginação keyset das listagens: parâmetros da query string, SQL da página e cursor da próxima.
+
+Compartilhada entre o app.py (Flask) e o app_async.py (Quart).
+"""
+import base64
+import json
+import os
+from datetime import datetime
+
+from repositorio import TABELAS
+
+# Colunas de cada tabela, usadas para validar a projeção pedida pelo cliente (fields=)
+COLUNAS = {nome: tabela.visiveis for nome, tabela in TABELAS.items()}
+
+# Limites de paginação das listagens
+LIMITE_PADRAO = int(os.getenv('PAGINA_LIMITE_PADRAO', 100))
+LIMITE_MAXIMO = int(os.getenv('PAGINA_LIMITE_MAXIMO', 1000))
+
+
+# Parâmetros das listagens que não são filtros
+PARAMETROS_LISTAGEM = ('limit', 'after', 'fields', 'sort', 'stream')
+
+
+def codifica_cursor(ultimo_id, sort=None, valor=None):
+    """Gera o cursor opaco da próxima página a partir do último id (e do valor da ordenação) retornado."""
+    dados = {"id": ultimo_id}
+    if sort:
+        dados["sort"] = sort
+    if valor is not None:
+        # Decimal e datas viram texto; o tipo é restaurado pela coluna ao decodificar
+        dados["valor"] = valor.isoformat() if isinstance(valor, datetime) else str(valor)
+    return base64.urlsafe_b64encode(json.dumps(dados).encode()).decode().rstrip("=")
+
+
+def decodifica_cursor(cursor):
+    """Recupera (último id, sort, valor da ordenação) a partir do cursor opaco recebido em after=."""
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(dados["id"]), dados.get("sort"), dados.get("valor")
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError("Cursor inválido")
+
+
+def ler_paginacao(tabela, args):
+    """Lê limit, after, fields, sort e os filtros da query string. Lança ValueError se algum parâmetro for inválido."""
+    definicao = TABELAS[tabela]
+    try:
+        limite = int(args.get('limit', LIMITE_PADRAO))
+    except ValueError:
+        raise ValueError("O parâmetro limit deve ser um número inteiro")
+    if limite < 1:
+        raise ValueError("O parâmetro limit deve ser maior que zero")
+    limite = min(limite, LIMITE_MAXIMO)
+
+    # Ordenação: sort=coluna ou sort=-coluna (decrescente), apenas em colunas indexadas
+    sort = args.get('sort', 'id')
+    descendente = sort.startswith('-')
+    ordem = sort[1:] if descendente else sort
+    if ordem == 'id':
+        ordem = None
+    elif ordem not in definicao.ordenacao:
+        raise ValueError(f"Ordenação inválida: {ordem}")
+
+    # Filtros: coluna=valor, coluna_min=valor e coluna_max=valor, apenas em colunas indexadas.
+    # Ficam em ordem de parâmetro para que o mesmo conjunto de filtros gere sempre o mesmo SQL
+    filtros = []
+    for parametro in sorted(args):
+        if parametro in PARAMETROS_LISTAGEM:
+            continue
+        condicao = definicao.condicao(parametro)
+        if condicao is None:
+            raise ValueError(f"Filtro inválido: {parametro}")
+        coluna, operador = condicao
+        filtros.append((coluna, operador, definicao.converte(coluna, args.get(parametro))))
+
+    apos = args.get('after')
+    if apos:
+        apos, sort_cursor, valor = decodifica_cursor(apos)
+        # O cursor só vale para a ordenação em que foi gerado
+        if (sort_cursor or 'id') != sort:
+            raise ValueError("Cursor inválido para esta ordenação")
+        if ordem:
+            apos = (definicao.converte(ordem, valor), apos)
+    else:
+        apos = None
+
+    # O id é sempre selecionado, pois é a chave usada para montar o cursor
+    colunas = COLUNAS[tabela]
+    campos = args.get('fields')
+    if campos:
+        pedidos = [c.strip() for c in campos.split(',') if c.strip()]
+        for campo in pedidos:
+            if campo not in colunas:
+                raise ValueError(f"Campo inválido: {campo}")
+        colunas = tuple(['id'] + [c for c in pedidos if c != 'id'])
+    # A coluna de ordenação também entra no cursor, então precisa ser selecionada
+    if ordem and ordem not in colunas:
+        colunas = colunas + (ordem,)
+
+    return {"tabela": tabela, "colunas": colunas, "limite": limite, "apos": apos, "filtros": tuple(filtros),
+            "sort": sort, "ordem": ordem, "descendente": descendente}
+
+
+def sql_pagina(pagina, limite=True):
+    """Monta a consulta keyset (WHERE filtros AND (ordem, id) > últimos ORDER BY ordem, id) de uma página."""
+    # Busca uma linha a mais para saber se existe uma próxima página; sem limite percorre a tabela inteira
+    return TABELAS[pagina['tabela']].consulta_pagina(
+        pagina['colunas'], pagina['apos'], pagina['limite'] + 1 if limite else None,
+        pagina['filtros'], pagina['ordem'], pagina['descendente'])
+
+
+def proxima_pagina(results, pagina):
+    """Remove a linha extra dos resultados e retorna o cursor da próxima página (ou None)."""
+    if len(results) <= pagina['limite']:
+        return None
+    del results[pagina['limite']:]
+    # As linhas podem ser dicionários ou tuplas (o id é sempre a primeira coluna)
+    ultima = results[-1]
+    if isinstance(ultima, dict):
+        ultima = tuple(ultima[coluna] for coluna in pagina['colunas'])
+    sort = pagina['sort'] if pagina['sort'] != 'id' else None
+    valor = ultima[pagina['colunas'].index(pagina['ordem'])] if pagina['ordem'] else None
+    return codifica_cursor(ultima[0], sort, valor)
@@ -0,0 +1,279 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+
+class CursorMedido:
+    """Cursor que mede o tempo de execute/fetch e a quantidade de linhas de cada consulta."""
+
+    def __init__(self, cursor, observador):
+        self._cursor = cursor
+        self._observador = observador
+        self._sql = None
+        self._acumulado = 0.0  # Tempo total (execute + fetch) da consulta atual
+
+    def __getattr__(self, nome):
+        # Repassa lastrowid, rowcount, column_names, close() etc. para o cursor real
+        return getattr(self._cursor, nome)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _medir(self, fase, inicio, linhas=None):
+        duracao = time.perf_counter() - inicio
+        self._acumulado += duracao
+        self._observador(self._sql, fase, duracao, linhas, self._acumulado)
+
+    def execute(self, sql, *args, **kwargs):
+        self._sql = sql
+        self._acumulado = 0.0
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, *args, **kwargs)
+        finally:
+            self._medir('execute', inicio)
+
+    def executemany(self, sql, *args, **kwargs):
+        self._sql = sql
+        self._acumulado = 0.0
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, *args, **kwargs)
+        finally:
+            self._medir('execute', inicio)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        linha = self._cursor.fetchone()
+        self._medir('fetch', inicio, 0 if linha is None else 1)
+        return linha
+
+    def fetchmany(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        linhas = self._cursor.fetchmany(*args, **kwargs)
+        self._medir('fetch', inicio, len(linhas))
+        return linhas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        linhas = self._cursor.fetchall()
+        self._medir('fetch', inicio, len(linhas))
+        return linhas
+
+
+class ConexaoDoPool:
+    """Conexão emprestada do pool. O close() devolve a conexão ao pool em vez de fechá-la."""
+
+    def __init__(self, pool, conn, criada_em):
+        self._pool = pool
+        self._conn = conn
+        self._criada_em = criada_em
+        self._devolvida = False
+
+    def __getattr__(self, nome):
+        # Repassa cursor(), commit(), rollback() etc. para a conexão real
+        return getattr(self._conn, nome)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._conn.cursor(*args, **kwargs)
+        if self._pool.observador is not None:
+            cursor = CursorMedido(cursor, self._pool.observador)
+        return cursor
+
+    def cursor_preparado(self, sql):
+        """Retorna o cursor preparado de sql nesta conexão, criando-o no primeiro uso."""
+        cursor = self._pool.cursor_preparado(self._conn, sql)
+        if self._pool.observador is not None:
+            cursor = CursorMedido(cursor, self._pool.observador)
+        return cursor
+
+    def close(self):
+        # Devolve a conexão apenas uma vez, mesmo que close() seja chamado de novo
+        if self._devolvida:
+            return
+        self._devolvida = True
+        self._pool.devolver(self._conn, self._criada_em)
+
+    def descartar(self):
+        """Fecha a conexão real em vez de devolvê-la, para conexões em estado inconsistente."""
+        if self._devolvida:
+            return
+        self._devolvida = True
+        self._pool.descartar(self._conn)
+
+
+class PoolDeConexoes:
+    """Pool de conexões MySQL com overflow, verificação no checkout e reciclagem por tempo de vida."""
+
+    def __init__(self, config, tamanho=5, overflow=10, tempo_max_vida=1800, timeout_checkout=10.0,
+                 verificar_no_checkout=True, max_preparados=64, observador=None):
+        self.config = config
+        self.tamanho = tamanho  # Conexões mantidas abertas e ociosas no pool
+        self.overflow = overflow  # Conexões extras abertas apenas durante picos
+        self.tempo_max_vida = tempo_max_vida  # Segundos até a conexão ser reciclada
+        self.timeout_checkout = timeout_checkout  # Segundos de espera por uma conexão livre
+        self.verificar_no_checkout = verificar_no_checkout
+        self.max_preparados = max_preparados  # Statements preparados mantidos por conexão
+        # Função chamada com (sql, fase, duração, linhas, tempo acumulado) a cada execute/fetch
+        self.observador = observador
+
+        # Cursores preparados de cada conexão real: id(conexão) -> {sql: cursor}
+        self._preparados = {}
+
+        # Conexões ociosas no formato (conexão, momento da criação); LIFO mantém as mais quentes em uso
+        self._ociosas = deque()
+        self._lock = threading.Lock()
+        # Limita o total de conexões emprestadas ao mesmo tempo (tamanho + overflow)
+        self._vagas = threading.BoundedSemaphore(tamanho + overflow)
+
+        # Métricas do pool
+        self._emprestadas = 0
+        self._abertas = 0
+        self._checkouts = 0
+        self._espera_total = 0.0
+        self._espera_maxima = 0.0
+        self._timeouts = 0
+        self._recicladas = 0
+        self._descartadas = 0
+
+    def _abrir(self):
+        conn = mysql.connector.connect(**self.config)
+        with self._lock:
+            self._abertas += 1
+        return conn, time.monotonic()
+
+    def _fechar(self, conn):
+        try:
+            conn.close()
+        except Error:
+            pass
+        with self._lock:
+            self._abertas -= 1
+            # Os statements preparados morrem junto com a conexão no servidor
+            self._preparados.pop(id(conn), None)
+
+    def cursor_preparado(self, conn, sql):
+        """Reaproveita o cursor preparado de sql na conexão, fechando o menos usado se passar do limite."""
+        # A conexão está emprestada a uma única thread, então só o dicionário precisa do lock
+        with self._lock:
+            cursores = self._preparados.setdefault(id(conn), OrderedDict())
+        cursor = cursores.get(sql)
+        if cursor is not None:
+            cursores.move_to_end(sql)
+            return cursor
+
+        cursor = conn.cursor(prepared=True)
+        cursores[sql] = cursor
+        if len(cursores) > self.max_preparados:
+            _, antigo = cursores.popitem(last=False)
+            try:
+                antigo.close()
+            except Error:
+                pass
+        return cursor
+
+    def aquece(self, quantidade=None):
+        """Abre conexões ociosas até `quantidade` (padrão: tamanho), para a primeira requisição não esperar o connect."""
+        quantidade = self.tamanho if quantidade is None else min(quantidade, self.tamanho)
+        with self._lock:
+            faltando = quantidade - len(self._ociosas) - self._emprestadas
+        for _ in range(faltando):
+            conn = self._abrir()
+            with self._lock:
+                self._ociosas.append(conn)
+
+    def obter(self):
+        """Empresta uma conexão do pool, esperando no máximo timeout_checkout segundos."""
+        inicio = time.monotonic()
+        if not self._vagas.acquire(timeout=self.timeout_checkout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolError("Tempo esgotado aguardando uma conexão livre no pool")
+
+        espera = time.monotonic() - inicio
+        try:
+            conn, criada_em = self._obter_ociosa()
+            if conn is None:
+                conn, criada_em = self._abrir()
+        except Exception:
+            self._vagas.release()
+            raise
+
+        with self._lock:
+            self._emprestadas += 1
+            self._checkouts += 1
+            self._espera_total += espera
+            self._espera_maxima = max(self._espera_maxima, espera)
+        return ConexaoDoPool(self, conn, criada_em)
+
+    def _obter_ociosa(self):
+        # Procura uma conexão ociosa válida, descartando as expiradas ou quebradas
+        while True:
+            with self._lock:
+                if not self._ociosas:
+                    return None, None
+                conn, criada_em = self._ociosas.pop()
+
+            if time.monotonic() - criada_em > self.tempo_max_vida:
+                self._fechar(conn)
+                with self._lock:
+                    self._recicladas += 1
+                continue
+
+            if self.verificar_no_checkout and not conn.is_connected():
+                self._fechar(conn)
+                with self._lock:
+                    self._descartadas += 1
+                continue
+
+            return conn, criada_em
+
+    def devolver(self, conn, criada_em):
+        """Recebe de volta uma conexão emprestada."""
+        try:
+            # Descarta qualquer transação deixada aberta por quem usou a conexão
+            if conn.in_transaction:
+                conn.rollback()
+            manter = time.monotonic() - criada_em <= self.tempo_max_vida
+        except Error:
+            manter = False
+
+        with self._lock:
+            self._emprestadas -= 1
+            # Conexões de overflow são fechadas quando o pool já tem ociosas suficientes
+            if manter and len(self._ociosas) < self.tamanho:
+                self._ociosas.append((conn, criada_em))
+                conn = None
+
+        if conn is not None:
+            self._fechar(conn)
+        self._vagas.release()
+
+    def descartar(self, conn):
+        """Fecha uma conexão emprestada que não pode voltar ao pool."""
+        self._fechar(conn)
+        with self._lock:
+            self._emprestadas -= 1
+            self._descartadas += 1
+        self._vagas.release()
+
+    def estatisticas(self):
+        """Retorna um dicionário com o estado e as métricas de espera do pool."""
+        with self._lock:
+            return {
+                "tamanho": self.tamanho,
+                "overflow": self.overflow,
+                "abertas": self._abertas,
+                "ociosas": len(self._ociosas),
+                "emprestadas": self._emprestadas,
+                "checkouts": self._checkouts,
+                "espera_media_ms": (self._espera_total / self._checkouts * 1000) if self._checkouts else 0.0,
+                "espera_maxima_ms": self._espera_maxima * 1000,
+                "timeouts": self._timeouts,
+                "recicladas": self._recicladas,
+                "descartadas": self._descartadas,
+            }
@@ -0,0 +1,150 @@
+import threading
+import time
+
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+
+def le_replicas(texto, config):
+    """Converte DB_REPLICAS ("host[:porta[:peso]],...") em uma lista de (nome, config, peso).
+
+    Cada réplica usa as credenciais, o banco e o certificado do primário (config).
+    """
+    replicas = []
+    for item in texto.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        partes = item.split(':')
+        if len(partes) > 3:
+            raise ValueError(f"Réplica inválida em DB_REPLICAS: {item}")
+        host = partes[0]
+        porta = int(partes[1]) if len(partes) > 1 and partes[1] else config['port']
+        peso = int(partes[2]) if len(partes) > 2 else 1
+        if peso < 1:
+            raise ValueError(f"O peso da réplica {item} deve ser maior que zero")
+        replicas.append((f"{host}:{porta}", {**config, 'host': host, 'port': porta}, peso))
+    return replicas
+
+
+def consulta_atraso(pool):
+    """Segundos de atraso da réplica (o maior entre os canais), ou None se a replicação estiver parada."""
+    conn = pool.obter()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            # MySQL 8.0.22 ou mais novo; o usuário precisa do privilégio REPLICATION CLIENT
+            cursor.execute("SHOW REPLICA STATUS")
+            canais = cursor.fetchall()
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+    # Sem linhas o servidor não é uma réplica; Seconds_Behind_Source nulo é a replicação parada
+    atrasos = [canal.get('Seconds_Behind_Source') for canal in canais]
+    if not atrasos or None in atrasos:
+        return None
+    return max(atrasos)
+
+
+class Replica:
+    """Uma réplica de leitura, com o seu próprio pool de conexões."""
+
+    def __init__(self, nome, pool, peso=1):
+        self.nome = nome
+        self.pool = pool
+        self.peso = peso
+        self.ativa = False  # Só entra no rodízio depois da primeira verificação
+        self.atraso = None  # Segundos de atraso na última verificação
+        self.motivo = "ainda não verificada"  # Por que está fora do rodízio
+        self.verificada_em = None
+        self.leituras = 0
+        self.ejecoes = 0
+        self._corrente = 0  # Peso corrente do round-robin ponderado
+
+
+class ConjuntoDeReplicas:
+    """Réplicas de leitura escolhidas por round-robin ponderado.
+
+    Uma thread consulta o atraso de cada réplica a cada `intervalo` segundos. A réplica sai do
+    rodízio quando a consulta falha, a replicação está parada ou o atraso passa de `atraso_maximo`,
+    e só volta com o atraso abaixo da metade do máximo, para não entrar e sair a cada verificação.
+    Sem nenhuma réplica ativa, escolhe() retorna None e a leitura vai para o primário.
+    """
+
+    def __init__(self, replicas, atraso_maximo=5, intervalo=2):
+        self.replicas = replicas
+        self.atraso_maximo = atraso_maximo
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+
+    def escolhe(self):
+        """Próxima réplica ativa (round-robin ponderado suave, como o do nginx), ou None."""
+        with self._lock:
+            escolhida = None
+            total = 0
+            for replica in self.replicas:
+                if not replica.ativa:
+                    continue
+                replica._corrente += replica.peso
+                total += replica.peso
+                if escolhida is None or replica._corrente > escolhida._corrente:
+                    escolhida = replica
+            if escolhida is not None:
+                # Réplicas de peso 3 e 1 saem na ordem A A B A, sem rajadas na mesma réplica
+                escolhida._corrente -= total
+                escolhida.leituras += 1
+            return escolhida
+
+    def ejeta(self, replica, motivo):
+        """Tira a réplica do rodízio até a próxima verificação bem-sucedida."""
+        with self._lock:
+            if replica.ativa:
+                replica.ativa = False
+                replica.ejecoes += 1
+                replica._corrente = 0
+                print(f"Réplica {replica.nome} fora do rodízio: {motivo}")
+            replica.motivo = str(motivo)
+
+    def verifica(self, replica):
+        try:
+            atraso = consulta_atraso(replica.pool)
+        except PoolError:
+            # Todas as conexões da réplica estão atendendo leituras: mantém o estado atual
+            return
+        except Error as err:
+            replica.atraso = None
+            self.ejeta(replica, err)
+            return
+        replica.atraso = atraso
+        replica.verificada_em = time.time()
+        if atraso is None:
+            self.ejeta(replica, "replicação parada")
+        elif atraso > self.atraso_maximo:
+            self.ejeta(replica, f"atraso de {atraso} s")
+        elif not replica.ativa and atraso <= self.atraso_maximo / 2:
+            with self._lock:
+                replica.ativa = True
+                replica.motivo = None
+            print(f"Réplica {replica.nome} de volta ao rodízio")
+
+    def inicia(self):
+        """Começa a thread que verifica as réplicas. Até a primeira verificação as leituras vão para o primário."""
+        threading.Thread(target=self._executa, daemon=True, name='replicas').start()
+
+    def _executa(self):
+        while True:
+            for replica in self.replicas:
+                try:
+                    self.verifica(replica)
+                except Exception as err:
+                    print(f"Erro ao verificar a réplica {replica.nome}: {err}")
+            time.sleep(self.intervalo)
+
+    def estado(self):
+        with self._lock:
+            return {replica.nome: {"ativa": replica.ativa, "peso": replica.peso, "atraso": replica.atraso,
+                                   "motivo": replica.motivo, "verificada_em": replica.verificada_em,
+                                   "leituras": replica.leituras, "ejecoes": replica.ejecoes,
+                                   "pool": replica.pool.estatisticas()}
+                    for replica in self.replicas}
@@ -0,0 +1,170 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+
+class Tabela:
+    """Definição de uma tabela: nome, colunas com seus tipos e chave primária.
+
+    Colunas ocultas (ex.: o hash da senha) podem ser gravadas, mas não saem nas leituras.
+
+    O SQL gerado é guardado em cache por conjunto de colunas, então o mesmo objeto str volta
+    em toda chamada e o cursor preparado da conexão pode ser reaproveitado.
+    """
+
+    def __init__(self, nome, colunas, chave='id', filtros=(), faixas=(), ordenacao=(), ocultas=()):
+        self.nome = nome
+        self.tipos = dict(colunas)  # Coluna -> tipo Python do valor
+        self.colunas = tuple(self.tipos)
+        self.chave = chave
+        self.editaveis = tuple(coluna for coluna in self.colunas if coluna != chave)
+        # Colunas devolvidas pelas leituras (busca por id e listagens)
+        self.visiveis = tuple(coluna for coluna in self.colunas if coluna not in ocultas)
+        # Colunas indexadas que podem ser usadas nas listagens: igualdade (coluna=), faixa
+        # (coluna_min= e coluna_max=) e ordenação (sort=coluna ou sort=-coluna)
+        self.filtros = tuple(filtros) + tuple(faixas)
+        self.faixas = tuple(faixas)
+        self.ordenacao = tuple(ordenacao)
+
+    def __repr__(self):
+        return f"Tabela({self.nome!r})"
+
+    @lru_cache(maxsize=None)
+    def sql_busca(self, colunas=None):
+        return f"SELECT {', '.join(colunas or self.visiveis)} FROM {self.nome} WHERE {self.chave} = %s"
+
+    @lru_cache(maxsize=None)
+    def sql_insercao(self, colunas):
+        return f"INSERT INTO {self.nome} ({', '.join(colunas)}) VALUES ({', '.join(['%s'] * len(colunas))})"
+
+    @lru_cache(maxsize=None)
+    def sql_atualizacao(self, colunas):
+        return f"UPDATE {self.nome} SET {', '.join(f'{coluna} = %s' for coluna in colunas)} WHERE {self.chave} = %s"
+
+    @lru_cache(maxsize=None)
+    def sql_remocao(self):
+        return f"DELETE FROM {self.nome} WHERE {self.chave} = %s"
+
+    @lru_cache(maxsize=None)
+    def sql_pagina(self, colunas, com_apos, condicoes=(), ordem=None, descendente=False, com_limite=True):
+        # Paginação keyset: WHERE (ordem, chave) > últimos valores vistos. A chave desempata
+        # linhas com o mesmo valor na coluna de ordenação
+        sql = f"SELECT {', '.join(colunas)} FROM {self.nome}"
+        where = [f"{coluna} {operador} %s" for coluna, operador in condicoes]
+        if com_apos:
+            sinal = '<' if descendente else '>'
+            if ordem:
+                where.append(f"({ordem}, {self.chave}) {sinal} (%s, %s)")
+            else:
+                where.append(f"{self.chave} {sinal} %s")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        direcao = " DESC" if descendente else ""
+        chaves = [ordem, self.chave] if ordem else [self.chave]
+        sql += " ORDER BY " + ", ".join(chave + direcao for chave in chaves)
+        return sql + " LIMIT %s" if com_limite else sql
+
+    def consulta_pagina(self, colunas, apos, limite, filtros=(), ordem=None, descendente=False):
+        """Retorna (sql, valores) de uma página. apos é o último id visto, ou (valor da ordem, id) com ordem.
+
+        filtros são triplas (coluna, operador, valor); sem limite a consulta percorre todas as linhas.
+        """
+        condicoes = tuple((coluna, operador) for coluna, operador, _ in filtros)
+        valores = [valor for _, _, valor in filtros]
+        if apos is not None:
+            valores.extend(apos if ordem else (apos,))
+        if limite is not None:
+            valores.append(limite)
+        sql = self.sql_pagina(tuple(colunas), apos is not None, condicoes, ordem, descendente, limite is not None)
+        return sql, valores
+
+    def condicao(self, parametro):
+        """Retorna (coluna, operador) do parâmetro de filtro da query string, ou None se não for um filtro."""
+        if parametro in self.filtros:
+            return parametro, '='
+        coluna, _, sufixo = parametro.rpartition('_')
+        if coluna in self.faixas and sufixo in ('min', 'max'):
+            return coluna, '>=' if sufixo == 'min' else '<='
+        return None
+
+    def converte(self, coluna, valor):
+        """Converte o texto recebido para o tipo da coluna. Lança ValueError se o valor for inválido."""
+        tipo = self.tipos[coluna]
+        try:
+            if tipo is datetime:
+                return datetime.fromisoformat(valor)
+            return tipo(valor)
+        except (ValueError, TypeError, InvalidOperation):
+            raise ValueError(f"Valor inválido para {coluna}: {valor}")
+
+    def campos_atualizacao(self, entrada):
+        """Retorna (colunas, valores) das colunas editáveis presentes na entrada, na ordem da tabela."""
+        colunas = tuple(coluna for coluna in self.editaveis if coluna in entrada)
+        return colunas, [entrada[coluna] for coluna in colunas]
+
+
+# Uma definição por tabela do banco. Filtros e ordenações só usam colunas com índice
+# (ver migracoes/001_indices_listagens.sql)
+TABELAS = {
+    'tbl_clientes': Tabela('tbl_clientes', (
+        ('id', int), ('nome', str), ('email', str), ('cpf', str), ('senha', str),
+    ), filtros=('email', 'cpf'), ordenacao=('nome',), ocultas=('senha',)),
+    'tbl_fornecedores': Tabela('tbl_fornecedores', (
+        ('id', int), ('nome', str), ('email', str), ('cnpj', str),
+    ), filtros=('email', 'cnpj'), ordenacao=('nome',)),
+    'tbl_produtos': Tabela('tbl_produtos', (
+        ('id', int), ('nome', str), ('descricao', str), ('preco', Decimal), ('qtd_em_estoque', int),
+        ('fornecedor_id', int), ('custo_no_fornecedor', Decimal),
+    ), filtros=('fornecedor_id',), faixas=('preco', 'qtd_em_estoque'), ordenacao=('nome', 'preco', 'qtd_em_estoque')),
+    'tbl_carrinho': Tabela('tbl_carrinho', (
+        ('id', int), ('produto_id', int), ('quantidade', int), ('cliente_id', int), ('reservado_ate', datetime),
+    ), filtros=('produto_id', 'cliente_id')),
+    'tbl_pedido': Tabela('tbl_pedido', (
+        ('id', int), ('cliente_id', int), ('carrinho_id', int), ('data_hora', datetime), ('status', str),
+    ), filtros=('cliente_id', 'status'), faixas=('data_hora',), ordenacao=('data_hora',)),
+}
+
+
+class Repositorio:
+    """Operações de uma tabela sobre uma conexão do pool, usando statements preparados reaproveitados."""
+
+    def __init__(self, conn, tabela):
+        self.conn = conn
+        self.tabela = TABELAS[tabela] if isinstance(tabela, str) else tabela
+
+    def executa(self, sql, valores=()):
+        # O cursor preparado fica guardado na conexão: o MySQL faz o parse/plano uma única vez
+        cursor = self.conn.cursor_preparado(sql)
+        cursor.execute(sql, tuple(valores))
+        return cursor
+
+    def _linhas(self, cursor):
+        colunas = cursor.column_names
+        return [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+
+    def busca(self, id, colunas=None):
+        """Retorna o registro com a chave informada, ou None."""
+        linhas = self._linhas(self.executa(self.tabela.sql_busca(colunas), (id,)))
+        return linhas[0] if linhas else None
+
+    def pagina(self, colunas, apos, limite, filtros=(), ordem=None, descendente=False):
+        """Retorna até limite linhas (tuplas na ordem de colunas) depois de apos, com os filtros e a ordem pedidos."""
+        # As linhas ficam em tuplas: a serialização usa a lista de colunas já conhecida
+        return self.executa(*self.tabela.consulta_pagina(colunas, apos, limite, filtros, ordem, descendente)).fetchall()
+
+    def insere(self, entrada):
+        """Insere um registro com as colunas editáveis presentes na entrada e retorna o id gerado."""
+        colunas, valores = self.tabela.campos_atualizacao(entrada)
+        return self.executa(self.tabela.sql_insercao(colunas), valores).lastrowid
+
+    def atualiza(self, id, entrada):
+        """Atualiza as colunas presentes na entrada. Retorna o número de linhas afetadas, ou None se não há campos."""
+        colunas, valores = self.tabela.campos_atualizacao(entrada)
+        if not colunas:
+            return None
+        valores.append(id)
+        return self.executa(self.tabela.sql_atualizacao(colunas), valores).rowcount
+
+    def remove(self, id):
+        """Remove o registro e retorna o número de linhas afetadas."""
+        return self.executa(self.tabela.sql_remocao(), (id,)).rowcount
@@ -0,0 +1,189 @@
+import json
+from collections import Counter
+
+import resumos
+from cache import ClienteMemoria
+
+
+class Reservas:
+    """Estoque dos produtos quentes (ex.: promoção relâmpago), reservado com decrementos atômicos fora do banco.
+
+    Para um produto quente, `disponivel` é o estoque do banco menos as reservas ainda não aplicadas
+    (`pendente`). Uma reserva decrementa `disponivel` e soma em `pendente` sem tocar na linha do
+    produto; reconcilia() aplica os pendentes em tbl_produtos em lote, fora das requisições.
+    Sem cliente compartilhado os contadores ficam na memória do processo, o que só é correto com um
+    único processo. Com vários workers, use um cliente no formato do Redis (get/set/incr/delete).
+    """
+
+    def __init__(self, cliente=None, prefixo='estudo:reserva:'):
+        self.cliente = cliente if cliente is not None else ClienteMemoria()
+        self.prefixo = prefixo
+
+    def _disponivel(self, produto_id):
+        return f"{self.prefixo}disponivel:{produto_id}"
+
+    def _pendente(self, produto_id):
+        return f"{self.prefixo}pendente:{produto_id}"
+
+    def quentes(self):
+        """Ids dos produtos reservados em memória."""
+        valor = self.cliente.get(self.prefixo + 'quentes')
+        return set(json.loads(valor)) if valor else set()
+
+    def aquece(self, produto_id, estoque):
+        """Passa a reservar o produto em memória a partir do estoque do banco (também usado para recalcular).
+
+        Deve ser chamada com a linha do produto bloqueada (SELECT ... FOR UPDATE) até depois de marcar o
+        produto como quente: uma reserva pelo banco em andamento baixaria o estoque depois da leitura.
+        """
+        pendente = int(self.cliente.get(self._pendente(produto_id)) or 0)
+        self.cliente.set(self._disponivel(produto_id), estoque - pendente)
+        self.cliente.set(self.prefixo + 'quentes', json.dumps(sorted(self.quentes() | {produto_id})))
+
+    def esfria(self, produto_id):
+        """Volta o produto para a reserva direta no banco. Os pendentes ficam para reconcilia().
+
+        Uma requisição em andamento pode ainda ter lido o produto como quente, então esta operação
+        deve ser feita fora do pico de acessos ao produto.
+        """
+        quentes = self.quentes()
+        if produto_id not in quentes:
+            return False
+        self.cliente.set(self.prefixo + 'quentes', json.dumps(sorted(quentes - {produto_id})))
+        self.cliente.delete(self._disponivel(produto_id))
+        return True
+
+    def reserva(self, produto_id, quantidade):
+        """Reserva a quantidade se houver estoque. Retorna None se o produto não é quente."""
+        chave = self._disponivel(produto_id)
+        if self.cliente.get(chave) is None:
+            return None
+        if self.cliente.incr(chave, -quantidade) < 0:
+            # Outra reserva levou o estoque antes: desfaz o decremento
+            self.cliente.incr(chave, quantidade)
+            return False
+        self.cliente.incr(self._pendente(produto_id), quantidade)
+        return True
+
+    def devolve(self, produto_id, quantidade):
+        """Devolve ao estoque uma quantidade reservada. Retorna False se o produto não é quente."""
+        chave = self._disponivel(produto_id)
+        if self.cliente.get(chave) is None:
+            return False
+        self.cliente.incr(chave, quantidade)
+        self.cliente.incr(self._pendente(produto_id), -quantidade)
+        return True
+
+    def retira_pendente(self, produto_id):
+        """Zera o pendente do produto e retorna o valor retirado. Reservas feitas no meio não se perdem."""
+        chave = self._pendente(produto_id)
+        pendente = int(self.cliente.get(chave) or 0)
+        if pendente:
+            self.cliente.incr(chave, -pendente)
+        return pendente
+
+    def repoe_pendente(self, produto_id, pendente):
+        self.cliente.incr(self._pendente(produto_id), pendente)
+
+    def estado(self):
+        """Disponível e pendente de cada produto quente."""
+        return {
+            str(produto_id): {
+                "disponivel": int(self.cliente.get(self._disponivel(produto_id)) or 0),
+                "pendente": int(self.cliente.get(self._pendente(produto_id)) or 0),
+            }
+            for produto_id in sorted(self.quentes())
+        }
+
+
+def reconcilia(conn, reservas, produtos=None):
+    """Aplica em tbl_produtos, em uma única transação, as reservas pendentes dos produtos quentes.
+
+    Retorna os ids dos produtos alterados. Em caso de erro os pendentes voltam para a próxima rodada.
+    """
+    ids = sorted(reservas.quentes() if produtos is None else produtos)
+    if not ids:
+        return []
+
+    cursor = conn.cursor()
+    retirados = {}
+    try:
+        conn.start_transaction()
+        # As linhas são bloqueadas antes de retirar os pendentes: aquece() recalcula o disponível com a
+        # linha bloqueada e nunca vê o pendente já retirado sem a baixa correspondente no estoque.
+        # Ordem fixa de ids: dois processos reconciliando ao mesmo tempo não entram em deadlock
+        cursor.execute(f"SELECT id FROM tbl_produtos WHERE id IN ({', '.join(['%s'] * len(ids))}) "
+                       "ORDER BY id FOR UPDATE", ids)
+        cursor.fetchall()
+        for produto_id in ids:
+            pendente = reservas.retira_pendente(produto_id)
+            if not pendente:
+                continue
+            retirados[produto_id] = pendente
+            cursor.execute("UPDATE tbl_produtos SET qtd_em_estoque = qtd_em_estoque - %s "
+                           "WHERE id = %s AND qtd_em_estoque >= %s", (pendente, produto_id, pendente))
+            if cursor.rowcount == 0:
+                # O contador reservou mais do que o banco tem: a baixa não é aplicada e o pendente fica
+                # em estado() até o estoque ser corrigido
+                print(f"Erro ao aplicar reservas do produto {produto_id}: {pendente} pendentes, estoque insuficiente")
+                reservas.repoe_pendente(produto_id, retirados.pop(produto_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        for produto_id, pendente in retirados.items():
+            reservas.repoe_pendente(produto_id, pendente)
+        raise
+    finally:
+        cursor.close()
+    return list(retirados)
+
+
+# Itens de carrinho com a reserva vencida que não viraram pedido. SKIP LOCKED deixa cada processo
+# pegar um lote diferente e não espera por itens que uma requisição está alterando
+SQL_VENCIDOS = """
+SELECT id, produto_id, quantidade, cliente_id FROM tbl_carrinho carrinho
+WHERE reservado_ate < %s
+AND NOT EXISTS (SELECT 1 FROM tbl_pedido pedido WHERE pedido.carrinho_id = carrinho.id)
+ORDER BY reservado_ate
+LIMIT %s
+FOR UPDATE SKIP LOCKED
+"""
+
+
+def expira(conn, reservas, agora, limite):
+    """Remove um lote de itens de carrinho com a reserva vencida e devolve o estoque.
+
+    Retorna as linhas (id, produto_id, quantidade, cliente_id) removidas.
+    """
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        cursor.execute(SQL_VENCIDOS, (agora, limite))
+        itens = cursor.fetchall()
+        if not itens:
+            conn.rollback()
+            return []
+
+        devolucao = Counter()
+        for id, produto_id, quantidade, _ in itens:
+            resumos.ajusta(cursor, 'carrinho', (id,), -1)
+            devolucao[produto_id] += quantidade
+        cursor.execute(f"DELETE FROM tbl_carrinho WHERE id IN ({', '.join(['%s'] * len(itens))})",
+                       [item[0] for item in itens])
+        # O estoque dos produtos quentes volta pelos contadores, depois do commit
+        quentes = reservas.quentes()
+        frios = [(quantidade, produto_id) for produto_id, quantidade in sorted(devolucao.items())
+                 if produto_id not in quentes]
+        if frios:
+            cursor.executemany("UPDATE tbl_produtos SET qtd_em_estoque = qtd_em_estoque + %s WHERE id = %s", frios)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    for produto_id, quantidade in devolucao.items():
+        if produto_id in quentes:
+            reservas.devolve(produto_id, quantidade)
+    return itens
@@ -0,0 +1,96 @@
+from functools import lru_cache
+
+# Tabelas de resumo mantidas de forma incremental (ver migracoes/002_resumos.sql). A receita de um
+# pedido é a quantidade do item de carrinho do pedido vezes o preço atual do produto.
+# Cada alteração subtrai a contribuição antiga das linhas afetadas e soma a nova, na mesma transação.
+# Valores nulos nas colunas de agrupamento caem em um grupo fixo (0, '1970-01-01' e ''), pois
+# fazem parte da chave primária do resumo.
+RESUMOS = {
+    'pedidos': """
+        INSERT INTO tbl_resumo_pedidos (fornecedor_id, dia, status, pedidos, itens, receita)
+        SELECT * FROM (
+            SELECT COALESCE(produtos.fornecedor_id, 0) AS fornecedor_id,
+                   COALESCE(DATE(pedido.data_hora), '1970-01-01') AS dia, COALESCE(pedido.status, '') AS status,
+                   %s * COUNT(*) AS pedidos, %s * SUM(carrinho.quantidade) AS itens,
+                   %s * SUM(carrinho.quantidade * produtos.preco) AS receita
+            FROM tbl_pedido pedido
+            JOIN tbl_carrinho carrinho ON carrinho.id = pedido.carrinho_id
+            JOIN tbl_produtos produtos ON produtos.id = carrinho.produto_id
+            WHERE {condicao}
+            GROUP BY 1, 2, 3
+        ) AS delta
+        ON DUPLICATE KEY UPDATE pedidos = tbl_resumo_pedidos.pedidos + delta.pedidos,
+                                itens = tbl_resumo_pedidos.itens + delta.itens,
+                                receita = tbl_resumo_pedidos.receita + delta.receita
+    """,
+    'carrinhos': """
+        INSERT INTO tbl_resumo_carrinhos (fornecedor_id, linhas, itens, valor)
+        SELECT * FROM (
+            SELECT COALESCE(produtos.fornecedor_id, 0) AS fornecedor_id, %s * COUNT(*) AS linhas,
+                   %s * SUM(carrinho.quantidade) AS itens, %s * SUM(carrinho.quantidade * produtos.preco) AS valor
+            FROM tbl_carrinho carrinho
+            JOIN tbl_produtos produtos ON produtos.id = carrinho.produto_id
+            WHERE {condicao}
+            GROUP BY 1
+        ) AS delta
+        ON DUPLICATE KEY UPDATE linhas = tbl_resumo_carrinhos.linhas + delta.linhas,
+                                itens = tbl_resumo_carrinhos.itens + delta.itens,
+                                valor = tbl_resumo_carrinhos.valor + delta.valor
+    """,
+}
+
+# Seleção das linhas afetadas por cada tipo de alteração e os resumos que elas alimentam
+CONDICOES = {
+    'pedido': ("pedido.id = %s", ('pedidos',)),
+    'lote_pedidos': ("pedido.id BETWEEN %s AND %s", ('pedidos',)),
+    'carrinho': ("carrinho.id = %s", ('pedidos', 'carrinhos')),
+    'produto': ("produtos.id = %s", ('pedidos', 'carrinhos')),
+    'todos': ("1 = 1", ('pedidos', 'carrinhos')),
+}
+
+# Dimensões aceitas em agrupar= no relatório de receita
+DIMENSOES = {'fornecedor': 'fornecedor_id', 'dia': 'dia', 'status': 'status'}
+
+
+@lru_cache(maxsize=None)
+def sql_delta(resumo, por):
+    return RESUMOS[resumo].format(condicao=CONDICOES[por][0])
+
+
+def ajusta(cursor, por, valores, sinal):
+    """Soma (sinal=1) ou subtrai (sinal=-1) dos resumos a contribuição das linhas selecionadas.
+
+    Deve ser chamada com sinal=-1 antes de alterar as linhas e com sinal=1 depois, dentro da
+    transação da alteração: o custo é proporcional às linhas afetadas, não ao histórico.
+    """
+    for resumo in CONDICOES[por][1]:
+        cursor.execute(sql_delta(resumo, por), (sinal, sinal, sinal, *valores))
+
+
+def reconstroi(conn):
+    """Recalcula os resumos a partir das tabelas de origem (carga inicial ou correção)."""
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        for resumo in RESUMOS:
+            cursor.execute(f"DELETE FROM tbl_resumo_{resumo}")
+        ajusta(cursor, 'todos', (), 1)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+@lru_cache(maxsize=None)
+def sql_receita(dimensoes, condicoes):
+    """Consulta do relatório de receita: lê apenas as linhas de resumo, uma por grupo."""
+    colunas = [DIMENSOES[dimensao] for dimensao in dimensoes]
+    sql = f"SELECT {''.join(c + ', ' for c in colunas)}SUM(pedidos) AS pedidos, SUM(itens) AS itens, " \
+          f"SUM(receita) AS receita FROM tbl_resumo_pedidos WHERE pedidos > 0"
+    for condicao in condicoes:
+        sql += f" AND {condicao}"
+    if colunas:
+        sql += f" GROUP BY {', '.join(colunas)} ORDER BY {', '.join(colunas)}"
+    return sql
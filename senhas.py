@@ -0,0 +1,240 @@
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TempoEsgotadoFuturo
+from concurrent.futures.process import BrokenProcessPool
+
+# Formato guardado em tbl_clientes.senha: scrypt$<log2 de n>$<r>$<p>$<sal>$<hash>, em base64
+PREFIXO = 'scrypt'
+
+
+class SenhasOcupadas(Exception):
+    """Nenhuma vaga para calcular o hash a tempo: o cliente deve tentar de novo mais tarde."""
+
+
+def _scrypt(senha, sal, log_n, r, p):
+    n = 1 << log_n
+    # Memória usada pelo scrypt (128 * r * (n + p + 2) bytes), com folga para o limite do OpenSSL
+    return hashlib.scrypt(senha.encode(), salt=sal, n=n, r=r, p=p, dklen=32, maxmem=256 * r * (n + p + 2))
+
+
+def _b64(dados):
+    return base64.b64encode(dados).decode().rstrip('=')
+
+
+def _de_b64(texto):
+    return base64.b64decode(texto + '=' * (-len(texto) % 4))
+
+
+def le_hash(armazenado):
+    """Retorna (log2 de n, r, p, sal, hash) de um hash no formato do módulo, ou None (senha antiga em texto)."""
+    partes = armazenado.split('$')
+    if len(partes) != 6 or partes[0] != PREFIXO:
+        return None
+    try:
+        return int(partes[1]), int(partes[2]), int(partes[3]), _de_b64(partes[4]), _de_b64(partes[5])
+    except ValueError:
+        return None
+
+
+def _vigia_pai(pai):
+    # Se o worker do servidor morrer sem fechar o pool (ex.: SIGTERM), o processo de hash não fica órfão
+    while os.getppid() == pai:
+        time.sleep(1)
+    os._exit(0)
+
+
+def _inicia_processo(prioridade):
+    # Prioridade menor que a do servidor: com CPU disputada as requisições passam na frente dos hashes
+    if prioridade and hasattr(os, 'nice'):
+        os.nice(prioridade)
+    threading.Thread(target=_vigia_pai, args=(os.getppid(),), daemon=True).start()
+
+
+def calcula_hash(senha, log_n, r, p):
+    """Executado nos processos do pool. Retorna (hash formatado, segundos de cálculo)."""
+    inicio = time.perf_counter()
+    sal = os.urandom(16)
+    chave = _scrypt(senha, sal, log_n, r, p)
+    return f"{PREFIXO}${log_n}${r}${p}${_b64(sal)}${_b64(chave)}", time.perf_counter() - inicio
+
+
+def confere_hash(senha, armazenado):
+    """Executado nos processos do pool. Retorna (senha confere, segundos de cálculo)."""
+    inicio = time.perf_counter()
+    log_n, r, p, sal, esperado = le_hash(armazenado)
+    ok = hmac.compare_digest(_scrypt(senha, sal, log_n, r, p), esperado)
+    return ok, time.perf_counter() - inicio
+
+
+class ServicoDeSenhas:
+    """Hash (scrypt, que exige memória além de CPU) e verificação de senhas fora das threads das requisições.
+
+    Os cálculos rodam em um pool de `processos` processos. Cabem no máximo `processos + fila` cálculos
+    em andamento ou esperando; além disso SenhasOcupadas é lançada na hora, sem ocupar a thread da
+    requisição. Um cálculo que não termina em `timeout` segundos também lança SenhasOcupadas.
+    Com processos=0 o cálculo roda na própria thread, com o mesmo limite.
+
+    Os processos rodam com o nice acrescido de `prioridade`, cedendo a CPU às threads das requisições.
+    Um lote (gera_varias) usa no máximo `lote` dessas vagas ao mesmo tempo e só um lote calcula por vez
+    (os outros esperam a vez): as demais vagas ficam para os cadastros e logins avulsos.
+
+    observador(operacao, total, calculo) recebe a latência de cada hash (total, incluindo a espera
+    na fila, e só o cálculo).
+    """
+
+    def __init__(self, processos=2, fila=32, timeout=5.0, log_n=14, r=8, p=1, prioridade=10, observador=None,
+                 lote=1):
+        self.processos = processos
+        self.lote = lote
+        self.prioridade = prioridade
+        self.fila = fila
+        self.timeout = timeout
+        # Parâmetros de custo dos hashes novos; hashes com outros parâmetros são refeitos no login
+        self.log_n = log_n
+        self.r = r
+        self.p = p
+        self.observador = observador
+        self.reinicia()
+
+    def reinicia(self):
+        """Descarta o pool de processos (ex.: herdado pelo filho de um fork) e zera as estatísticas."""
+        self._executor = None
+        self._lock = threading.Lock()
+        self._vagas = threading.BoundedSemaphore(self.processos + self.fila)
+        self._lotes = threading.Lock()  # Um lote calculando por vez
+        self._operacoes = {}  # operação -> [quantidade, tempo total, tempo máximo]
+        self.rejeitadas = 0
+        self.timeouts = 0
+        self.rehashes = 0
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: os processos não herdam as threads e conexões do worker
+                self._executor = ProcessPoolExecutor(self.processos, mp_context=multiprocessing.get_context('spawn'),
+                                                     initializer=_inicia_processo, initargs=(self.prioridade,))
+            return self._executor
+
+    def _descarta_pool(self, executor):
+        # Um processo do pool morreu (ex.: falta de memória): o próximo cálculo cria outro pool
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+
+    def _reserva(self, espera):
+        obtida = self._vagas.acquire(timeout=espera) if espera else self._vagas.acquire(blocking=False)
+        if not obtida:
+            with self._lock:
+                self.rejeitadas += 1
+            raise SenhasOcupadas("Fila de hash de senhas cheia")
+
+    def _envia(self, funcao, *args, espera=0):
+        """Reserva uma vaga e começa o cálculo. Retorna (futuro ou resultado, momento do envio)."""
+        self._reserva(espera)
+        inicio = time.perf_counter()
+        if not self.processos:
+            try:
+                return funcao(*args), inicio
+            finally:
+                self._vagas.release()
+        executor = self._pool()
+        try:
+            futuro = executor.submit(funcao, *args)
+        except BrokenProcessPool:
+            self._vagas.release()
+            self._descarta_pool(executor)
+            raise SenhasOcupadas("Pool de hash de senhas reiniciado")
+        except BaseException:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        return futuro, inicio
+
+    def _resultado(self, operacao, enviado):
+        futuro, inicio = enviado
+        if self.processos:
+            executor = self._executor
+            try:
+                futuro = futuro.result(timeout=max(0, self.timeout - (time.perf_counter() - inicio)))
+            except TempoEsgotadoFuturo:
+                # Se ainda estiver na fila, o cálculo nem chega a rodar
+                futuro.cancel()
+                with self._lock:
+                    self.timeouts += 1
+                raise SenhasOcupadas("Tempo esgotado no hash de senha")
+            except BrokenProcessPool:
+                self._descarta_pool(executor)
+                raise SenhasOcupadas("Pool de hash de senhas reiniciado")
+        resultado, calculo = futuro
+        total = time.perf_counter() - inicio
+        with self._lock:
+            estatistica = self._operacoes.setdefault(operacao, [0, 0.0, 0.0])
+            estatistica[0] += 1
+            estatistica[1] += total
+            estatistica[2] = max(estatistica[2], total)
+        if self.observador is not None:
+            self.observador(operacao, total, calculo)
+        return resultado
+
+    def gera(self, senha):
+        """Hash de uma senha nova com os parâmetros atuais."""
+        return self._resultado('hash', self._envia(calcula_hash, senha, self.log_n, self.r, self.p))
+
+    def gera_varias(self, senhas):
+        """Hashes de várias senhas (ex.: um lote de clientes), com no máximo `lote` cálculos em andamento.
+
+        Espera até `timeout` segundos o lote anterior terminar. Lança SenhasOcupadas se ele não terminar
+        nesse prazo ou se um cálculo não terminar a tempo.
+        """
+        if not self._lotes.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejeitadas += 1
+            raise SenhasOcupadas("Outro lote ainda está calculando senhas")
+        try:
+            resultados = []
+            enviados = deque()
+            for senha in senhas:
+                # Janela de `lote` cálculos: o próximo só é enviado quando o mais antigo termina
+                if len(enviados) >= self.lote:
+                    resultados.append(self._resultado('hash', enviados.popleft()))
+                enviados.append(self._envia(calcula_hash, senha, self.log_n, self.r, self.p, espera=self.timeout))
+            resultados += [self._resultado('hash', enviado) for enviado in enviados]
+            return resultados
+        finally:
+            self._lotes.release()
+
+    def verifica(self, senha, armazenado):
+        """Retorna (senha confere, hash precisa ser refeito com os parâmetros atuais)."""
+        if le_hash(armazenado) is None:
+            # Senha gravada em texto antes do hash: confere direto e pede o hash
+            ok = hmac.compare_digest(senha.encode(), armazenado.encode())
+            if ok:
+                with self._lock:
+                    self.rehashes += 1
+            return ok, ok
+        ok = self._resultado('verificacao', self._envia(confere_hash, senha, armazenado))
+        refazer = ok and self.precisa_rehash(armazenado)
+        if refazer:
+            with self._lock:
+                self.rehashes += 1
+        return ok, refazer
+
+    def precisa_rehash(self, armazenado):
+        parametros = le_hash(armazenado)
+        return parametros is None or parametros[:3] != (self.log_n, self.r, self.p)
+
+    def estatisticas(self):
+        with self._lock:
+            operacoes = {operacao: {"quantidade": quantidade, "media_ms": total / quantidade * 1000,
+                                    "maxima_ms": maxima * 1000}
+                         for operacao, (quantidade, total, maxima) in self._operacoes.items()}
+            return {"processos": self.processos, "fila": self.fila, "lote": self.lote, "prioridade": self.prioridade,
+                    "parametros": {"log_n": self.log_n, "r": self.r, "p": self.p},
+                    "operacoes": operacoes, "rejeitadas": self.rejeitadas, "timeouts": self.timeouts,
+                    "rehashes": self.rehashes}
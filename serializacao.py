@@ -0,0 +1,127 @@
+import json
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from json.encoder import encode_basestring_ascii
+
+from flask import g, has_request_context
+from flask.json.provider import DefaultJSONProvider, _default
+from werkzeug.http import http_date
+
+
+def _decimal(valor):
+    # Mesmo formato do Flask: Decimal vira string
+    if not isinstance(valor, Decimal):
+        raise TypeError
+    return valor
+
+
+def _data(valor):
+    # Mesmo formato do Flask: datas viram string no formato HTTP
+    if not isinstance(valor, date):
+        raise TypeError
+    return http_date(valor)
+
+
+@lru_cache(maxsize=256)
+def codificador_linha(colunas, tipos):
+    """Gera uma função que transforma uma linha (tupla) em um objeto JSON, sem montar um dict.
+
+    O formato com as chaves já escritas é calculado uma vez por formato de linha (colunas e tipos)
+    e o código da função é gerado para esse formato, como o dataclasses faz com __init__.
+    """
+    partes = []
+    argumentos = []
+    for posicao, (coluna, tipo) in enumerate(zip(colunas, tipos)):
+        chave = encode_basestring_ascii(coluna).replace('%', '%%')
+        if tipo is int:
+            partes.append(f'{chave}:%d')
+            argumentos.append(f'linha[{posicao}]')
+        elif tipo is str:
+            partes.append(f'{chave}:%s')
+            argumentos.append(f'texto(linha[{posicao}])')
+        elif tipo is Decimal:
+            partes.append(f'{chave}:"%s"')
+            argumentos.append(f'decimal(linha[{posicao}])')
+        elif tipo in (datetime, date):
+            partes.append(f'{chave}:"%s"')
+            argumentos.append(f'data(linha[{posicao}])')
+        else:
+            partes.append(f'{chave}:%s')
+            argumentos.append(f'generico(linha[{posicao}])')
+
+    formato = '{' + ','.join(partes) + '}'
+    codigo = f"lambda linha: formato % ({', '.join(argumentos)},)"
+    rapido = eval(codigo, {
+        'formato': formato, 'texto': encode_basestring_ascii, 'decimal': _decimal, 'data': _data,
+        'generico': _generico,
+    })
+
+    def codifica(linha):
+        try:
+            return rapido(linha)
+        except TypeError:
+            # NULL ou valor com tipo diferente do esperado: usa o caminho genérico nesta linha
+            return '{' + ','.join(f'{encode_basestring_ascii(c)}:{_generico(v)}' for c, v in zip(colunas, linha)) + '}'
+
+    return codifica
+
+
+def _generico(valor):
+    return json.dumps(valor, default=_default)
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    """Provedor JSON do Flask que mede o tempo de serialização e codifica linhas de tuplas."""
+
+    def _medir(self, inicio):
+        if has_request_context() and 'tempos' in g:
+            g.tempos['serializacao'] += time.perf_counter() - inicio
+
+    def response(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        resp = super().response(*args, **kwargs)
+        self._medir(inicio)
+        return resp
+
+    def objetos(self, colunas, tipos, linhas):
+        """Codifica cada linha (tupla) como um objeto JSON, retornando uma lista de strings."""
+        inicio = time.perf_counter()
+        codifica = codificador_linha(tuple(colunas), tuple(tipos))
+        resultado = list(map(codifica, linhas))
+        self._medir(inicio)
+        return resultado
+
+
+class ProvedorOrjson(ProvedorJSON):
+    """Provedor JSON baseado no orjson, com a mesma saída do Flask para Decimal e datas."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        import orjson  # Dependência opcional, só necessária com JSON_PROVIDER=orjson
+        self._orjson = orjson
+        # As datas passam pelo default para manter o formato HTTP usado pelo Flask
+        self._opcoes = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        return self._orjson.dumps(obj, default=_default, option=self._opcoes).decode()
+
+    def loads(self, s, **kwargs):
+        return self._orjson.loads(s)
+
+    def objetos(self, colunas, tipos, linhas):
+        # O orjson serializa dicts mais rápido que o formato gerado em Python
+        inicio = time.perf_counter()
+        dumps = self._orjson.dumps
+        opcoes = self._opcoes
+        resultado = [dumps(dict(zip(colunas, linha)), default=_default, option=opcoes).decode() for linha in linhas]
+        self._medir(inicio)
+        return resultado
+
+
+# Provedores disponíveis, escolhidos pela variável de ambiente JSON_PROVIDER
+PROVEDORES = {
+    'padrao': ProvedorJSON,
+    'orjson': ProvedorOrjson,
+}
@@ -0,0 +1,55 @@
+"""Confere com EXPLAIN se cada filtro e ordenação das listagens usa um índice.
+
+Execução (depois de aplicar migracoes/001_indices_listagens.sql): python verifica_indices.py
+Rode contra um banco com volume realista: em tabelas quase vazias o MySQL prefere ler a tabela
+inteira mesmo quando existe índice. Sai com código 1 se alguma consulta não usar índice.
+"""
+import sys
+from datetime import datetime
+from decimal import Decimal
+
+import mysql.connector
+
+from configuracao import config
+from repositorio import TABELAS
+
+# Valor de exemplo por tipo de coluna, usado apenas para montar o plano
+EXEMPLOS = {int: 1, str: 'x', Decimal: Decimal('1'), datetime: datetime(2024, 1, 1)}
+
+
+def consultas(tabela):
+    """Gera (descrição, sql, valores) de uma página para cada filtro e ordenação da tabela."""
+    for coluna in tabela.filtros:
+        filtros = ((coluna, '=', EXEMPLOS[tabela.tipos[coluna]]),)
+        yield f"{coluna}=", *tabela.consulta_pagina(tabela.colunas, None, 100, filtros)
+    for coluna in tabela.faixas:
+        filtros = ((coluna, '>=', EXEMPLOS[tabela.tipos[coluna]]),)
+        yield f"{coluna}_min=", *tabela.consulta_pagina(tabela.colunas, None, 100, filtros, coluna)
+    for coluna in tabela.ordenacao:
+        apos = (EXEMPLOS[tabela.tipos[coluna]], 1)
+        yield f"sort={coluna}", *tabela.consulta_pagina(tabela.colunas, apos, 100, (), coluna)
+
+
+def verifica(conn):
+    problemas = 0
+    cursor = conn.cursor(dictionary=True)
+    for tabela in TABELAS.values():
+        for descricao, sql, valores in consultas(tabela):
+            cursor.execute("EXPLAIN " + sql, valores)
+            plano = cursor.fetchall()[0]
+            extra = plano.get('Extra') or ''
+            # type=ALL é leitura da tabela inteira; filesort é ordenação fora do índice
+            ok = plano['type'] != 'ALL' and plano['key'] is not None and 'Using filesort' not in extra
+            problemas += not ok
+            print(f"{'OK  ' if ok else 'FALHA'} {tabela.nome} {descricao}: type={plano['type']} "
+                  f"key={plano['key']} {extra}")
+    cursor.close()
+    return problemas
+
+
+if __name__ == '__main__':
+    conn = mysql.connector.connect(**config)
+    try:
+        sys.exit(1 if verifica(conn) else 0)
+    finally:
+        conn.close()
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def _texto(valor):
+    # O Redis devolve bytes; o cliente em memória devolve o valor guardado
+    return valor.decode() if isinstance(valor, bytes) else str(valor)
+
+
+class Versoes:
+    """Contadores de versão por tabela e por registro, usados nas ETags e no Last-Modified.
+
+    Sem cliente compartilhado os contadores ficam na memória do processo, o que só é correto com
+    um único processo. Com vários workers, use um cliente no formato do Redis (incr/get/set/mget).
+
+    Na memória do processo só os `max_registros` registros alterados mais recentemente são lembrados.
+    Um registro esquecido passa a responder com a maior versão já esquecida da sua tabela: a ETag pode
+    mudar sem o registro ter mudado, mas nunca repete uma ETag de dados antigos.
+    """
+
+    def __init__(self, cliente=None, prefixo='estudo:versao:', max_registros=100000):
+        self.cliente = cliente
+        self.prefixo = prefixo
+        self.max_registros = max_registros
+        self._lock = threading.Lock()
+        self.reinicia()
+
+    def reinicia(self):
+        """Zera os contadores em memória com uma época nova (ex.: no filho de um fork).
+
+        Assim dois processos nunca emitem a mesma ETag para dados diferentes. Com cliente
+        compartilhado a época e os contadores são os do cliente.
+        """
+        with self._lock:
+            self._tabelas = {}  # tabela -> (versão, alterada em)
+            self._registros = OrderedDict()  # (tabela, id) -> (versão, alterado em), do mais antigo ao mais novo
+            self._pisos = {}  # tabela -> maior (versão, alterado em) entre os registros esquecidos
+
+        # A época entra na ETag para que contadores zerados não repitam ETags antigas
+        epoca = os.urandom(4).hex()
+        self.inicio = time.time()
+        if self.cliente is not None:
+            self.cliente.set(self.prefixo + 'epoca', f"{epoca}:{self.inicio}", nx=True)
+            epoca, inicio = _texto(self.cliente.get(self.prefixo + 'epoca')).split(':')
+            self.inicio = float(inicio)
+        self.epoca = epoca
+
+    def versao_tabela(self, tabela):
+        """Retorna (versão, alterada em) da tabela."""
+        if self.cliente is None:
+            with self._lock:
+                return self._tabelas.get(tabela, (0, self.inicio))
+        versao, alterada_em = self.cliente.mget([self.prefixo + tabela, self.prefixo + tabela + ':t'])
+        if versao is None:
+            return 0, self.inicio
+        return int(versao), float(alterada_em)
+
+    def versao_registro(self, tabela, id):
+        """Retorna (versão, alterado em) do registro."""
+        if self.cliente is None:
+            with self._lock:
+                versao = self._registros.get((tabela, id))
+                return versao if versao is not None else self._pisos.get(tabela, (0, self.inicio))
+        valor = self.cliente.get(f"{self.prefixo}{tabela}:{id}")
+        if valor is None:
+            return 0, self.inicio
+        versao, alterado_em = _texto(valor).split(':')
+        return int(versao), float(alterado_em)
+
+    def altera(self, tabela, id=None):
+        """Registra uma alteração na tabela (e no registro, se o id for informado)."""
+        agora = time.time()
+        if self.cliente is None:
+            with self._lock:
+                versao = self._tabelas.get(tabela, (0, self.inicio))[0] + 1
+                self._tabelas[tabela] = (versao, agora)
+                if id is not None:
+                    # O registro recebe a versão da tabela, que nunca se repete
+                    self._registros[(tabela, id)] = (versao, agora)
+                    self._registros.move_to_end((tabela, id))
+                    while len(self._registros) > self.max_registros:
+                        (tabela_antiga, _), esquecida = self._registros.popitem(last=False)
+                        self._pisos[tabela_antiga] = max(self._pisos.get(tabela_antiga, (0, self.inicio)), esquecida)
+            return
+
+        versao = self.cliente.incr(self.prefixo + tabela)
+        self.cliente.set(self.prefixo + tabela + ':t', agora)
+        if id is not None:
+            self.cliente.set(f"{self.prefixo}{tabela}:{id}", f"{versao}:{agora}")
+
+    def etag_tabela(self, tabela):
+        """Retorna (ETag, alterada em) das listagens da tabela. A ETag vale por URL, então páginas diferentes podem repeti-la."""
+        versao, alterada_em = self.versao_tabela(tabela)
+        return f"{self.epoca}-{tabela}-{versao}", alterada_em
+
+    def etag_registro(self, tabela, id):
+        """Retorna (ETag, alterado em) de um registro."""
+        versao, alterado_em = self.versao_registro(tabela, id)
+        return f"{self.epoca}-{tabela}-{id}-{versao}", alterado_em